@@ -1,5 +1,5 @@
 __author__ = "ThorN"
-__version__ = "2026.06.20"
+__version__ = "2026.10.18"
 
 version = f"^2(b3) ^3v{__version__}"
 
@@ -1,7 +1,10 @@
 import contextlib
+import itertools
 import re
 import threading
 import time
+import weakref
+from collections import deque
 
 import b3
 import b3.functions
@@ -91,6 +94,8 @@ class Cvar:
 
 
 class ClientVar:
+    __slots__ = ("value",)
+
     def __init__(self, value):
         """
         Object constructor.
@@ -131,54 +136,162 @@ class ClientVar:
         return len(self.value)
 
 
-class Client:
-    # PVT
-    _autoLogin = 1
-    _data = None
-    _exactName = ""
-    _greeting = ""
-    _groupBits = 0
-    _groups = None
-    _guid = ""
-    _id = 0
-    _ip = ""
-    _lastVisit = None
-    _login = ""
-    _maskGroup = None
-    _maskLevel = 0
-    _maxGroup = None
-    _maxLevel = None
-    _name = ""
-    _password = ""
-    _pluginData = None
-    _pbid = ""
-    _team = b3.TEAM_UNKNOWN
-    _tempLevel = None
-    _timeAdd = 0
-    _timeEdit = 0
+class PluginVars:
+    """
+    The keys of the variables a plugin stores in the clients. Each key is resolved
+    once to a slot index shared by all the clients, which keep the variables of
+    the plugin in a flat list indexed by slot.
+    """
 
-    # PUB
-    authed = False
-    authorizing = False
-    bot = False
-    cid = None
-    connected = True
-    console = None
-    hide = False
-    state = None
+    __slots__ = ("__weakref__", "_lock", "pluginId", "slots")
+
+    _registry = {}  # id(plugin) -> PluginVars
+    # re-entrant: a garbage collection run while it is held can forget a plugin
+    _registryLock = threading.RLock()
+
+    def __init__(self, pluginId):
+        """
+        Object constructor.
+        :param pluginId: The id() of the plugin
+        """
+        self._lock = threading.Lock()
+        self.pluginId = pluginId
+        self.slots = {}  # key -> slot index
+
+    @classmethod
+    def of(cls, plugin):
+        """
+        Return the variable keys of the given plugin.
+        :param plugin: The plugin storing the variables
+        """
+        try:
+            return cls._registry[id(plugin)]
+        except KeyError:
+            pass
+        with cls._registryLock:
+            if (plugin_vars := cls._registry.get(id(plugin))) is None:
+                plugin_vars = cls._registry[id(plugin)] = cls(id(plugin))
+                # forget the keys with the plugin, before its id can be reused: a
+                # plugin reusing it gets its own PluginVars, so its own client lists
+                with contextlib.suppress(TypeError):
+                    weakref.finalize(plugin, cls._forget, plugin_vars)
+            return plugin_vars
+
+    @classmethod
+    def _forget(cls, plugin_vars):
+        with cls._registryLock:
+            if cls._registry.get(plugin_vars.pluginId) is plugin_vars:
+                del cls._registry[plugin_vars.pluginId]
+
+    def index(self, key):
+        """
+        Return the slot index of a key, assigning the next one to new keys.
+        :param key: The variable key
+        """
+        try:
+            return self.slots[key]
+        except KeyError:
+            with self._lock:
+                return self.slots.setdefault(key, len(self.slots))
+
+    @classmethod
+    def slot(cls, plugin, key):
+        """
+        Resolve a variable of a plugin for Client.slotvar and Client.setslotvar,
+        which skip the key lookups of Client.var and Client.setvar. Plugins
+        resolve the variables they use on every event once, when they are built.
+        :param plugin: The plugin storing the variable
+        :param key: The variable key
+        """
+        plugin_vars = cls.of(plugin)
+        return plugin_vars, plugin_vars.index(key)
+
+
+class Client:
+    __slots__ = (
+        # attributes set by plugins
+        "__dict__",
+        "__weakref__",
+        # PVT
+        "_autoLogin",
+        "_connections",
+        "_data",
+        "_exactName",
+        "_greeting",
+        "_groupBits",
+        "_groups",
+        "_guid",
+        "_id",
+        "_ip",
+        "_lastVisit",
+        "_login",
+        "_maskGroup",
+        "_maskLevel",
+        "_maxGroup",
+        "_maxLevel",
+        "_name",
+        "_password",
+        "_pbid",
+        "_team",
+        "_tempLevel",
+        "_timeAdd",
+        "_timeEdit",
+        "_vars",  # PluginVars -> [ClientVar or None by slot index]
+        # PUB
+        "authed",
+        "authorizing",
+        "bot",
+        "cid",
+        "connected",
+        "console",
+        "hide",
+        "state",
+    )
+
+    _authLock = threading.Lock()  # makes checking and setting authorizing atomic
 
     def __init__(self, **kwargs):
         """
         Object constructor.
         :param kwargs: A dict containing client object attributes.
         """
-        self._pluginData = {}
-        self.state = b3.STATE_UNKNOWN
+        self._autoLogin = 1
+        self._connections = 0
         self._data = {}
+        self._exactName = ""
+        self._greeting = ""
+        self._groupBits = 0
+        self._groups = None
+        self._guid = ""
+        self._id = 0
+        self._ip = ""
+        self._lastVisit = None
+        self._login = ""
+        self._maskGroup = None
+        self._maskLevel = 0
+        self._maxGroup = None
+        self._maxLevel = None
+        self._name = ""
+        self._password = ""
+        self._pbid = ""
+        self._team = b3.TEAM_UNKNOWN
+        self._tempLevel = None
+        self._timeAdd = 0
+        self._timeEdit = 0
+        self._vars = {}
+        self.authed = False
+        self.authorizing = False
+        self.bot = False
+        self.cid = None
+        self.connected = True
+        self.hide = False
+        self.state = b3.STATE_UNKNOWN
 
         # make sure to set console before anything else
         if "console" in kwargs:
             self.console = kwargs["console"]
+        elif not hasattr(self, "console"):  # may be set by a subclass
+            self.console = None
 
         for k, v in kwargs.items():
             setattr(self, k, v)
@@ -191,8 +304,9 @@ class Client:
         :return True if there is a value, False otherwise
         """
         try:
-            return key in self._pluginData[id(plugin)]
-        except KeyError:
+            plugin_vars = PluginVars._registry[id(plugin)]
+            return self._vars[plugin_vars][plugin_vars.slots[key]] is not None
+        except KeyError, IndexError:
             return False
 
     def setvar(self, plugin, key, value=None):
@@ -203,19 +317,26 @@ class Client:
         :param value: The value of this variable.
         :return The stored variable.
         """
-        plugin_id = id(plugin)
+        return self.setslotvar(PluginVars.slot(plugin, key), value)
+
+    def setslotvar(self, slot, value=None):
+        """
+        Store a new variable in this client object, like setvar.
+        :param slot: The plugin/key combination resolved by PluginVars.slot.
+        :param value: The value of this variable.
+        :return The stored variable.
+        """
+        plugin_vars, index = slot
         try:
-            plugin_data = self._pluginData[plugin_id]
+            values = self._vars[plugin_vars]
         except KeyError:
-            client_var = ClientVar(value)
-            self._pluginData[plugin_id] = {key: client_var}
-        else:
-            try:
-                client_var = plugin_data[key]
-                client_var.value = value
-            except KeyError:
-                client_var = ClientVar(value)
-                plugin_data[key] = client_var
+            values = self._vars[plugin_vars] = []
+        if index >= len(values):
+            values.extend([None] * (index + 1 - len(values)))
+        elif (client_var := values[index]) is not None:
+            client_var.value = value
+            return client_var
+        client_var = values[index] = ClientVar(value)
         return client_var
 
     def var(self, plugin, key, default=None):
@@ -227,9 +348,28 @@ class Client:
         :return The variable saved under the plugin/key combination or default if it doesn't exists.
         """
         try:
-            return self._pluginData[id(plugin)][key]
-        except KeyError:
+            plugin_vars = PluginVars._registry[id(plugin)]
+            client_var = self._vars[plugin_vars][plugin_vars.slots[key]]
+        except KeyError, IndexError:
+            client_var = None
+        if client_var is None:
             return self.setvar(plugin, key, default)
+        return client_var
+
+    def slotvar(self, slot, default=None):
+        """
+        Return a variable previously stored by a plugin, like var.
+        :param slot: The plugin/key combination resolved by PluginVars.slot.
+        :param default: A default value to be returned if the variable is not stored.
+        :return The variable saved under the plugin/key combination or default if it doesn't exists.
+        """
+        try:
+            client_var = self._vars[slot[0]][slot[1]]
+        except KeyError, IndexError:
+            client_var = None
+        if client_var is None:
+            return self.setslotvar(slot, default)
+        return client_var
 
     def varlist(self, plugin, key, default=None):
         if not default:
@@ -247,8 +387,17 @@ class Client:
         :param plugin: The plugin that stored the variable.
         :param key: The key of the variable.
         """
-        with contextlib.suppress(KeyError):
-            del self._pluginData[id(plugin)][key]
+        with contextlib.suppress(KeyError, IndexError):
+            plugin_vars = PluginVars._registry[id(plugin)]
+            self._vars[plugin_vars][plugin_vars.slots[key]] = None
+
+    def _reindex(self):
+        # keep the indexes of the connected clients current
+        if (
+            self.cid is not None
+            and (clients := getattr(self.console, "clients", None)) is not None
+        ):
+            clients.reindex(self)
 
     def getAliases(self):
         return self.console.storage.getClientAliases(self)
@@ -278,16 +427,8 @@ class Client:
 
     def getGroups(self):
         if not self._groups:
-            self._groups = []
-            groups = self.console.storage.getGroups()
-            guest_group = None
-            for g in groups:
-                if g.id == 0:
-                    guest_group = g
-                if g.id & self._groupBits:
-                    self._groups.append(g)
-            if not len(self._groups) and guest_group:
-                self._groups.append(guest_group)
+            registry = self.console.storage.getGroupRegistry()
+            self._groups = list(registry.resolve(self._groupBits)[0])
         return self._groups
 
     groups = property(getGroups)
@@ -321,14 +462,10 @@ class Client:
 
     def _get_maxLevel(self):
         if self._maxLevel is None:
-            if self.groups:
-                m = -1
-                for g in self.groups:
-                    if g.level > m:
-                        m = g.level
-                        self._maxGroup = g
-
-                self._maxLevel = m
+            registry = self.console.storage.getGroupRegistry()
+            if (group := registry.resolve(self._groupBits)[1]) is not None:
+                self._maxGroup = group
+                self._maxLevel = group.level
             elif self._tempLevel:
                 self._maxGroup = Group(id=-1, name="Unspecified", level=self._tempLevel)
                 return self._tempLevel
@@ -396,8 +533,6 @@ class Client:
 
     autoLogin = property(_get_auto_login, _set_auto_login)
 
-    _connections = 0
-
     def _set_connections(self, v):
         self._connections = int(v)
 
@@ -447,6 +582,7 @@ class Client:
         else:
             self.authed = False
             self._guid = ""
+        self._reindex()
 
     def _get_guid(self):
         return self._guid
@@ -458,6 +594,7 @@ class Client:
             self._id = 0
         else:
             self._id = int(v)
+        self._reindex()
 
     def _get_id(self):
         return self._id
@@ -540,6 +677,7 @@ class Client:
         self.makeAlias(self._name)
         self._name = newName
         self._exactName = name + "^7"
+        self._reindex()
 
         if self.console and self.authed:
             self.console.queueEvent(
@@ -565,6 +703,7 @@ class Client:
 
     def _set_pbid(self, pbid):
         self._pbid = pbid
+        self._reindex()
 
     def _get_pbid(self):
         return self._pbid
@@ -863,136 +1002,187 @@ class Client:
         """
         Save the current client in the storage.
         """
+        if not self._prepareSave():
+            return False
+        if console:
+            self.console.queueEvent(
+                self.console.getEvent("EVT_CLIENT_UPDATE", data=self, client=self)
+            )
+        return self.console.storage.setClient(self)
+
+    def _prepareSave(self):
+        """
+        Stamp the client before it is saved.
+        :return: False if the client cannot be saved
+        """
         self.timeEdit = time.time()
         if self.guid is None or str(self.guid) == "0":
             # can't save a client without a guid
             return False
-        else:
-            # fix missing pbid. Workaround a bug in the database layer that would insert the string "None"
-            # in db if pbid is None :/ The empty string being the default value for that db column!!
-            if self.pbid is None:
-                self.pbid = ""
-            if console:
-                self.console.queueEvent(
-                    self.console.getEvent("EVT_CLIENT_UPDATE", data=self, client=self)
-                )
-            return self.console.storage.setClient(self)
+        # fix missing pbid. Workaround a bug in the database layer that would insert the string "None"
+        # in db if pbid is None :/ The empty string being the default value for that db column!!
+        if self.pbid is None:
+            self.pbid = ""
+        return True
 
     def auth(self):
         """
         Authorize this client.
         """
-        if not self.authed and self.guid and not self.authorizing:
+        if (current := self._authBegin()) is None:
+            return False
+        try:
+            if not self._authLookup(self.console.storage, current):
+                return False
+            self.save()
+            self.authed = True
+            # numBans, lastBan, numWarnings... are answered from memory from now on
+            self.console.storage.loadPenaltySummary(self)
+            return self._authComplete()
+        finally:
+            self.authorizing = False
+
+    def _authBegin(self):
+        """
+        Start authorizing this client, querying its FSA if unknown.
+        :return: The (name, pbid, ip) to restore once the client is found in the storage,
+                 or None if the client cannot be authorized
+        """
+        # the timer, the auth worker and the parser thread may all try at once
+        with self._authLock:
+            if self.authed or not self.guid or self.authorizing:
+                return None
             self.authorizing = True
 
-            name = self.name
-            pbid = self.pbid
-            ip = self.ip
+        name = self.name
+        pbid = self.pbid
+        ip = self.ip
 
-            if not pbid and self.cid:
+        if not pbid and self.cid:
+            try:
                 fsa_info = self.console.queryClientFrozenSandAccount(self.cid)
-                self.pbid = pbid = fsa_info.get("login", None)
+            except BaseException:
+                self.authorizing = False
+                raise
+            self.pbid = pbid = fsa_info.get("login", None)
 
-            # FSA will be found in pbid
-            if not self.pbid:
-                # auth with cl_guid only
-                try:
-                    in_storage = self.auth_by_guid()
-                    # fix up corrupted data due to bug #162
-                    if in_storage and in_storage.pbid == "None":
-                        in_storage.pbid = None
-                except Exception as e:
-                    self.console.error("Auth by guid failed", exc_info=e)
-                    self.authorizing = False
-                    return False
-            else:
-                # auth with FSA
+        return name, pbid, ip
+
+    def _authLookup(self, storage, current):
+        """
+        Look this client up in the storage and restore its current name, FSA and ip.
+        :param storage: The storage, or the PrefetchedClients, to look the client up in
+        :param current: The (name, pbid, ip) returned by _authBegin
+        :return: False if the lookup failed
+        """
+        name, pbid, ip = current
+
+        # FSA will be found in pbid
+        if not self.pbid:
+            # auth with cl_guid only
+            try:
+                in_storage = self.auth_by_guid(storage)
+                # fix up corrupted data due to bug #162
+                if in_storage and in_storage.pbid == "None":
+                    in_storage.pbid = None
+            except Exception as e:
+                self.console.error("Auth by guid failed", exc_info=e)
+                self.authorizing = False
+                return False
+        else:
+            # auth with FSA
+            try:
+                in_storage = self.auth_by_pbid(storage)
+            except Exception as e:
+                self.console.error("Auth by FSA failed", exc_info=e)
+                self.authorizing = False
+                return False
+
+            if not in_storage:
+                # fallback on auth with cl_guid only
                 try:
-                    in_storage = self.auth_by_pbid()
+                    in_storage = self.auth_by_guid(storage)
                 except Exception as e:
-                    self.console.error("Auth by FSA failed", exc_info=e)
+                    self.console.error(
+                        "Auth by guid failed (when no known FSA)", exc_info=e
+                    )
                     self.authorizing = False
                     return False
 
-                if not in_storage:
-                    # fallback on auth with cl_guid only
-                    try:
-                        in_storage = self.auth_by_guid()
-                    except Exception as e:
-                        self.console.error(
-                            "Auth by guid failed (when no known FSA)", exc_info=e
-                        )
-                        self.authorizing = False
-                        return False
-
-            if in_storage:
-                self.lastVisit = self.timeEdit
-                self.console.bot(
-                    "Client found in the storage @%s: welcome back %s [FSA: '%s']",
-                    self.id,
-                    self.name,
-                    self.pbid,
-                )
-            else:
-                self.console.bot(
-                    "Client not found in the storage %s [FSA: '%s'], create new",
-                    str(self.guid),
-                    self.pbid,
-                )
+        if in_storage:
+            self.lastVisit = self.timeEdit
+            self.console.bot(
+                "Client found in the storage @%s: welcome back %s [FSA: '%s']",
+                self.id,
+                self.name,
+                self.pbid,
+            )
+        else:
+            self.console.bot(
+                "Client not found in the storage %s [FSA: '%s'], create new",
+                str(self.guid),
+                self.pbid,
+            )
 
-            self.connections = int(self.connections) + 1
-            self.name = name
-            self.ip = ip
-            if pbid:
-                self.pbid = pbid
-            self.save()
-            self.authed = True
+        self.connections = int(self.connections) + 1
+        self.name = name
+        self.ip = ip
+        if pbid:
+            self.pbid = pbid
+        return True
 
-            # check for bans
-            if self.numBans > 0:
-                ban = self.lastBan
-                if ban:
-                    self.reBan(ban)
-                    self.authorizing = False
-                    return False
+    def _authComplete(self):
+        """
+        Finish authorizing this client once saved: enforce its ban or fire EVT_CLIENT_AUTH.
+        :return: True if the client is authorized
+        """
+        # check for bans
+        if self.numBans > 0:
+            ban = self.lastBan
+            if ban:
+                self.reBan(ban)
+                self.authorizing = False
+                return False
 
-            self.refreshLevel()
-            self.console.queueEvent(
-                self.console.getEvent("EVT_CLIENT_AUTH", data=self, client=self)
-            )
-            self.authorizing = False
-            return self.authed
-        else:
-            return False
+        self.refreshLevel()
+        self.console.queueEvent(
+            self.console.getEvent("EVT_CLIENT_AUTH", data=self, client=self)
+        )
+        self.authorizing = False
+        return self.authed
 
-    def auth_by_guid(self):
+    def auth_by_guid(self, storage=None):
         """
         Authorize this client using his GUID.
+        :param storage: The storage to look the client up in, the console one by default
         """
+        if storage is None:
+            storage = self.console.storage
         try:
-            return self.console.storage.getClient(self)
+            return storage.getClient(self)
         except KeyError as msg:
             self.console.warning("auth_by_guid: user not found %s: %s", self.guid, msg)
             return False
 
-    def auth_by_pbid(self):
+    def auth_by_pbid(self, storage=None):
         """
         Authorize this client using his PBID.
+        :param storage: The storage to look the client up in, the console one by default
         """
-        clients_matching_pbid = self.console.storage.getClientsMatching(
-            {"pbid": self.pbid}
-        )
+        if storage is None:
+            storage = self.console.storage
+        clients_matching_pbid = storage.getClientsMatching({"pbid": self.pbid})
         if len(clients_matching_pbid) > 1:
             self.console.warning(
                 "Found %s client having FSA '%s'", len(clients_matching_pbid), self.pbid
             )
-            return self.auth_by_pbid_and_guid()
+            return self.auth_by_pbid_and_guid(storage)
         elif len(clients_matching_pbid) == 1:
             self.id = clients_matching_pbid[0].id
             # we may have a second client entry in database with current guid.
             # we want to update our current client guid only if it is not the case.
             try:
-                client_by_guid = self.console.storage.getClient(Client(guid=self.guid))
+                client_by_guid = storage.getClient(Client(guid=self.guid))
             except KeyError:
                 pass
             else:
@@ -1000,18 +1190,21 @@ class Client:
                     # so storage.getClient is able to overwrite the value which will make
                     # it remain unchanged in database when .save() will be called later on
                     self._guid = None
-            return self.console.storage.getClient(self)
+            return storage.getClient(self)
         else:
             self.console.warning(
                 "Frozen Sand account [%s] unknown in database", self.pbid
             )
             return False
 
-    def auth_by_pbid_and_guid(self):
+    def auth_by_pbid_and_guid(self, storage=None):
         """
         Authorize this client using both his PBID and GUID.
+        :param storage: The storage to look the client up in, the console one by default
         """
-        clients_matching_pbid = self.console.storage.getClientsMatching(
+        if storage is None:
+            storage = self.console.storage
+        clients_matching_pbid = storage.getClientsMatching(
             {
                 "pbid": self.pbid,
                 "guid": self.guid,
@@ -1019,7 +1212,7 @@ class Client:
         )
         if clients_matching_pbid:
             self.id = clients_matching_pbid[0].id
-            return self.console.storage.getClient(self)
+            return storage.getClient(self)
         else:
             self.console.warning(
                 "Frozen Sand account [%s] with guid '%s' unknown in database",
@@ -1398,17 +1591,204 @@ class Group(Struct):
         self.timeEdit = now
         if not self.id:
             self.timeAdd = now
-        return console.storage.setGroup(self)
+        group_id = console.storage.setGroup(self)
+        console.invalidateGroups()
+        return group_id
 
     def __repr__(self):
         return "Group(%r)" % self.__dict__
 
 
+class GroupRegistry:
+    """
+    The client groups, loaded once from the storage. The groups selected by the
+    group bits of a client, and the highest of them, are precomputed for every
+    combination of the 8 standard group bits so that resolving them is a table
+    lookup (other combinations are resolved once, then memoized).
+    """
+
+    tableSize = 256
+
+    def __init__(self, groups):
+        """
+        :param groups: The groups, ordered by level
+        """
+        self.groups = list(groups)
+        self._guest = next((g for g in self.groups if g.id == 0), None)
+        self._byKeyword = {}
+        self._byLevel = {}
+        for g in self.groups:
+            self._byKeyword.setdefault(g.keyword, g)
+            self._byLevel.setdefault(g.level, g)
+        self._table = [self._resolve(bits) for bits in range(self.tableSize)]
+        self._memo = {}
+
+    def _resolve(self, bits):
+        groups = [g for g in self.groups if g.id & bits]
+        if not groups and self._guest:
+            groups.append(self._guest)
+        maxGroup = None
+        for g in groups:
+            if maxGroup is None or g.level > maxGroup.level:
+                maxGroup = g
+        return tuple(groups), maxGroup
+
+    def resolve(self, bits):
+        """
+        Return the groups selected by group bits and the highest of them.
+        :param bits: The group bits of a client
+        :return: A (groups, max group) tuple, max group is None when no group matches
+        """
+        if 0 <= bits < self.tableSize:
+            return self._table[bits]
+        if (resolved := self._memo.get(bits)) is None:
+            resolved = self._memo[bits] = self._resolve(bits)
+        return resolved
+
+    def byKeyword(self, keyword):
+        """
+        Return the group having the given keyword.
+        :raise KeyError: If there is no such group
+        """
+        try:
+            return self._byKeyword[keyword]
+        except KeyError:
+            raise KeyError(f"no group matching keyword: {keyword}") from None
+
+    def byLevel(self, level):
+        """
+        Return the group having the given level.
+        :raise KeyError: If there is no such group
+        """
+        try:
+            return self._byLevel[int(level)]
+        except KeyError:
+            raise KeyError(f"no group matching level: {level}") from None
+
+
+class AuthQueue:
+    """
+    Authorize clients on a dedicated worker thread, so that the FSA query and the
+    storage lookups of Client.auth do not hold up the parsing of the game log.
+    Jobs are keyed by slot: a client queued again before its job runs is authorized
+    once, and a new client connecting on the slot replaces the previous one. The
+    worker authorizes the waiting clients together (see Clients.authorize) and
+    EVT_CLIENT_AUTH is fired for each of them as its job completes.
+    """
+
+    def __init__(self, clients, maxBatch=32, max_samples=100):
+        """
+        :param clients: The Clients the jobs are about
+        :param maxBatch: The maximum number of clients authorized at once
+        :param max_samples: The number of lag samples to keep
+        """
+        self.clients = clients
+        self.maxBatch = maxBatch
+        self.lags = deque(maxlen=max_samples)
+        self.queued = 0
+        self.deduplicated = 0
+        self.authorized = 0
+        self.maxBacklog = 0
+        self._pending = {}  # cid -> (time queued, client), in arrival order
+        self._running = 0  # clients being authorized by the worker
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        """
+        Start the worker thread.
+        """
+        self._thread = b3.functions.start_daemon_thread(target=self._work, name="auth")
+
+    def put(self, client):
+        """
+        Queue a client to be authorized.
+        """
+        with self._cond:
+            if (job := self._pending.get(client.cid)) is not None:
+                self.deduplicated += 1
+                if job[1] is client:
+                    return
+            self._pending[client.cid] = (time.monotonic(), client)
+            self.queued += 1
+            self.maxBacklog = max(self.maxBacklog, self.backlog())
+            self._cond.notify()
+
+    def backlog(self):
+        """
+        Return the number of clients waiting for, or being, authorized.
+        """
+        return len(self._pending) + self._running
+
+    def stop(self, timeout=5.0):
+        """
+        Let the worker authorize the clients already queued then stop it.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._stopped)
+                if not self._pending:
+                    return
+                cids = list(self._pending)[: self.maxBatch]
+                jobs = [self._pending.pop(cid) for cid in cids]
+                self._running = len(jobs)
+            now = time.monotonic()
+            clients = []
+            for queued, client in jobs:
+                self.lags.append(now - queued)
+                # skip the clients which left, or were replaced, while waiting
+                if self.clients.get(client.cid) is client:
+                    clients.append(client)
+            try:
+                self.authorized += len(self.clients.authorize(clients))
+            except Exception as e:
+                self.clients.console.error("Could not authorize clients", exc_info=e)
+            finally:
+                with self._cond:
+                    self._running = 0
+
+    def __str__(self):
+        if self.lags:
+            mean, stdv = b3.functions.meanstdv(self.lags)
+            lag = f"min({min(self.lags):0.4f}), max({max(self.lags):0.4f}), mean({mean:0.4f}), stddev({stdv:0.4f})"
+        else:
+            lag = "n/a"
+        return (
+            f"AuthQueue(backlog={self.backlog()}, max_backlog={self.maxBacklog}, "
+            f"queued={self.queued}, deduplicated={self.deduplicated}, "
+            f"authorized={self.authorized}, lag {lag})"
+        )
+
+
 class Clients(dict):
+    """
+    The connected clients by slot number. Secondary indexes by guid, database id,
+    lowercased name, lowercased exact name and FSA are kept up to date as clients
+    come and go and as those attributes change (see reindex), along with a trigram
+    index of the normalized names and FSA answering the substring searches, and
+    indexes of the uppercased and truncated guids answering the fuzzy guid matches.
+    """
+
     _authorizing = False
-    _exactNameIndex = None
-    _guidIndex = None
-    _nameIndex = None
+    authQueue = None  # AuthQueue authorizing the new clients, when enabled
+    deferAuth = False  # when True, newClient leaves the clients to authorizeClients
+    _indexes = None  # index name -> key -> {cid: client}, in connection order
+    _indexed = None  # cid -> (client, keys, (normalized name, FSA))
+    _indexNames = ("guid", "id", "name", "exactName", "pbid")
+    _gramIndex = None  # trigram of a normalized name or FSA -> {cid}
+    _guidsUpper = None  # uppercased guid -> {cid}
+    _guidsTruncated = None  # 32 characters guid less one character -> {cid}
+    _slotOrder = None  # cid -> sequence number, the order of the slots in the dict
+    _reSpaces = re.compile(r"\s")
 
     console = None
 
@@ -1419,9 +1799,191 @@ class Clients(dict):
         """
         super().__init__()
         self.console = console
-        self._exactNameIndex = {}
-        self._guidIndex = {}
-        self._nameIndex = {}
+        self._indexLock = threading.RLock()
+        self.resetIndex()
+
+    @staticmethod
+    def _indexKeys(client):
+        """
+        Return the keys a client is indexed under, None for the missing ones.
+        """
+        return (
+            client.guid or None,
+            client.id or None,
+            client.name.lower() if client.name else None,
+            client.exactName.lower() if client.exactName else None,
+            client.pbid or None,
+        )
+
+    @classmethod
+    def _normalize(cls, name):
+        """
+        Return a name as matched by the substring searches: lowercased, without
+        whitespaces (the color codes are stripped by the Client.name setter).
+        """
+        return cls._reSpaces.sub("", name.lower())
+
+    @staticmethod
+    def _trigrams(texts):
+        return {text[i : i + 3] for text in texts for i in range(len(text) - 2)}
+
+    @staticmethod
+    def _truncations(guid):
+        """
+        Return the guids of 31 characters a 32 characters guid may be truncated to,
+        the ones b3.functions.fuzzyGuidMatch matches.
+        """
+        if len(guid) != 32:
+            return set()
+        return {guid[:i] + guid[i + 1 :] for i in range(32)}
+
+    def _index(self, cid, client):
+        keys = self._indexKeys(client)
+        for name, key in zip(self._indexNames, keys, strict=True):
+            if key is not None:
+                self._indexes[name].setdefault(key, {})[cid] = client
+        search = (self._normalize(keys[2] or ""), keys[4] or "")
+        for gram in self._trigrams(search):
+            self._gramIndex.setdefault(gram, set()).add(cid)
+        guid = (keys[0] or "").upper()
+        self._guidsUpper.setdefault(guid, set()).add(cid)
+        for truncated in self._truncations(guid):
+            self._guidsTruncated.setdefault(truncated, set()).add(cid)
+        self._indexed[cid] = (client, keys, search)
+
+    def _unindex(self, cid):
+        if (indexed := self._indexed.pop(cid, None)) is None:
+            return
+        for name, key in zip(self._indexNames, indexed[1], strict=True):
+            if key is not None and (bucket := self._indexes[name].get(key)):
+                bucket.pop(cid, None)
+                if not bucket:
+                    del self._indexes[name][key]
+        guid = (indexed[1][0] or "").upper()
+        for index, keys in (
+            (self._gramIndex, self._trigrams(indexed[2])),
+            (self._guidsUpper, (guid,)),
+            (self._guidsTruncated, self._truncations(guid)),
+        ):
+            for key in keys:
+                if (cids := index.get(key)) is not None:
+                    cids.discard(cid)
+                    if not cids:
+                        del index[key]
+
+    def _search(self, needle, fsa=False):
+        """
+        Return the visible clients whose normalized name contains the needle, in
+        slot order. Needles of 3 characters or more are looked up in the trigram index.
+        :param needle: The normalized text to search
+        :param fsa: Whether to match the FSA too
+        """
+        with self._indexLock:
+            if len(needle) < 3:
+                cids = self._indexed
+            else:
+                cids = None
+                for gram in self._trigrams((needle,)):
+                    if not (found := self._gramIndex.get(gram)):
+                        return []
+                    cids = set(found) if cids is None else cids & found
+            matches = []
+            for cid in cids:
+                client, _, (name, pbid) = self._indexed[cid]
+                if not client.hide and (needle in name or (fsa and needle in pbid)):
+                    matches.append(cid)
+            matches.sort(key=self._slotOrder.__getitem__)
+            return [self._indexed[cid][0] for cid in matches]
+
+    def _lookup(self, name, key):
+        """
+        Return the first connected client having the given key in an index.
+        """
+        with self._indexLock:
+            if bucket := self._indexes[name].get(key):
+                return next(iter(bucket.values()))
+        return None
+
+    def __setitem__(self, cid, client):
+        with self._indexLock:
+            self._unindex(cid)
+            if cid not in self._slotOrder:
+                self._slotOrder[cid] = next(self._slotSequence)
+            super().__setitem__(cid, client)
+            if client is not None:
+                self._index(cid, client)
+
+    def __delitem__(self, cid):
+        with self._indexLock:
+            self._unindex(cid)
+            super().__delitem__(cid)
+            self._slotOrder.pop(cid, None)
+
+    def reindex(self, client):
+        """
+        Update the indexes after the guid, id, name or FSA of a client changed.
+        :param client: The client, ignored unless connected
+        """
+        with self._indexLock:
+            if self.get(client.cid) is not client:
+                return
+            indexed = self._indexed.get(client.cid)
+            if indexed is not None and indexed[1] == self._indexKeys(client):
+                return
+            self._unindex(client.cid)
+            self._index(client.cid, client)
+
+    def checkIndexes(self):
+        """
+        Compare the indexes with the connected clients.
+        :return: The list of inconsistencies found, empty if none
+        """
+        errors = []
+        with self._indexLock:
+            expected = {name: {} for name in self._indexNames}
+            for cid, client in self.items():
+                if client is None:
+                    continue
+                keys = self._indexKeys(client)
+                for name, key in zip(self._indexNames, keys, strict=True):
+                    if key is not None:
+                        expected[name].setdefault(key, {})[cid] = client
+                indexed = self._indexed.get(cid)
+                if indexed is None or indexed[1] != keys:
+                    errors.append(f"slot {cid}: indexed as {indexed}, expected {keys}")
+            errors.extend(
+                f"slot {cid}: indexed but not connected"
+                for cid in set(self._indexed) - set(self)
+            )
+            for name in self._indexNames:
+                if self._indexes[name] != expected[name]:
+                    errors.append(
+                        f"{name} index: {self._indexes[name]} != {expected[name]}"
+                    )
+            grams = {}
+            for cid, client in self.items():
+                if client is not None:
+                    search = (self._normalize(client.name or ""), client.pbid or "")
+                    for gram in self._trigrams(search):
+                        grams.setdefault(gram, set()).add(cid)
+            if self._gramIndex != grams:
+                errors.append(f"trigram index: {self._gramIndex} != {grams}")
+            upper, truncated = {}, {}
+            for cid, client in self.items():
+                if client is not None:
+                    guid = (client.guid or "").upper()
+                    upper.setdefault(guid, set()).add(cid)
+                    for key in self._truncations(guid):
+                        truncated.setdefault(key, set()).add(cid)
+            if self._guidsUpper != upper:
+                errors.append(f"uppercased guid index: {self._guidsUpper} != {upper}")
+            if self._guidsTruncated != truncated:
+                errors.append(
+                    f"truncated guid index: {self._guidsTruncated} != {truncated}"
+                )
+            if list(self._slotOrder) != list(self):
+                errors.append(f"slot order: {list(self._slotOrder)} != {list(self)}")
+        return errors
 
     def find(self, handle, maxres=None):
         """
@@ -1442,29 +2004,14 @@ class Clients(dict):
         Search a client by matching his name.
         :param name: The name to use for the search
         """
-        name = name.lower()
-        try:
-            return self[self._nameIndex[name]]
-        except Exception:
-            for _cid, c in self.items():
-                if c.name and c.name.lower() == name:
-                    self._nameIndex[name] = c.cid
-                    return c
+        return self._lookup("name", name.lower())
 
     def getByExactName(self, name):
         """
         Search a client by matching his exact name.
         :param name: The name to use for the search
         """
-        name = name.lower() + "^7"
-        try:
-            c = self[self._exactNameIndex[name]]
-            return c
-        except Exception:
-            for _cid, c in self.items():
-                if c.exactName and c.exactName.lower() == name:
-                    self._exactNameIndex[name] = c.cid
-                    return c
+        return self._lookup("exactName", name.lower() + "^7")
 
     def getList(self):
         """
@@ -1500,12 +2047,7 @@ class Clients(dict):
         Return a list of clients matching the given name.
         :param name: The name to match
         """
-        needle = re.sub(r"\s", "", name.lower())
-        return [
-            c
-            for _, c in self.items()
-            if not c.hide and needle in re.sub(r"\s", "", c.name.lower())
-        ]
+        return self._search(self._normalize(name))
 
     def getClientLikeName(self, name):
         """
@@ -1529,6 +2071,8 @@ class Clients(dict):
         Return the client matching the given database id.
         """
         if m := re.match(r"^@([0-9]+)$", client_id):
+            if connected_client := self.getByDbId(int(m.group(1))):
+                return [connected_client]
             try:
                 if not (
                     sclient := self.console.storage.getClientsMatching(
@@ -1574,17 +2118,7 @@ class Clients(dict):
                 return [c]
             return []
         else:
-            clients = []
-            needle = re.sub(r"\s", "", handle.lower())
-            for _cid, c in self.items():
-                cleanname = re.sub(r"\s", "", c.name.lower())
-                if (
-                    not c.hide
-                    and (needle in cleanname or needle in c.pbid)
-                    and c not in clients
-                ):
-                    clients.append(c)
-            return clients
+            return self._search(self._normalize(handle), fsa=True)
 
     def getByGUID(self, guid):
         """
@@ -1592,16 +2126,30 @@ class Clients(dict):
         :param guid: The GUID to match
         """
         guid = guid.upper()
-        try:
-            return self[self._guidIndex[guid]]
-        except Exception:
-            for _cid, c in self.items():
-                if c.guid and c.guid == guid:
-                    self._guidIndex[guid] = c.cid
-                    return c
-                elif b3.functions.fuzzyGuidMatch(c.guid, guid):
-                    # found by fuzzy matching: don't index
-                    return c
+        if client := self._lookup("guid", guid):
+            return client
+        # fuzzy matching: same guid but for the case, or truncated by one character
+        with self._indexLock:
+            cids = set(self._guidsUpper.get(guid, ()))
+            cids.update(self._guidsTruncated.get(guid, ()))
+            for truncated in self._truncations(guid):
+                cids.update(self._guidsUpper.get(truncated, ()))
+            if cids:
+                return self._indexed[min(cids, key=self._slotOrder.__getitem__)][0]
+
+    def getByDbId(self, client_id):
+        """
+        Return the connected client having the given database id.
+        :param client_id: The database id
+        """
+        return self._lookup("id", client_id)
+
+    def getByPbid(self, pbid):
+        """
+        Return the connected client having the given FSA.
+        :param pbid: The FSA
+        """
+        return self._lookup("pbid", pbid)
 
     def getByCID(self, cid):
         """
@@ -1676,6 +2224,8 @@ class Clients(dict):
         :param client: The client to disconnect.
         """
         client.connected = False
+        if client.id:
+            self.console.storage.dropPenaltySummary(client)
         if client.cid is None:
             return
 
@@ -1687,15 +2237,21 @@ class Clients(dict):
                 self.console.getEvent("EVT_CLIENT_DISCONNECT", data=cid, client=client)
             )
 
-        self.resetIndex()
-
     def resetIndex(self):
         """
-        Reset the indexes.
+        Rebuild the indexes from the connected clients.
         """
-        self._nameIndex = {}
-        self._guidIndex = {}
-        self._exactNameIndex = {}
+        with self._indexLock:
+            self._indexes = {name: {} for name in self._indexNames}
+            self._indexed = {}
+            self._gramIndex = {}
+            self._guidsUpper = {}
+            self._guidsTruncated = {}
+            self._slotOrder = {cid: i for i, cid in enumerate(self)}
+            self._slotSequence = itertools.count(len(self._slotOrder))
+            for cid, client in self.items():
+                if client is not None:
+                    self._index(cid, client)
 
     def newClient(self, cid, **kwargs):
         """
@@ -1707,13 +2263,18 @@ class Clients(dict):
             console=self.console, cid=cid, timeAdd=self.console.time(), **kwargs
         )
         self[client.cid] = client
-        self.resetIndex()
         self.console.queueEvent(
             self.console.getEvent("EVT_CLIENT_CONNECT", data=client, client=client)
         )
 
+        if self.deferAuth:
+            # authorized along with the others by console.authorizeClients
+            return client
         if client.guid and not client.bot:
-            client.auth()
+            if self.authQueue is not None:
+                self.authQueue.put(client)
+            else:
+                client.auth()
         elif not client.authed:
             self.authorizeClients()
         return client
@@ -1726,12 +2287,21 @@ class Clients(dict):
 
     def clear(self):
         """
-        Empty the clients list and reset the indexes.
+        Empty the clients list, but for the hidden clients.
+        """
+        self._clear()
+
+    def _clear(self, keep=()):
+        """
+        Empty the clients list, but for the hidden clients, and stop caching the
+        penalties of the clients removed.
+        :param keep: The database IDs of the clients whose penalties stay cached
         """
-        self.resetIndex()
         for cid, c in list(self.items()):
             if not c.hide:
                 del self[cid]
+                if c.id and c.id not in keep:
+                    self.console.storage.dropPenaltySummary(c)
 
     def sync(self):
         """
@@ -1739,7 +2309,7 @@ class Clients(dict):
         """
         mlist = self.console.sync()
         # remove existing clients
-        self.clear()
+        self._clear(keep={c.id for c in mlist.values()})
         # add list of matching clients
         for cid, c in mlist.items():
             self[cid] = c
@@ -1756,6 +2326,60 @@ class Clients(dict):
             t = threading.Timer(5, self._authorizeClients)
             t.start()
 
+    def startAuthWorker(self, maxBatch=32):
+        """
+        Authorize the new clients on a worker thread (see AuthQueue).
+        :param maxBatch: The maximum number of clients authorized at once
+        """
+        self.authQueue = AuthQueue(self, maxBatch)
+        self.authQueue.start()
+
+    def stopAuthWorker(self):
+        """
+        Authorize the clients still queued and go back to authorizing the new
+        clients as they connect.
+        """
+        if (queue := self.authQueue) is not None:
+            self.authQueue = None
+            queue.stop()
+
+    def authorize(self, clients):
+        """
+        Authorize several clients at once, the way Client.auth does for each of them:
+        their rows are loaded with one query by guid and one by FSA, the updates are
+        written in a single transaction and the penalty summaries loaded with one query.
+        :param clients: The clients to authorize
+        :return: The list of clients authorized
+        """
+        started = []
+        try:
+            for client in clients:
+                if (current := client._authBegin()) is not None:
+                    started.append((client, current))
+            if not started:
+                return []
+
+            storage = self.console.storage
+            try:
+                lookup = storage.prefetchClients([client for client, _ in started])
+            except Exception as e:
+                self.console.error("Could not prefetch clients", exc_info=e)
+                lookup = storage
+
+            found = [
+                client
+                for client, current in started
+                if client._authLookup(lookup, current)
+            ]
+            storage.setClients([client for client in found if client._prepareSave()])
+            for client in found:
+                client.authed = True
+            storage.loadPenaltySummaries(found)
+            return [client for client in found if client._authComplete()]
+        finally:
+            for client, _ in started:
+                client.authorizing = False
+
     def _authorizeClients(self):
         """
         Authorize the online clients.
@@ -1,9 +1,13 @@
 import functools
+import heapq
+import itertools
+import queue
 import re
+import threading
 import time
-from collections import defaultdict, deque
+from collections import Counter, defaultdict, deque
 
-from b3.functions import meanstdv
+from b3.functions import meanstdv, start_daemon_thread
 
 __author__ = "ThorN, xlr8or, Courgette"
 __version__ = "1.8.2"
@@ -13,6 +17,7 @@ class Events:
     def __init__(self):
         self._events = {}
         self._event_names = {}
+        self._keys = {}  # event ID -> event key
 
         self.loadEvents(
             (
@@ -106,6 +111,7 @@ class Events:
             _id = self._events[key] = len(self._events) + 1
 
         self._event_names[_id] = name or f"Unnamed ({key})"
+        self._keys[_id] = key
 
         g[key] = _id
         return _id
@@ -115,24 +121,23 @@ class Events:
         Return an event ID given its key.
         :param key: The event key
         """
+        if isinstance(key, int):
+            return key
+        if (event_id := self._events.get(key)) is not None:
+            return event_id
         if re.match("^[0-9]+$", str(key)):
             return int(key)
-        return self._events.get(key)
+        return None
 
-    @functools.cache  # noqa: B019
     def getKey(self, event_id):
         """
         Get the key of a given event ID.
         :param event_id: The event ID
         """
-        matching_keys = [k for k, v in self._events.items() if v == event_id]
-        if not matching_keys:
-            raise KeyError(f"could not find any B3 event with ID {event_id}")
-        if len(matching_keys) != 1:
-            raise RuntimeError(
-                f"expecting only one event key per event ID: {matching_keys!r}"
-            )
-        return matching_keys[0]
+        try:
+            return self._keys[event_id]
+        except KeyError:
+            raise KeyError(f"could not find any B3 event with ID {event_id}") from None
 
     def getName(self, key):
         """
@@ -158,15 +163,18 @@ class Events:
 
 
 class Event:
-    def __init__(self, type, data, client=None, target=None):
+    __slots__ = ("client", "data", "key", "target", "time", "type")
+
+    def __init__(self, type, data, client=None, target=None, timestamp=None):
         """
         Object constructor.
         :param type: The event ID
         :param data: Event data
         :param client: The client source of this event
         :param target: The target of this event
+        :param timestamp: The event time, defaults to now
         """
-        self.time = int(time.time())
+        self.time = int(time.time()) if timestamp is None else timestamp
         self.type = type
         self.data = data
         self.client = client
@@ -188,6 +196,7 @@ class EventsStats:
         deque_with_max = functools.partial(deque, maxlen=max_samples)
         dict_deque = functools.partial(defaultdict, deque_with_max)
         self._handling_timers = defaultdict(dict_deque)
+        self._lock = threading.Lock()  # plugins handle events on several threads
 
     def add_event_handled(self, plugin_name, event_name, elapsed):
         """
@@ -196,14 +205,43 @@ class EventsStats:
         :param event_name: The event name
         :param elapsed: The amount of milliseconds necessary to handle the event
         """
-        self._handling_timers[plugin_name][event_name].append(elapsed)
+        with self._lock:
+            self._handling_timers[plugin_name][event_name].append(elapsed)
+
+    def _snapshot(self):
+        """
+        Return a copy of the handling times, safe to iterate while events are handled.
+        :return dict of plugin name -> dict of event name -> list of times
+        """
+        with self._lock:
+            return {
+                plugin_name: {
+                    event_name: list(event_timers)
+                    for event_name, event_timers in plugin_timers.items()
+                }
+                for plugin_name, plugin_timers in self._handling_timers.items()
+            }
+
+    def plugin_totals(self):
+        """
+        Return the handling time of each plugin over the kept samples.
+        :return dict of plugin name -> tuple(events handled, total time, max time)
+        """
+        totals = {}
+        for plugin_name, plugin_timers in self._snapshot().items():
+            timers = [
+                t for event_timers in plugin_timers.values() for t in event_timers
+            ]
+            if timers:
+                totals[plugin_name] = len(timers), sum(timers), max(timers)
+        return totals
 
     def dump_stats(self):
         """
         Print event stats in the log file.
         """
         self.console.info("***** Event Stats *****")
-        for plugin_name, plugin_timers in self._handling_timers.items():
+        for plugin_name, plugin_timers in self._snapshot().items():
             for event_name, event_timers in plugin_timers.items():
                 if event_timers:
                     mean, stdv = meanstdv(event_timers)
@@ -218,6 +256,152 @@ class EventsStats:
                     )
 
 
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_STOP = 3  # processed once everything else is drained, never shed
+
+
+class EventQueue:
+    """
+    Bounded priority queue of (added, expire, event) items which never blocks
+    producers: when full, the least important queued event (or the incoming
+    one) is shed instead. High priority items come out first, the others in
+    FIFO order: low priority only makes an item shed before the normal ones.
+    """
+
+    def __init__(self, maxsize=50, stop_events=()):
+        """
+        Object constructor.
+        :param maxsize: The maximum number of queued events (0 = unbounded)
+        :param stop_events: IDs of the events which are never shed
+        """
+        self.maxsize = maxsize
+        self._stop_events = frozenset(stop_events)
+        self._heap = []
+        self._counter = itertools.count()
+        self._not_empty = threading.Condition(threading.Lock())
+        self.shed = Counter()  # event key -> number of events dropped
+
+    def qsize(self):
+        return len(self._heap)
+
+    def empty(self):
+        return not self._heap
+
+    def full(self):
+        return 0 < self.maxsize <= len(self._heap)
+
+    def put(self, added, expire, event, priority=PRIORITY_NORMAL):
+        """
+        Queue an event.
+        :param added: The time the event was queued at
+        :param expire: The time after which the event must be discarded
+        :param event: The event
+        :param priority: One of the PRIORITY_* constants, lower is more important
+        :return The event which had to be shed, if any
+        """
+        if event.type in self._stop_events:
+            priority = PRIORITY_STOP
+        order = PRIORITY_NORMAL if priority == PRIORITY_LOW else priority
+        entry = (order, next(self._counter), priority, added, expire, event)
+        shed = None
+        with self._not_empty:
+            if priority != PRIORITY_STOP and self.full():
+                # the least important, most recently queued, sheddable entry
+                worst = max(
+                    (e for e in self._heap if e[2] != PRIORITY_STOP),
+                    key=lambda e: (e[2], e[1]),
+                    default=None,
+                )
+                if worst is None or worst[2] <= priority:
+                    shed = event
+                else:
+                    self._heap.remove(worst)
+                    heapq.heapify(self._heap)
+                    shed = worst[5]
+            if shed is not event:
+                heapq.heappush(self._heap, entry)
+                self._not_empty.notify()
+        if shed is not None:
+            self.shed[shed.key] += 1
+        return shed
+
+    def get(self, timeout=None):
+        """
+        Remove and return the most important (added, expire, event) item,
+        waiting for one to be available.
+        :param timeout: How many seconds to wait for (None = forever)
+        :raise queue.Empty if no item was available within timeout seconds
+        """
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._heap, timeout):
+                raise queue.Empty
+            _, _, _, added, expire, event = heapq.heappop(self._heap)
+        return added, expire, event
+
+
+class PluginInbox:
+    """
+    Bounded inbox of events processed, in order, by a dedicated worker thread
+    on behalf of one plugin (or one group of plugins).
+    """
+
+    def __init__(self, name, handle, maxsize=100, put_timeout=1.0, max_samples=100):
+        """
+        Object constructor.
+        :param name: The plugin (or dispatch group) name
+        :param handle: Callable handling an event: handle(plugin, event)
+        :param maxsize: The maximum number of events waiting in the inbox
+        :param put_timeout: How long to wait for room in a full inbox before dropping the event
+        :param max_samples: The number of lag samples to keep
+        """
+        self.name = name
+        self._handle = handle
+        self._inbox = queue.Queue(maxsize)
+        self._put_timeout = put_timeout
+        self.lags = deque(maxlen=max_samples)
+        self.max_depth = 0
+        self.dropped = 0
+        self._thread = None
+
+    def start(self):
+        self._thread = start_daemon_thread(target=self._work, name=f"inbox-{self.name}")
+
+    def put(self, plugin, event):
+        """
+        Queue an event for the given plugin.
+        :return False if the inbox stayed full and the event was dropped
+        """
+        try:
+            self._inbox.put(
+                (time.monotonic(), plugin, event), timeout=self._put_timeout
+            )
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.max_depth = max(self.max_depth, self._inbox.qsize())
+        return True
+
+    def depth(self):
+        return self._inbox.qsize()
+
+    def stop(self, timeout=5.0):
+        """
+        Let the worker process the events already queued then stop it.
+        """
+        if self._thread:
+            self._inbox.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _work(self):
+        while (item := self._inbox.get()) is not None:
+            queued, plugin, event = item
+            self.lags.append(time.monotonic() - queued)
+            self._handle(plugin, event)
+
+
 class VetoEvent(Exception):
     """
     Raised to cancel event processing.
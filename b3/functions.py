@@ -505,6 +505,21 @@ def start_daemon_thread(target, args=(), kwargs=None, name=None):
     return t
 
 
+def instance_attributes(obj):
+    """
+    Return the names of the attributes set on an object, like vars(obj) but
+    including the attributes stored in __slots__.
+    """
+    names = []
+    for cls in reversed(type(obj).__mro__):
+        slots = cls.__dict__.get("__slots__", ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if name not in ("__dict__", "__weakref__") and hasattr(obj, name):
+                names.append(name)
+    names.extend(getattr(obj, "__dict__", ()))
+    return names
+
+
 _escape_table = [chr(x) for x in range(128)]
 _escape_table[0] = "\\0"
 _escape_table[ord("\\")] = "\\\\"
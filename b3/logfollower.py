@@ -0,0 +1,210 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from collections import deque
+
+from b3.functions import meanstdv
+
+__author__ = "urt30plus"
+__version__ = "1.0"
+
+FOLLOWERS = ("auto", "inotify", "poll")
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVE_SELF = 0x00000800
+IN_DELETE_SELF = 0x00000400
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+_IN_WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVE_SELF | IN_DELETE_SELF
+_IN_EVENT_HEADER = struct.Struct("iIII")
+
+
+class LogFollower:
+    """
+    Wait for the game log to change: base class implementing latency tracking.
+    """
+
+    name = None
+
+    def __init__(self, fileobj, min_delay=0.05, max_delay=0.33, max_samples=100):
+        """
+        Object constructor.
+        :param fileobj: The open game log file
+        :param min_delay: The shortest time to wait between two checks of the log
+        :param max_delay: The longest time to wait before returning to the caller
+        :param max_samples: The number of wakeup to parse latency samples to keep
+        """
+        self.fileobj = fileobj
+        self.min_delay = min(min_delay, max_delay)
+        self.max_delay = max_delay
+        self.latencies = deque(maxlen=max_samples)
+        self.wakeups = 0
+        self._wakeup_time = None
+
+    def wait(self):
+        """
+        Block until the game log changes or max_delay elapses.
+        :return True if the game log changed
+        """
+        if changed := self._wait():
+            self.wakeups += 1
+            self._wakeup_time = time.monotonic()
+        return changed
+
+    def _wait(self):
+        raise NotImplementedError
+
+    def parsed(self):
+        """
+        Signal that the lines available after the last wakeup have been parsed.
+        """
+        if self._wakeup_time is not None:
+            self.latencies.append(time.monotonic() - self._wakeup_time)
+            self._wakeup_time = None
+
+    def getLatencyStats(self):
+        """
+        Return wakeup to parse latency statistics (in seconds).
+        :return tuple(min, max, mean, stddev) or None if no sample is available
+        """
+        if not self.latencies:
+            return None
+        mean, stdv = meanstdv(self.latencies)
+        return min(self.latencies), max(self.latencies), mean, stdv
+
+    def close(self):
+        pass
+
+
+class PollingFollower(LogFollower):
+    """
+    Poll the game log size, doubling the delay between checks while idle.
+    """
+
+    name = "poll"
+
+    def __init__(self, fileobj, min_delay=0.05, max_delay=0.33, max_samples=100):
+        super().__init__(fileobj, min_delay, max_delay, max_samples)
+        self.delay = self.min_delay
+        self._last_stat = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.fstat(self.fileobj.fileno())
+        except OSError, ValueError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _wait(self):
+        deadline = time.monotonic() + self.max_delay
+        while True:
+            time.sleep(self.delay)
+            if (current := self._stat()) != self._last_stat:
+                self._last_stat = current
+                self.delay = self.min_delay
+                return True
+            self.delay = min(self.delay * 2, self.max_delay)
+            if time.monotonic() + self.delay > deadline:
+                return False
+
+
+class InotifyFollower(LogFollower):
+    """
+    Sleep on an inotify watch of the game log (Linux only).
+    """
+
+    name = "inotify"
+
+    def __init__(self, fileobj, min_delay=0.05, max_delay=0.33, max_samples=100):
+        super().__init__(fileobj, min_delay, max_delay, max_samples)
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._path = os.fsencode(fileobj.name)
+        self._wd = self._libc.inotify_add_watch(self._fd, self._path, _IN_WATCH_MASK)
+        if self._wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {fileobj.name}")
+        self._poller = select.poll()
+        self._poller.register(self._fd, select.POLLIN)
+
+    def _wait(self):
+        if self._wd is None:
+            if self._rewatch():
+                return True
+            # the watched file was deleted: sleep until it is created again
+            time.sleep(self.max_delay)
+            return False
+        if not self._poller.poll(self.max_delay * 1000):
+            return False
+        self._drain()
+        return True
+
+    def _rewatch(self):
+        """
+        Watch the game log again once it exists again after a delete or a rotation.
+        :return True if the game log is watched again
+        """
+        wd = self._libc.inotify_add_watch(self._fd, self._path, _IN_WATCH_MASK)
+        if wd < 0:
+            return False
+        self._wd = wd
+        return True
+
+    def _drain(self):
+        try:
+            data = os.read(self._fd, 4096)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _IN_EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_len = _IN_EVENT_HEADER.unpack_from(data, offset)
+            if mask & IN_IGNORED and wd == self._wd:
+                self._wd = None
+            offset += _IN_EVENT_HEADER.size + name_len
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        raise OSError("inotify is only available on Linux")
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise OSError("inotify is not supported by the C library")
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+def getFollower(fileobj, mode="auto", min_delay=0.05, max_delay=0.33, log=None):
+    """
+    Return a LogFollower instance for the given game log.
+    :param fileobj: The open game log file
+    :param mode: One of FOLLOWERS: auto uses inotify when available, poll otherwise
+    :param min_delay: The shortest time to wait between two checks of the log
+    :param max_delay: The longest time to wait before returning to the caller
+    :param log: The logger used to report inotify failures
+    """
+    if mode not in FOLLOWERS:
+        raise ValueError(f"invalid log follower {mode!r}: expecting one of {FOLLOWERS}")
+    if mode != "poll":
+        try:
+            return InotifyFollower(fileobj, min_delay, max_delay)
+        except OSError as e:
+            if log:
+                log.warning("Could not use inotify to follow the game log: %s", e)
+    return PollingFollower(fileobj, min_delay, max_delay)
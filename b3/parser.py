@@ -1,9 +1,7 @@
 import atexit
 import contextlib
 import datetime
-import functools
 import os
-import queue
 import re
 import socket
 import sys
@@ -17,11 +15,12 @@ import b3.config
 import b3.cron
 import b3.events
 import b3.game
+import b3.logfollower
 import b3.output
 import b3.plugins
 import b3.rcon
 import b3.storage
-from b3.clients import Clients, Group
+from b3.clients import Clients
 from b3.functions import getModule, splitDSN, start_daemon_thread, vars2printf
 
 __author__ = "ThorN, Courgette, xlr8or, Bakes, Ozon, Fenix"
@@ -35,8 +34,19 @@ class Parser:
     _event_handling_thread = None
     _cron_stats_events = None  # crontab used to log event statistics
     _cron_stats_crontab = None  # crontab used to log cron run statistics
+    _cron_stats_ingest = None  # crontab used to log game log ingestion lag
+    _cron_stats_rcon = None  # crontab used to log RCON query cache statistics
+    _cron_stats_storage = None  # crontab used to log SQL statement cache statistics
     _timezone_crontab = None  # force recache of timezone info
     _handlers = defaultdict(list)  # event handlers
+    _plugin_inboxes = (
+        None  # dispatch group -> b3.events.PluginInbox (parallel dispatch only)
+    )
+    _event_queue_rules = {}  # event ID -> (queue priority, seconds it may wait in queue)
+    _event_timestamp = (
+        None  # time given to the events built while parsing a batch of lines
+    )
+    _ingest_backlog_since = None  # monotonic time unparsed log data was first seen
     _lineFormat = re.compile("^([a-z ]+): (.*?)", re.IGNORECASE)
     _lineClear = re.compile(r"^(?:[0-9:]+\s?)?")
     _line_color_prefix = (
@@ -64,6 +74,16 @@ class Parser:
     config = None  # parser configuration file instance
     delay = 0.33  # time between each game log lines fetching
     delay2 = 0.02  # time between each game log line processing: max number of lines processed in one second
+    parallel_dispatch = (
+        False  # whether each plugin handles events on its own worker thread
+    )
+    plugin_inbox_size = (
+        100  # max number of events waiting for a plugin in parallel dispatch
+    )
+    batch_lines = 0  # max number of lines parsed back to back in batched ingestion mode (0 = disabled)
+    log_follower = "auto"  # how to wait for new game log lines (auto, inotify or poll)
+    follower = None  # b3.logfollower.LogFollower instance following the game log
+    batch_queue_highwater = 0.75  # event queue fill ratio at which batching yields
     encoding = "latin-1"
     game = None
     gameName = None  # console name
@@ -71,6 +91,8 @@ class Parser:
     name = "b3"  # bot name
     output = None  # used to send data to the game server (default to b3.parsers.q3a.rcon.Rcon)
     queue = None  # event queue
+    rcon_cache = None  # b3.rcon.ResponseCache sharing the responses of RCON queries
+    rcon_cache_ttl = 1.0  # seconds RCON query responses are reused for (0 = disabled)
     rconTest = True  # whether to perform RCON testing or not
     screen = None
     storage = None  # storage module instance
@@ -152,6 +174,7 @@ class Parser:
         self.loadEvents()
         self.screen.write(f"Loading events   : {len(self._events)} events loaded\n")
         self.clients = Clients(self)
+        self.__init_auth_worker()
         self.loadPlugins()
         self.game = b3.game.Game(self, self.gameName)
         self.__init_eventqueue()
@@ -227,6 +250,21 @@ class Parser:
             delay2 = self.config.getfloat("server", "lines_per_second")
             if delay2 > 0:
                 self.delay2 = 1 / delay2
+        if self.config.has_option("server", "batch_lines"):
+            batch_lines = self.config.getint("server", "batch_lines")
+            if batch_lines > 0:
+                self.batch_lines = batch_lines
+                self.bot("Using batched log ingestion: %s lines per batch", batch_lines)
+        if self.config.has_option("server", "log_follower"):
+            log_follower = self.config.get("server", "log_follower").lower()
+            if log_follower in b3.logfollower.FOLLOWERS:
+                self.log_follower = log_follower
+            else:
+                self.warning(
+                    "Invalid log_follower %r: falling back on %r",
+                    log_follower,
+                    self.log_follower,
+                )
         if self.config.has_option("server", "max_line_length"):
             self._line_length = self.config.getint("server", "max_line_length")
             self.bot("Setting line_length to: %s", self._line_length)
@@ -255,6 +293,46 @@ class Parser:
             self.critical("Could not setup storage module: %s", e)
         self.storage.connect()
 
+        if self.config.has_option("b3", "database_wal") and self.config.getboolean(
+            "b3", "database_wal"
+        ):
+            synchronous = "NORMAL"
+            if self.config.has_option("b3", "database_synchronous"):
+                synchronous = self.config.get("b3", "database_synchronous")
+            readers = 2
+            if self.config.has_option("b3", "database_readers"):
+                readers = self.config.getint("b3", "database_readers")
+            try:
+                self.storage.enableWal(readers, synchronous)
+            except ValueError as e:
+                self.warning("Could not enable WAL: %s", e)
+
+        if self.config.has_option("b3", "write_behind") and self.config.getboolean(
+            "b3", "write_behind"
+        ):
+            interval = 500
+            if self.config.has_option("b3", "write_behind_interval"):
+                interval = self.config.getint("b3", "write_behind_interval")
+            rows = 100
+            if self.config.has_option("b3", "write_behind_rows"):
+                rows = self.config.getint("b3", "write_behind_rows")
+            self.bot(
+                "Database updates are written behind every %sms or %s rows",
+                interval,
+                rows,
+            )
+            self.storage.startWriteBehind(interval / 1000, rows)
+
+    def __init_auth_worker(self):
+        if self.config.has_option("b3", "auth_worker") and self.config.getboolean(
+            "b3", "auth_worker"
+        ):
+            batch = 32
+            if self.config.has_option("b3", "auth_batch"):
+                batch = self.config.getint("b3", "auth_batch")
+            self.bot("Authorizing clients on a worker thread (batches of %s)", batch)
+            self.clients.startAuthWorker(batch)
+
     def __init_gamelog(self):
         if self.config.has_option("server", "game_log"):
             game_log = self.config.get("server", "game_log")
@@ -272,6 +350,10 @@ class Parser:
                         self.input.seek(0, os.SEEK_END)
                 else:
                     self.input.seek(0, os.SEEK_END)
+                self.follower = b3.logfollower.getFollower(
+                    self.input, self.log_follower, max_delay=self.delay, log=self
+                )
+                self.bot("Following game log using: %s", self.follower.name)
             else:
                 self.screen.write(f">>> Cannot read file: {os.path.abspath(f)}\n")
                 self.screen.flush()
@@ -299,6 +381,11 @@ class Parser:
             custom_socket_timeout2 = self.config.getfloat("server", "rcon_timeout2")
             self.output.socket_timeout2 = custom_socket_timeout2
 
+        if self.config.has_option("server", "rcon_cache_ttl"):
+            self.rcon_cache_ttl = self.config.getfloat("server", "rcon_cache_ttl")
+        if self.rcon_cache_ttl > 0:
+            self.rcon_cache = b3.rcon.ResponseCache(self.rcon_cache_ttl)
+
         self.bot("RCON client: %s", self.output)
 
     def __init_rcon_test(self):
@@ -325,6 +412,35 @@ class Parser:
             else:
                 self.screen.write("OK\n")
 
+    # chat (and so commands) is handled ahead of the other events and never shed in
+    # favour of them; low priority events keep their place but are shed first
+    _event_priorities = {
+        "EVT_CLIENT_SAY": b3.events.PRIORITY_HIGH,
+        "EVT_CLIENT_TEAM_SAY": b3.events.PRIORITY_HIGH,
+        "EVT_CLIENT_SQUAD_SAY": b3.events.PRIORITY_HIGH,
+        "EVT_CLIENT_PRIVATE_SAY": b3.events.PRIORITY_HIGH,
+        "EVT_CLIENT_DAMAGE": b3.events.PRIORITY_LOW,
+        "EVT_CLIENT_DAMAGE_SELF": b3.events.PRIORITY_LOW,
+        "EVT_CLIENT_DAMAGE_TEAM": b3.events.PRIORITY_LOW,
+        "EVT_CLIENT_ITEM_PICKUP": b3.events.PRIORITY_LOW,
+        "EVT_CLIENT_GEAR_CHANGE": b3.events.PRIORITY_LOW,
+        "EVT_CLIENT_RADIO": b3.events.PRIORITY_LOW,
+    }
+    _event_default_expiry = (
+        10  # seconds an event may wait in queue before being discarded
+    )
+    _event_expiry = {
+        "EVT_CLIENT_SAY": 30,
+        "EVT_CLIENT_TEAM_SAY": 30,
+        "EVT_CLIENT_SQUAD_SAY": 30,
+        "EVT_CLIENT_PRIVATE_SAY": 30,
+        "EVT_CLIENT_DAMAGE": 3,
+        "EVT_CLIENT_DAMAGE_SELF": 3,
+        "EVT_CLIENT_DAMAGE_TEAM": 3,
+        "EVT_CLIENT_ITEM_PICKUP": 3,
+        "EVT_CLIENT_RADIO": 5,
+    }
+
     def __init_eventqueue(self):
         try:
             queuesize = self.config.getint("b3", "event_queue_size")
@@ -334,7 +450,39 @@ class Parser:
             queuesize = 50
             self.warning(err)
         self.info("Creating the event queue with size %s", queuesize)
-        self.queue = queue.Queue(queuesize)
+        self.queue = b3.events.EventQueue(
+            queuesize,
+            stop_events=(self.getEventID("EVT_EXIT"), self.getEventID("EVT_STOP")),
+        )
+        self.loadEventQueueRules()
+
+        if self.config.has_option("b3", "event_dispatch"):
+            event_dispatch = self.config.get("b3", "event_dispatch").lower()
+            if event_dispatch not in ("serial", "parallel"):
+                self.warning("Invalid event_dispatch %r: using serial", event_dispatch)
+            self.parallel_dispatch = event_dispatch == "parallel"
+        if self.config.has_option("b3", "plugin_inbox_size"):
+            self.plugin_inbox_size = self.config.getint("b3", "plugin_inbox_size")
+        if self.parallel_dispatch:
+            self.bot(
+                "Dispatching events to plugins in parallel (inbox size %s)",
+                self.plugin_inbox_size,
+            )
+            self._plugin_inboxes = {}
+
+    def loadEventQueueRules(self):
+        """
+        Map event IDs to their queue priority and expiry, must be called again
+        when new events are created.
+        """
+        rules = {}
+        for key in set(self._event_priorities) | set(self._event_expiry):
+            if (event_id := self.getEventID(key)) is not None:
+                rules[event_id] = (
+                    self._event_priorities.get(key, b3.events.PRIORITY_NORMAL),
+                    self._event_expiry.get(key, self._event_default_expiry),
+                )
+        self._event_queue_rules = rules
 
     def _reset_timezone_info(self):
         """Causes the timezone offset and name to be re-cached"""
@@ -366,6 +514,63 @@ class Parser:
         Dump event statistics into the B3 log file.
         """
         self._eventsStats.dump_stats()
+        for inbox in (self._plugin_inboxes or {}).values():
+            if inbox.lags:
+                mean, stdv = b3.functions.meanstdv(inbox.lags)
+                lag = f"min({min(inbox.lags):0.4f}), max({max(inbox.lags):0.4f}), mean({mean:0.4f}), stddev({stdv:0.4f})"
+            else:
+                lag = "n/a"
+            self.info(
+                "%s inbox : depth(%s), max depth(%s), dropped(%s), lag %s",
+                inbox.name,
+                inbox.depth(),
+                inbox.max_depth,
+                inbox.dropped,
+                lag,
+            )
+        if self.queue and self.queue.shed:
+            self.info(
+                "Events shed from the full event queue: %s",
+                ", ".join(f"{k}({v})" for k, v in self.queue.shed.most_common()),
+            )
+
+    def _dump_ingest_stats(self):
+        """
+        Dump game log ingestion lag and wakeup latency into the B3 log file.
+        """
+        bytes_behind, behind_for = self.getIngestLag()
+        self.info(
+            "***** Ingest Stats *****: %s bytes behind EOF, behind for %0.2fs",
+            bytes_behind,
+            behind_for,
+        )
+        if (auth_queue := self.clients.authQueue) is not None:
+            self.info("***** Ingest Stats *****: %s", auth_queue)
+        if self.follower and (latency := self.follower.getLatencyStats()):
+            self.info(
+                "%s wakeup to parse (%s wakeups): min(%0.4f), max(%0.4f), mean(%0.4f), stddev(%0.4f)",
+                self.follower.name,
+                self.follower.wakeups,
+                *latency,
+            )
+
+    def _dump_rcon_stats(self):
+        """
+        Dump RCON query cache statistics into the B3 log file.
+        """
+        if self.rcon_cache is not None:
+            self.info("***** RCON Stats *****: %s", self.rcon_cache)
+
+    def _dump_storage_stats(self):
+        """
+        Dump SQL statement cache statistics into the B3 log file.
+        """
+        if (statements := getattr(self.storage, "statements", None)) is not None:
+            self.info("***** Storage Stats *****: %s", statements)
+        if (queue := getattr(self.storage, "writeQueue", None)) is not None:
+            self.info("***** Storage Stats *****: %s", queue)
+        if (stats := getattr(self.storage, "queryStats", None)) is not None:
+            self.info("***** Storage Stats *****: %s", stats)
 
     def _dump_cron_stats(self):
         self.info("***** CronTab Stats *****")
@@ -396,6 +601,19 @@ class Parser:
             )
             self.cron.add(self._cron_stats_crontab)
 
+            self._cron_stats_ingest = b3.cron.CronTab(
+                self._dump_ingest_stats, minute="*/5"
+            )
+            self.cron.add(self._cron_stats_ingest)
+
+            self._cron_stats_rcon = b3.cron.CronTab(self._dump_rcon_stats, minute="45")
+            self.cron.add(self._cron_stats_rcon)
+
+            self._cron_stats_storage = b3.cron.CronTab(
+                self._dump_storage_stats, minute="50"
+            )
+            self.cron.add(self._cron_stats_storage)
+
         _, tz_name = self.tz_offset_and_name()
         if tz_name not in ("UTC", "GMT"):
             hour = self.to_utc_hour(2)
@@ -485,6 +703,8 @@ class Parser:
         """
         self.Events.createEvent(key, name)
         self._events = self.Events.events
+        if key in self._event_priorities or key in self._event_expiry:
+            self.loadEventQueueRules()
         return self._events[key]
 
     def getEventID(self, key):
@@ -497,7 +717,11 @@ class Parser:
         """
         Return a new Event object for an event name
         """
-        return b3.events.Event(self.Events.getId(key), data, client, target)
+        if self._event_timestamp is None:
+            return b3.events.Event(self.Events.getId(key), data, client, target)
+        return b3.events.Event(
+            self.Events.getId(key), data, client, target, self._event_timestamp
+        )
 
     def getEventName(self, key):
         """
@@ -622,7 +846,7 @@ class Parser:
                 if obj not in variables:
                     variables[obj] = obj
             else:
-                for attr in vars(obj):
+                for attr in b3.functions.instance_attributes(obj):
                     pattern = re.compile(r"[\W_]+")
                     cleanattr = pattern.sub(
                         "", attr
@@ -639,7 +863,7 @@ class Parser:
             # elif type(obj).__name__ == 'instance':
             # self.debug('Classname of object %s: %s' % (key, obj.__class__.__name__))
             else:
-                for attr in vars(obj):
+                for attr in b3.functions.instance_attributes(obj):
                     pattern = re.compile(r"[\W_]+")
                     cleanattr = pattern.sub(
                         "", attr
@@ -656,18 +880,28 @@ class Parser:
         if cmd := self._commands.get(cmd):
             return cmd % kwargs
 
-    @functools.cache  # noqa: B019
     def getGroup(self, data):
         """
         Return a valid Group from storage.
         <data> can be either a group keyword or a group level.
         Raises KeyError if group is not found.
         """
+        registry = self.storage.getGroupRegistry()
         if type(data) is int or (isinstance(data, str) and data.isdigit()):
-            g = Group(level=data)
-        else:
-            g = Group(keyword=data)
-        return self.storage.getGroup(g)
+            return registry.byLevel(data)
+        if not data:
+            # as with storage.getGroup, no keyword means the default level (0)
+            return registry.byLevel(0)
+        return registry.byKeyword(data)
+
+    def invalidateGroups(self):
+        """
+        Reload the groups after they changed in the storage and recompute the
+        groups and levels of the connected clients.
+        """
+        self.storage.invalidateGroups()
+        for client in self.clients.getList():
+            client.refreshLevel()
 
     def getGroupLevel(self, data):
         """
@@ -753,10 +987,8 @@ class Parser:
         self.screen.flush()
 
         sleep = time.sleep
-        read_lines = self.read
-        parse_line = self.parseLine
-
-        delay_per_line = self.delay2
+        ingest = self._ingest_batch if self.batch_lines else self._ingest_lines
+        follower = self.follower
         delay_read_lines = self.delay
 
         while self.working:
@@ -766,23 +998,14 @@ class Parser:
                     self._pauseNotice = True
                 sleep(delay_read_lines)
                 continue
-            for line in read_lines():
-                if line := line.strip():
-                    try:
-                        parse_line(line)
-                    except Exception as msg:
-                        self.error(
-                            "Could not parse line %s - (%s) %s",
-                            line,
-                            msg,
-                            extract_tb(sys.exc_info()[2]),
-                        )
-                    sleep(delay_per_line)
-
-            sleep(delay_read_lines)
+            busy = ingest()
+            follower.parsed()
+            if not busy:
+                follower.wait()
 
         self.bot("Stopped parsing")
         self.bot("Closing games log file")
+        self.follower.close()
         self.input.close()
 
         self.bot("Send STOP Event to Event Handling Thread")
@@ -794,6 +1017,81 @@ class Parser:
             sys.exit(self.exitcode)
         self.bot("Shutdown Complete")
 
+    def _parse_line(self, line):
+        """
+        Parse a single game log line logging any error raised.
+        """
+        try:
+            self.parseLine(line)
+        except Exception as msg:
+            self.error(
+                "Could not parse line %s - (%s) %s",
+                line,
+                msg,
+                extract_tb(sys.exc_info()[2]),
+            )
+
+    def _ingest_lines(self):
+        """
+        Parse all the available game log lines pausing delay2 seconds after each one.
+        :return False since the caller must always wait for new lines
+        """
+        sleep = time.sleep
+        parse_line = self._parse_line
+        delay_per_line = self.delay2
+        for line in self.read():
+            if line := line.strip():
+                parse_line(line)
+                sleep(delay_per_line)
+        return False
+
+    def _ingest_batch(self):
+        """
+        Parse up to batch_lines game log lines back to back, then yield only
+        if the event queue is filling up faster than plugins can drain it.
+        :return True if the batch budget was exhausted and more lines may be pending
+        """
+        lines = self.readBatch(self.batch_lines)
+        parse_line = self._parse_line
+        # stamp all the events of the batch at once
+        self._event_timestamp = self.time()
+        try:
+            for line in lines:
+                if line := line.strip():
+                    parse_line(line)
+        finally:
+            self._event_timestamp = None
+
+        if self.getIngestLag()[0] <= 0:
+            self._ingest_backlog_since = None
+
+        self._wait_for_queue()
+        return len(lines) >= self.batch_lines
+
+    def _wait_for_queue(self):
+        """
+        Block while the event queue is above its high-water mark (backpressure).
+        """
+        if not self.queue or not self.queue.maxsize:
+            return
+        highwater = max(1, int(self.queue.maxsize * self.batch_queue_highwater))
+        while self.working and self.queue.qsize() >= highwater:
+            time.sleep(self.delay2)
+
+    def getIngestLag(self):
+        """
+        Return how far behind the game log the parser currently is, and for how
+        long: since the first read which left data unparsed.
+        :return tuple(bytes behind EOF, seconds since the parser fell behind EOF)
+        """
+        try:
+            bytes_behind = os.fstat(self.input.fileno()).st_size - self.input.tell()
+        except AttributeError, OSError, ValueError:
+            return 0, 0.0
+        if bytes_behind <= 0 or self._ingest_backlog_since is None:
+            return max(bytes_behind, 0), 0.0
+        return bytes_behind, time.monotonic() - self._ingest_backlog_since
+
     def parseLine(self, line):
         """
         Parse a single line from the log file
@@ -828,15 +1126,43 @@ class Parser:
                 )
                 handlers.remove(event_handler)
 
-    def queueEvent(self, event, expire=10):
+    def hasHandlers(self, event_id):
+        """
+        Tell whether at least one plugin is registered for the given event, so
+        that parsers can avoid building events nobody listens to.
+        :param event_id: The event ID
+        """
+        return bool(self._handlers.get(event_id))
+
+    def queueEvent(self, event, expire=None):
+        """
+        Queue an event for processing by the event handling thread. This never
+        blocks: when the queue is full the least important event is shed.
+        :param event: The event to queue
+        :param expire: Seconds the event may wait in queue, defaults to the event type expiry
+        :return True if the event was queued
+        """
         try:
             if event.type in self._handlers:
-                time.sleep(0.001)  # wait a bit so event doesnt get jumbled
+                priority, default_expire = self._event_queue_rules.get(
+                    event.type,
+                    (b3.events.PRIORITY_NORMAL, self._event_default_expiry),
+                )
+                if expire is None:
+                    expire = default_expire
                 current_time = self.time()
-                self.queue.put((current_time, current_time + expire, event), timeout=2)
-                return True
-        except queue.Full:
-            self.error("**** Event queue was full (%s)", self.queue.qsize())
+                if shed := self.queue.put(
+                    current_time,
+                    current_time + expire,
+                    event,
+                    priority,
+                ):
+                    self.error(
+                        "**** Event queue was full (%s): dropped %s",
+                        self.queue.qsize(),
+                        shed,
+                    )
+                return shed is not event
         except AttributeError:
             self.error("*** Event has no type: %s", event)
         return False
@@ -845,7 +1171,6 @@ class Parser:
         """
         Event handler thread.
         """
-        timer_func = time.perf_counter
         console_time = self.time
         event_queue_get = self.queue.get
         stop_events = (self.getEventID("EVT_EXIT"), self.getEventID("EVT_STOP"))
@@ -870,38 +1195,68 @@ class Parser:
             for hfunc in self._handlers[event.type]:
                 if not hfunc.isEnabled():
                     continue
-                timer_plugin_begin = timer_func()
-                try:
-                    hfunc.parseEvent(event)
-                    time.sleep(0.001)
-                except b3.events.VetoEvent:
-                    # plugin called for a halt to event processing
-                    self.bot("%s vetoed by %s", event, str(hfunc))
-                    break
-                except Exception as msg:
-                    self.error(
-                        "Handler %s could not handle %s: %s: %s %s",
-                        hfunc.__class__.__name__,
-                        event,
-                        msg.__class__.__name__,
-                        msg,
-                        extract_tb(sys.exc_info()[2]),
-                    )
-                finally:
-                    if (elapsed := timer_func() - timer_plugin_begin) > 1.5:
-                        self.warning(
-                            "Handler %s took more that 1.5 seconds "
-                            "to handle %s: total %0.4f",
-                            hfunc.__class__.__name__,
-                            event,
-                            elapsed,
+                if self._plugin_inboxes is not None and not getattr(
+                    hfunc, "requiresVeto", False
+                ):
+                    if not (inbox := self._pluginInbox(hfunc)).put(hfunc, event):
+                        self.error(
+                            "**** %s inbox was full: dropped %s", inbox.name, event
                         )
-                    self._eventsStats.add_event_handled(
-                        hfunc.__class__.__name__, event.key, elapsed
-                    )
+                elif self._handlePluginEvent(hfunc, event):
+                    break
 
         self.handle_events_shutdown()
 
+    def _handlePluginEvent(self, hfunc, event):
+        """
+        Let a plugin handle an event, logging errors and handling time.
+        :param hfunc: The plugin
+        :param event: The event
+        :return True if the plugin vetoed the event
+        """
+        timer_plugin_begin = time.perf_counter()
+        try:
+            hfunc.parseEvent(event)
+        except b3.events.VetoEvent:
+            # plugin called for a halt to event processing
+            self.bot("%s vetoed by %s", event, str(hfunc))
+            return True
+        except Exception as msg:
+            self.error(
+                "Handler %s could not handle %s: %s: %s %s",
+                hfunc.__class__.__name__,
+                event,
+                msg.__class__.__name__,
+                msg,
+                extract_tb(sys.exc_info()[2]),
+            )
+        finally:
+            if (elapsed := time.perf_counter() - timer_plugin_begin) > 1.5:
+                self.warning(
+                    "Handler %s took more that 1.5 seconds to handle %s: total %0.4f",
+                    hfunc.__class__.__name__,
+                    event,
+                    elapsed,
+                )
+            self._eventsStats.add_event_handled(
+                hfunc.__class__.__name__, event.key, elapsed
+            )
+        return False
+
+    def _pluginInbox(self, hfunc):
+        """
+        Return the inbox of the worker handling events for the given plugin,
+        starting it if needed.
+        :param hfunc: The plugin
+        """
+        group = getattr(hfunc, "dispatchGroup", None) or hfunc.__class__.__name__
+        if not (inbox := self._plugin_inboxes.get(group)):
+            inbox = self._plugin_inboxes[group] = b3.events.PluginInbox(
+                group, self._handlePluginEvent, self.plugin_inbox_size
+            )
+            inbox.start()
+        return inbox
+
     def handle_events_shutdown(self):
         self.bot("Shutting down event handler")
 
@@ -909,6 +1264,17 @@ class Parser:
             self.working = False
             self.bot("Working was set, shutdown initiated from outside of main thread")
 
+        if self._plugin_inboxes:
+            self.bot("Stopping plugin event workers")
+            for inbox in self._plugin_inboxes.values():
+                inbox.stop()
+
+        self.bot("Stopping client authorization worker")
+        try:
+            self.clients.stopAuthWorker()
+        except Exception as e:
+            self.error(e)
+
         self.bot("Sending EVT_STOP message to all plugins")
         event = self.getEvent("EVT_STOP")
         for plugin in self._plugins.values():
@@ -923,6 +1289,12 @@ class Parser:
         except Exception as e:
             self.error(e)
 
+        self.bot("Flushing queued database writes")
+        try:
+            self.storage.flush()
+        except Exception as e:
+            self.error(e)
+
         self.bot("Shutting down database connection")
         try:
             self.storage.shutdown()
@@ -939,6 +1311,8 @@ class Parser:
         """
         Write a message to Rcon/Console
         """
+        if self.rcon_cache is not None:
+            self.rcon_cache.invalidate(msg)
         s = time.perf_counter()
         r = self.output.write(msg, maxRetries=maxRetries, socketTimeout=socketTimeout)
         self.info(
@@ -950,11 +1324,30 @@ class Parser:
         )
         return r
 
+    def query(self, msg, **kwargs):
+        """
+        Send a read-only RCON query (status, players, cvar value...): callers
+        asking the same within rcon_cache_ttl seconds share its response.
+        :param msg: The RCON query
+        :param kwargs: The maxRetries/socketTimeout arguments given to write()
+        """
+        if self.rcon_cache is None:
+            return self.write(msg, **kwargs)
+        return self.rcon_cache.get(msg, lambda cmd: self.write(cmd, **kwargs))
+
+    def invalidateQueries(self):
+        """
+        Forget the cached RCON query responses (map change...).
+        """
+        if self.rcon_cache is not None:
+            self.rcon_cache.invalidate()
+
     def writelines(self, msg):
         """
         Write a sequence of messages to Rcon/Console. Optimized for speed.
         :param msg: The message to be sent to Rcon/Console.
         """
+        self.invalidateQueries()
         self.output.writelines(msg)
 
     def read(self):
@@ -979,6 +1372,33 @@ class Parser:
 
         return lines
 
+    def readBatch(self, max_lines):
+        """
+        Read at most max_lines lines from the game server log file.
+        Unlike read(), the file position is only advanced past the returned
+        lines, so getIngestLag() can tell how much data is still unparsed.
+        :param max_lines: The maximum number of lines to read
+        """
+        readline = self.input.readline
+        lines = []
+        while len(lines) < max_lines and (line := readline()):
+            lines.append(line)
+
+        filesize = os.fstat(self.input.fileno()).st_size
+        position = self.input.tell()
+        if not lines and position > filesize:
+            self.warning(
+                "Parser: game log is suddenly smaller than it was "
+                f"before ({position} bytes, now {filesize}), "
+                "the log was probably either rotated or emptied. B3 will now re-adjust to "
+                "the new size of the log"
+            )
+            self.input.seek(0, os.SEEK_END)
+        elif position < filesize and self._ingest_backlog_since is None:
+            self._ingest_backlog_since = time.monotonic()
+
+        return lines
+
     def shutdown(self):
         """
         Shutdown B3.
@@ -1,3 +1,4 @@
+import functools
 import re
 import threading
 from collections import Counter
@@ -15,7 +16,59 @@ from b3.functions import (
 )
 
 __author__ = "xlr8or, Courgette, Fenix"
-__version__ = "4.34"
+__version__ = "4.36"
+
+_regex_group_open = re.compile(r"(?:\((?:\?P<\w+>|\?:)?)*")
+_regex_letters = re.compile(r"[A-Za-z]*")
+
+
+def _has_top_level_branch(source):
+    depth = 0
+    escaped = in_class = False
+    for c in source:
+        if escaped:
+            escaped = False
+        elif c == "\\":
+            escaped = True
+        elif in_class:
+            in_class = c != "]"
+        elif c == "[":
+            in_class = True
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            return True
+    return False
+
+
+def line_format_prefix(pattern):
+    """
+    Return the literal letters any line matched by the given line format must
+    start with, lowercased for case insensitive formats ("" if there are none).
+    :param pattern: The compiled line format
+    """
+    source = pattern.pattern
+    if _has_top_level_branch(source):
+        return ""
+    pos = _regex_group_open.match(source, 1 if source.startswith("^") else 0).end()
+    prefix = _regex_letters.match(source, pos).group()
+    pos += len(prefix)
+    if source[pos : pos + 1] in ("?", "*", "{"):
+        # the last letter is optional
+        prefix = prefix[:-1]
+    elif source[pos : pos + 1] == "|" or source[pos:].lstrip(")")[:1] in (
+        "?",
+        "*",
+        "{",
+        "|",
+    ):
+        # the enclosing group is optional or has alternatives
+        prefix = ""
+    if pattern.flags & re.IGNORECASE:
+        prefix = prefix.lower()
+    return prefix
 
 
 class Iourt43Parser(b3.parser.Parser):
@@ -337,6 +390,9 @@ class Iourt43Parser(b3.parser.Parser):
     )
 
     _line_formats_counter = Counter()
+    _unknown_actions = Counter()
+    _dispatch = None  # lowercased action -> bound handler or event id
+    _lineToken = re.compile(r"[A-Za-z]*")
 
     def dump_line_format_counter(self):
         self._line_formats_counter["games"] += 1
@@ -352,9 +408,12 @@ class Iourt43Parser(b3.parser.Parser):
             pattern = self._lineFormats[index].pattern
             lines.append(f"{count:10,}: ({index:2}) {pattern}")
         lines.append(f"Games Played: {game_count}")
+        for action, count in self._unknown_actions.most_common():
+            lines.append(f"{count:10,}: unknown action {action!r}")
         self.info("\n".join(lines))
         if game_count > 50:
             self._line_formats_counter.clear()
+            self._unknown_actions.clear()
 
     # map: ut4_casa
     # num score ping name            lastmsg address               qport rate
@@ -627,6 +686,7 @@ class Iourt43Parser(b3.parser.Parser):
             )
 
         self.__setup_events()
+        self.buildDispatchTable()
         self.__setup_world_client()
         self.__setup_maps()
         self.__setup_log_sync()
@@ -637,6 +697,8 @@ class Iourt43Parser(b3.parser.Parser):
         return gamename == "q3urt43"
 
     def pluginsStarted(self):
+        # pick up handlers added by plugins
+        self.buildDispatchTable()
         self.__setup_connected_players()
 
     def load_conf_userinfo_overflow(self):
@@ -683,14 +745,13 @@ class Iourt43Parser(b3.parser.Parser):
         Parse a log line returning extracted tokens.
         :param line: The line to be parsed
         """
-        line = re.sub(self._lineClear, repl="", string=line, count=1)
-        for index, f in enumerate(self._lineFormats):
-            if m := re.match(f, line):
-                self._line_formats_counter[index] += 1
-                # log lines for the more generalized formats
-                if index > 26:
-                    self.info("re.match(%s): %s", index, line)
-                break
+        line = self._lineClear.sub("", line, count=1)
+        index, m = self._matchLineFormat(line)
+        if m:
+            self._line_formats_counter[index] += 1
+            # log lines for the more generalized formats
+            if index > 26:
+                self.info("re.match(%s): %s", index, line)
         else:
             if "------" not in line:
                 self.warning("Line did not match format: %s", line)
@@ -703,6 +764,46 @@ class Iourt43Parser(b3.parser.Parser):
 
         return m, m["action"].lower(), data
 
+    def _matchLineFormat(self, line):
+        """
+        Match a log line against the line formats whose literal prefix agrees
+        with the line leading word. Gives the same result as trying every line
+        format in order (see _matchLineFormatLinear).
+        :param line: The log line, stripped of its timestamp
+        :return tuple(line format index, match) or (None, None)
+        """
+        for index, f in self._lineFormatsFor(self._lineToken.match(line).group()):
+            if m := f.match(line):
+                return index, m
+        return None, None
+
+    @functools.lru_cache(maxsize=256)  # noqa: B019
+    def _lineFormatsFor(self, token):
+        """
+        Return the (index, line format) pairs which may match a line starting
+        with the given word, in line formats order.
+        :param token: The leading word of the line
+        """
+        lowered = token.lower()
+        return tuple(
+            (index, f)
+            for index, f in enumerate(self._lineFormats)
+            if (lowered if f.flags & re.IGNORECASE else token).startswith(
+                line_format_prefix(f)
+            )
+        )
+
+    def _matchLineFormatLinear(self, line):
+        """
+        Reference implementation of _matchLineFormat trying every line format in order.
+        :param line: The log line, stripped of its timestamp
+        :return tuple(line format index, match) or (None, None)
+        """
+        for index, f in enumerate(self._lineFormats):
+            if m := f.match(line):
+                return index, m
+        return None, None
+
     def parseLine(self, line):
         """
         Parse a log line creating necessary events.
@@ -712,20 +813,59 @@ class Iourt43Parser(b3.parser.Parser):
         if not match:
             return False
 
-        func_name = f"On{action.title().replace(' ', '')}"
+        dispatch = self._dispatch
+        if dispatch is None:
+            dispatch = self.buildDispatchTable()
+        try:
+            handler = dispatch[action]
+        except KeyError:
+            # unknown actions are counted below, not cached: they are unbounded
+            if (handler := self._resolveAction(action)) is not None:
+                dispatch[action] = handler
 
-        if func := getattr(self, func_name, None):
-            if event := func(action, data, match):
-                self.queueEvent(event)
-        elif action in self._eventMap:
-            self.queueEvent(self.getEvent(self._eventMap[action], data=data))
-        else:
+        if handler is None:
             data = str(action) + ": " + str(data)
-            self.warning("Unknown Event: %s", data)
+            if not self._unknown_actions[action]:
+                self.warning("Unknown Event: %s", data)
+            self._unknown_actions[action] += 1
             self.queueEvent(self.getEvent("EVT_UNKNOWN", data=data))
+        elif isinstance(handler, int):
+            if self.hasHandlers(handler):
+                self.queueEvent(self.getEvent(handler, data=data))
+        elif event := handler(action, data, match):
+            self.queueEvent(event)
 
         return True
 
+    def buildDispatchTable(self):
+        """
+        Build the table mapping log line actions to their On* handler or event
+        id. Must be rebuilt when handlers or _eventMap entries are added.
+        :return The dispatch table
+        """
+        dispatch = {}
+        for name in dir(self):
+            action = name[2:].lower()
+            if name == f"On{action.title()}" and callable(
+                handler := getattr(self, name)
+            ):
+                dispatch[action] = handler
+        for action, event_id in self._eventMap.items():
+            if event_id is not None:
+                dispatch.setdefault(action, event_id)
+        self._dispatch = dispatch
+        return dispatch
+
+    def _resolveAction(self, action):
+        """
+        Resolve a log line action missing from the dispatch table.
+        :param action: The lowercased log line action
+        :return The bound handler, the event id or None if the action is unknown
+        """
+        if handler := getattr(self, f"On{action.title().replace(' ', '')}", None):
+            return handler
+        return self._eventMap.get(action)
+
     def OnInitauth(self, action, data, match=None):
         pass
 
@@ -955,6 +1095,8 @@ class Iourt43Parser(b3.parser.Parser):
     def OnRadio(self, action, data, match=None):
         if not (client := self.getByCidOrJoinPlayer(match["cid"])):
             return None
+        if not self.hasHandlers(self.getEventID("EVT_CLIENT_RADIO")):
+            return None
         radio_data = {
             "msg_group": match["msg_group"],
             "msg_id": match["msg_id"],
@@ -983,6 +1125,8 @@ class Iourt43Parser(b3.parser.Parser):
         points = self._getDamagePoints(weapon, hitloc)
         event_data = (points, weapon, hitloc)
         victim.data["lastDamageTaken"] = event_data
+        if not self.hasHandlers(event):
+            return None
         return self.getEvent(event, event_data, attacker, victim)
 
     def OnCallvote(self, action, data, match=None):
@@ -1156,6 +1300,9 @@ class Iourt43Parser(b3.parser.Parser):
         the user in the database (usualy guid, ip) and call the
         Client.auth() method.
         """
+        self.clients.authorize(
+            [client for client in list(self.clients.values()) if not client.bot]
+        )
 
     def OnKill(self, action, data, match=None):
         if not (victim := self.getByCidOrJoinPlayer(match["cid"])):
@@ -1206,6 +1353,8 @@ class Iourt43Parser(b3.parser.Parser):
         last_damage_data = victim.data.pop("lastDamageTaken", (100, weapon, "body"))
 
         victim.state = b3.STATE_DEAD
+        if not self.hasHandlers(event):
+            return None
         # need to pass some amount of damage for the teamkill plugin - 100 is a kill
         return self.getEvent(
             event,
@@ -1287,6 +1436,8 @@ class Iourt43Parser(b3.parser.Parser):
             # correct flag/bomb-pickups
             if "flag" in item or "bomb" in item:
                 return self.OnAction(cid, item, data)
+            if not self.hasHandlers(self.getEventID("EVT_CLIENT_ITEM_PICKUP")):
+                return None
             return self.getEvent("EVT_CLIENT_ITEM_PICKUP", data=item, client=client)
         return None
 
@@ -1376,6 +1527,7 @@ class Iourt43Parser(b3.parser.Parser):
         return self.getEvent("EVT_GAME_EXIT", data=data)
 
     def OnInitgame(self, action, data, match=None, round_start=False):
+        self.invalidateQueries()
         game = self.game
         for k, v in self.parseInfoFields(data).items():
             if k == "mapname":
@@ -1598,7 +1750,7 @@ class Iourt43Parser(b3.parser.Parser):
         Returns a dict having players' id for keys and players' ping for values.
         :param filter_client_ids: If filter_client_id is an iterable, only return values for the given client ids.
         """
-        if not (data := self.write("status")):
+        if not (data := self.query("status")):
             self.warning("getPlayerPings: rcon status response empty")
             return {}
 
@@ -1889,7 +2041,7 @@ class Iourt43Parser(b3.parser.Parser):
         see http://forums.urbanterror.net/index.php/topic,9356.0.html
         """
         player_teams = {}
-        players_data = self.write("players")
+        players_data = self.query("players")
         for line in players_data.splitlines()[3:]:
             m = re.match(self._rePlayerScore, line.strip())
             if m and line.strip() != "0:  FREE k:0 d:0 ping:0":
@@ -2007,9 +2159,15 @@ class Iourt43Parser(b3.parser.Parser):
 
     def __setup_connected_players(self):
         player_list = self.getPlayerList()
-        for cid in player_list:
-            if userinfostring := self.queryClientUserInfoByCid(cid):
-                self.OnClientuserinfo(None, userinfostring)
+        # the players already connected are authorized together
+        self.clients.deferAuth = True
+        try:
+            for cid in player_list:
+                if userinfostring := self.queryClientUserInfoByCid(cid):
+                    self.OnClientuserinfo(None, userinfostring)
+        finally:
+            self.clients.deferAuth = False
+        self.authorizeClients()
         self.__reconcile_connected_player_teams(player_list)
 
     def __reconcile_connected_player_teams(self, player_list):
@@ -2038,7 +2196,7 @@ class Iourt43Parser(b3.parser.Parser):
         """
         Returns a dict having players' id for keys and players' scores for values.
         """
-        if not (data := self.write("status")):
+        if not (data := self.query("status")):
             self.warning("getPlayerScores: rcon status no response")
             return {}
 
@@ -2070,7 +2228,7 @@ class Iourt43Parser(b3.parser.Parser):
         Query the game server for connected players.
         Return a dict having players' id for keys and players' data as another dict for values.
         """
-        if not (data := self.write("status", maxRetries=maxRetries)):
+        if not (data := self.query("status", maxRetries=maxRetries)):
             self.warning("getPlayerList: rcon status no response")
             return {}
 
@@ -2111,7 +2269,7 @@ class Iourt43Parser(b3.parser.Parser):
         :param cvar_name: The CVAR name.
         """
         if self._reCvarName.match(cvar_name):
-            val = self.write(cvar_name)
+            val = self.query(cvar_name)
 
             for f in self._reCvar:
                 if m := re.match(f, val):
@@ -2152,7 +2310,7 @@ class Iourt43Parser(b3.parser.Parser):
         """
         Return the current map/level name.
         """
-        if not (data := self.write("status")):
+        if not (data := self.query("status")):
             self.warning("getMap: rcon status no response")
             return None
 
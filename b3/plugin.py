@@ -68,6 +68,17 @@ class Plugin:
     loadAfterPlugins = []
     """:type: list"""
 
+    # Whether this plugin may raise VetoEvent to stop the event from reaching the following
+    # handlers: when events are dispatched in parallel such plugins are still run in order on
+    # the event handling thread, so that their veto is honoured.
+    requiresVeto = False
+    """:type: bool"""
+
+    # When events are dispatched in parallel, plugins sharing the same dispatch group share one
+    # worker thread (and see events in the same order). By default each plugin gets its own.
+    dispatchGroup = None
+    """:type: str"""
+
     # Default messages which can be retrieved using the getMessage method: this dict will be
     # used in place of a missing 'messages' configuration file section.
     _default_messages = {}
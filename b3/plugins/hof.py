@@ -24,11 +24,9 @@ def record_holder(
 ) -> Record:
     if map_name is None:
         map_name = console.game.mapName
-    q = (
-        "SELECT * FROM plugin_hof "
-        f"WHERE plugin_name='{plugin_name}' and map_name='{map_name}'"
-    )
-    with console.storage.query(q) as cursor:
+    with console.storage.select(
+        "plugin_hof", {"plugin_name": plugin_name, "map_name": map_name}, limit=1
+    ) as cursor:
         if (r := cursor.getOneRow()) and (
             clients := console.clients.getByDB(f"@{r['player_id']}")
         ):
@@ -52,20 +50,24 @@ def update_hall_of_fame(
     try:
         curr_record = record_holder(console, plugin_name, map_name)
     except LookupError:
-        q = (
-            f"INSERT INTO plugin_hof(plugin_name, map_name, player_id, score) "
-            f"VALUES('{plugin_name}', '{map_name}', {client.id}, {score})"
-            ""
+        console.storage.insert(
+            "plugin_hof",
+            {
+                "plugin_name": plugin_name,
+                "map_name": map_name,
+                "player_id": client.id,
+                "score": score,
+            },
         )
     else:
         if curr_record.score >= score:
             return curr_record
-        q = (
-            f"UPDATE plugin_hof SET player_id={client.id}, score={score} "
-            f"WHERE plugin_name='{plugin_name}' and map_name='{map_name}'"
+        console.storage.update(
+            "plugin_hof",
+            {"player_id": client.id, "score": score},
+            {"plugin_name": plugin_name, "map_name": map_name},
         )
 
-    console.storage.query(q)
     return Record(
         plugin_name=plugin_name,
         map_name=map_name,
@@ -10,6 +10,7 @@ import b3.config
 import b3.cron
 import b3.events
 import b3.plugin
+from b3.clients import PluginVars
 from b3.functions import clamp
 
 from . import __author__, __version__
@@ -185,6 +186,21 @@ class Poweradminurt43Plugin(b3.plugin.Plugin):
     _rsp_falloffRate = 2  # spam points will fall off by 1 point every 4 seconds
     _rsp_maxSpamins = 10
 
+    def __init__(self, console, config=None):
+        super().__init__(console, config)
+        # client variables updated on every kill and hit
+        self._slot_kills = PluginVars.slot(self, "kills")
+        self._slot_deaths = PluginVars.slot(self, "deaths")
+        self._slot_teamkills = PluginVars.slot(self, "teamkills")
+        self._slot_teamcontribhist = PluginVars.slot(self, "teamcontribhist")
+        self._slot_hitvars = PluginVars.slot(self, "hitvars")
+        self._slot_totalhits = PluginVars.slot(self, "totalhits")
+        self._slot_totalhitted = PluginVars.slot(self, "totalhitted")
+        self._slot_headhits = PluginVars.slot(self, "headhits")
+        self._slot_headhitted = PluginVars.slot(self, "headhitted")
+        self._slot_helmethits = PluginVars.slot(self, "helmethits")
+        self._slot_torsohitted = PluginVars.slot(self, "torsohitted")
+
     def onStartup(self):
         try:
             self._hitlocations["HL_HEAD"] = self.console.HL_HEAD
@@ -686,15 +702,15 @@ class Poweradminurt43Plugin(b3.plugin.Plugin):
     def onKill(self, event):
         killer = event.client
         victim = event.target
-        killer.var(self, "kills", 0).value += 1
-        victim.var(self, "deaths", 0).value += 1
+        killer.slotvar(self._slot_kills, 0).value += 1
+        victim.slotvar(self._slot_deaths, 0).value += 1
         now = self.console.time()
-        killer.var(self, "teamcontribhist", []).value.append((now, 1))
-        victim.var(self, "teamcontribhist", []).value.append((now, -1))
+        killer.slotvar(self._slot_teamcontribhist, []).value.append((now, 1))
+        victim.slotvar(self._slot_teamcontribhist, []).value.append((now, -1))
         self._killhistory.append((now, killer.team))
 
     def onKillTeam(self, event):
-        event.client.var(self, "teamkills", 0).value += 1
+        event.client.slotvar(self._slot_teamkills, 0).value += 1
 
     def onAction(self, event):
         if event.data in (
@@ -1895,34 +1911,28 @@ class Poweradminurt43Plugin(b3.plugin.Plugin):
         if (
             self.isEnabled()
             and self._hsenable
-            and attacker.isvar(self, "hitvars")
-            and victim.isvar(self, "hitvars")
+            and attacker.slotvar(self._slot_hitvars).value
+            and victim.slotvar(self._slot_hitvars).value
             and not self._matchmode
         ):
             hitloc = data[2]
 
             # set totals
-            t = attacker.var(self, "totalhits").value + 1
-            attacker.setvar(self, "totalhits", t)
-            t = victim.var(self, "totalhitted").value + 1
-            victim.setvar(self, "totalhitted", t)
+            attacker.slotvar(self._slot_totalhits).value += 1
+            victim.slotvar(self._slot_totalhitted).value += 1
 
             # headshots... no helmet!
             if hitloc == self._hitlocations["HL_HEAD"]:
-                t = attacker.var(self, "headhits").value + 1
-                attacker.setvar(self, "headhits", t)
-                t = victim.var(self, "headhitted").value + 1
-                victim.setvar(self, "headhitted", t)
+                attacker.slotvar(self._slot_headhits).value += 1
+                victim.slotvar(self._slot_headhitted).value += 1
 
             # helmethits
             elif hitloc == self._hitlocations["HL_HELMET"]:
-                t = attacker.var(self, "helmethits").value + 1
-                attacker.setvar(self, "helmethits", t)
+                attacker.slotvar(self._slot_helmethits).value += 1
 
             # torso... no kevlar!
             elif hitloc == self._hitlocations["HL_TORSO"]:
-                t = victim.var(self, "torsohitted").value + 1
-                victim.setvar(self, "torsohitted", t)
+                victim.slotvar(self._slot_torsohitted).value += 1
 
             # announce headshots
             if self._hsall and hitloc in (
@@ -1930,15 +1940,15 @@ class Poweradminurt43Plugin(b3.plugin.Plugin):
                 self._hitlocations["HL_HELMET"],
             ):
                 headshots = (
-                    attacker.var(self, "headhits").value
-                    + attacker.var(self, "helmethits").value
+                    attacker.slotvar(self._slot_headhits).value
+                    + attacker.slotvar(self._slot_helmethits).value
                 )
                 hstext = "headshots"
                 if headshots == 1:
                     hstext = "headshot"
 
                 percentage = int(
-                    headshots / attacker.var(self, "totalhits").value * 100
+                    headshots / attacker.slotvar(self._slot_totalhits).value * 100
                 )
                 if (
                     self._hspercent
@@ -1963,7 +1973,7 @@ class Poweradminurt43Plugin(b3.plugin.Plugin):
             if (
                 self._hswarnhelmet
                 and victim.connections < 20
-                and victim.var(self, "headhitted").value == self._hswarnhelmetnr
+                and victim.slotvar(self._slot_headhitted).value == self._hswarnhelmetnr
                 and hitloc == self._hitlocations["HL_HEAD"]
             ):
                 victim.message(
@@ -1975,7 +1985,7 @@ class Poweradminurt43Plugin(b3.plugin.Plugin):
             if (
                 self._hswarnkevlar
                 and victim.connections < 20
-                and victim.var(self, "torsohitted").value == self._hswarnkevlarnr
+                and victim.slotvar(self._slot_torsohitted).value == self._hswarnkevlarnr
                 and hitloc == self._hitlocations["HL_TORSO"]
             ):
                 victim.message(
@@ -6,10 +6,12 @@ import b3.plugin
 from b3.functions import clamp
 
 __author__ = "ThorN, Courgette"
-__version__ = "1.4.4"
+__version__ = "1.4.5"
 
 
 class SpamcontrolPlugin(b3.plugin.Plugin):
+    requiresVeto = True
+
     def __init__(self, console, config=None):
         super().__init__(console, config)
         self._maxSpamins = 10
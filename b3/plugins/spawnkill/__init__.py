@@ -1,6 +1,7 @@
 import b3
 import b3.events
 import b3.plugin
+from b3.clients import PluginVars
 
 __author__ = "Fenix"
 __version__ = "1.5.1"
@@ -12,6 +13,7 @@ class SpawnkillPlugin(b3.plugin.Plugin):
     def __init__(self, console, config=None):
         super().__init__(console, config)
         self.penalties = {}
+        self._spawntime = PluginVars.slot(self, "spawntime")
         self.settings = {
             "hit": {
                 "maxlevel": 40,
@@ -91,7 +93,7 @@ class SpawnkillPlugin(b3.plugin.Plugin):
         """
         Handle EVT_CLIENT_SPAWN.
         """
-        event.client.setvar(self, "spawntime", self.console.time())
+        event.client.setslotvar(self._spawntime, self.console.time())
 
     def onDamage(self, event):
         """
@@ -108,7 +110,8 @@ class SpawnkillPlugin(b3.plugin.Plugin):
             )
             return
 
-        if not target.isvar(self, "spawntime"):
+        spawntime = target.slotvar(self._spawntime)
+        if spawntime.value is None:
             self.verbose(
                 "bypassing spawnhit check: %s <@%s> has no spawntime marked",
                 target.name,
@@ -116,10 +119,7 @@ class SpawnkillPlugin(b3.plugin.Plugin):
             )
             return
 
-        if (
-            self.console.time() - target.var(self, "spawntime").toInt()
-            < self.settings["hit"]["delay"]
-        ):
+        if self.console.time() - spawntime.toInt() < self.settings["hit"]["delay"]:
             func = self.penalties[self.settings["hit"]["penalty"]]
             func("hit", client)
 
@@ -138,7 +138,8 @@ class SpawnkillPlugin(b3.plugin.Plugin):
             )
             return
 
-        if not target.isvar(self, "spawntime"):
+        spawntime = target.slotvar(self._spawntime)
+        if spawntime.value is None:
             self.verbose(
                 "bypassing spawnkill check: %s <@%s> has no spawntime marked",
                 target.name,
@@ -146,10 +147,7 @@ class SpawnkillPlugin(b3.plugin.Plugin):
             )
             return
 
-        if (
-            self.console.time() - target.var(self, "spawntime").toInt()
-            < self.settings["kill"]["delay"]
-        ):
+        if self.console.time() - spawntime.toInt() < self.settings["kill"]["delay"]:
             func = self.penalties[self.settings["kill"]["penalty"]]
             func("kill", client)
             # EVENT: produce an event so other plugins can perform other actions
@@ -166,8 +164,9 @@ class SpawnkillPlugin(b3.plugin.Plugin):
         client = event.client
         target = event.target
 
-        if client.maxLevel < self.settings["kill"]["maxlevel"] and target.isvar(
-            self, "spawntime"
+        if (
+            client.maxLevel < self.settings["kill"]["maxlevel"]
+            and target.slotvar(self._spawntime).value is not None
         ):
             # EVENT: produce an event so other plugins can perform other actions
             self.console.queueEvent(
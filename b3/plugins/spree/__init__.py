@@ -1,6 +1,7 @@
 import b3
 import b3.events
 import b3.plugin
+from b3.clients import PluginVars
 
 __author__ = "Walker, ThorN"
 __version__ = "1.2.3"
@@ -32,6 +33,7 @@ class SpreePlugin(b3.plugin.Plugin):
         self._killing_messages = {}
         self._losing_messages = {}
         self._reset_spree_stats = False
+        self._spree_slot = PluginVars.slot(self, self.VAR_NAME)
 
     def onLoadConfig(self) -> None:
         self._reset_spree_stats = self.getSetting(
@@ -100,12 +102,12 @@ class SpreePlugin(b3.plugin.Plugin):
             self.init_spree_stats(c)
 
     def init_spree_stats(self, client):
-        client.setvar(self, self.VAR_NAME, SpreeStats())
+        client.setslotvar(self._spree_slot, SpreeStats())
 
     def get_spree_stats(self, client) -> SpreeStats:
-        if spree_stats := client.var(self, self.VAR_NAME).value:
+        if spree_stats := client.slotvar(self._spree_slot).value:
             return spree_stats
-        return client.setvar(self, self.VAR_NAME, SpreeStats()).value
+        return client.setslotvar(self._spree_slot, SpreeStats()).value
 
     def get_spree_message(self, kills: int, deaths: int) -> str:
         """
@@ -1,4 +1,7 @@
 import contextlib
+import threading
+from array import array
+from bisect import bisect_left, insort
 
 import b3
 import b3.events
@@ -6,7 +9,295 @@ import b3.plugin
 from b3.config import NoOptionError
 
 __author__ = "ThorN, GrosBedo"
-__version__ = "1.5.1"
+__version__ = "1.6.0"
+
+
+class Ranking:
+    """
+    Rows sorted by score, rounded to 2 decimals as displayed, so the best ones
+    are read without sorting every row.
+    """
+
+    def __init__(self):
+        self._sorted = []  # (score, row), ascending
+        self._scores = {}  # row -> score
+
+    def __contains__(self, row):
+        return row in self._scores
+
+    def update(self, row, score):
+        self.discard(row)
+        score = round(score, 2)
+        self._scores[row] = score
+        insort(self._sorted, (score, row))
+
+    def discard(self, row):
+        if (score := self._scores.pop(row, None)) is not None:
+            del self._sorted[bisect_left(self._sorted, (score, row))]
+
+    def best(self):
+        """
+        Iterate the (score, row) pairs from the highest score.
+        """
+        return reversed(self._sorted)
+
+
+class MapStats:
+    """
+    The map stats of the connected clients, stored by column: one typed array per
+    stat, indexed by the row a client is given when first seen in its slot. Each
+    event updates the rows of its clients in a single call, under the lock since
+    the commands read them from other threads. The rows whose points
+    or experience changed are re-ranked when a top list is read, so the lists
+    cost the changes since the last one plus the k clients read.
+    """
+
+    counters = (
+        "shotsTeamHit",
+        "damageTeamHit",
+        "shotsHit",
+        "damageHit",
+        "shotsGot",
+        "damageGot",
+        "teamKills",
+        "kills",
+        "deaths",
+        "assists",
+    )
+    scores = ("pointsLost", "pointsWon", "points", "experience", "oldexperience")
+    ranked = ("points", "experience")
+
+    def __init__(self, startPoints=100.0):
+        """
+        Object constructor.
+        :param startPoints: The skill points of the clients joining
+        """
+        self.startPoints = startPoints
+        # one array attribute per stat: self.kills[row], self.points[row], ...
+        for name in self.counters:
+            setattr(self, name, array("q"))
+        for name in self.scores:
+            setattr(self, name, array("d"))
+        self.owners = []  # row -> client, None for the free rows
+        self.rankings = {name: Ranking() for name in self.ranked}
+        self._changed = {name: set() for name in self.ranked}  # rows to re-rank
+        self._free = []  # rows of the clients gone
+        self._lock = threading.Lock()
+        self._rows = {}  # client -> row
+        self._slots = {}  # slot -> client
+
+    def _row(self, client):
+        """
+        Return the row of a client, starting a new one if it has none. The caller
+        holds the lock.
+        """
+        if (row := self._rows.get(client)) is None:
+            if (previous := self._slots.get(client.cid)) is not None:
+                # the slot changed hands without a disconnection
+                self._remove(previous)
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self.owners)
+                self.owners.append(None)
+                for name in self.counters:
+                    getattr(self, name).append(0)
+                for name in self.scores:
+                    getattr(self, name).append(0.0)
+            for name in self.counters:
+                getattr(self, name)[row] = 0
+            for name in self.scores:
+                getattr(self, name)[row] = 0.0
+            self.points[row] = self.startPoints
+            self.owners[row] = client
+            self._rows[client] = row
+            self._slots[client.cid] = client
+        return row
+
+    def _remove(self, client):
+        if (row := self._rows.pop(client, None)) is not None:
+            del self._slots[client.cid]
+            self.owners[row] = None
+            for name in self.ranked:
+                self.rankings[name].discard(row)
+                self._changed[name].discard(row)
+            self._free.append(row)
+
+    def _score(self, krow, vrow):
+        k = int(self.points[krow])
+        v = int(self.points[vrow])
+
+        if k < 1:
+            k = 1.00
+        if v < 1:
+            v = 1.00
+
+        vshift = (float(v) / float(k)) / 2
+        points = (15.00 * vshift) + 5
+
+        if points < 1:
+            points = 1.00
+        elif points > 100:
+            points = 100.00
+
+        return round(points, 2)
+
+    def _updateXP(self, row):
+        realpoints = self.pointsWon[row] - self.pointsLost[row]
+        if self.deaths[row] != 0:
+            experience = (self.kills[row] * realpoints) / self.deaths[row]
+        else:
+            experience = self.kills[row] * realpoints
+        self.experience[row] = experience * 1.0
+
+    def get(self, client, name):
+        """
+        Return a stat of a client. Reading the points or the experience lists the
+        client in the top lists, like changing them does.
+        :param client: The client
+        :param name: The stat name
+        """
+        with self._lock:
+            row = self._row(client)
+            if name in self._changed:
+                self._changed[name].add(row)
+            return getattr(self, name)[row]
+
+    def set(self, client, name, value):
+        """
+        Change a stat of a client.
+        :param client: The client
+        :param name: The stat name
+        :param value: The new value
+        """
+        with self._lock:
+            row = self._row(client)
+            getattr(self, name)[row] = value
+            if name in self._changed:
+                self._changed[name].add(row)
+
+    def remove(self, client):
+        """
+        Free the row of a client leaving the server.
+        :param client: The client
+        """
+        with self._lock:
+            self._remove(client)
+
+    def score(self, killer, victim):
+        """
+        Return the skill points the killer gets for killing the victim.
+        :param killer: The killer
+        :param victim: The victim
+        """
+        with self._lock:
+            krow = self._row(killer)
+            vrow = self._row(victim)
+            self._changed["points"].update((krow, vrow))
+            return self._score(krow, vrow)
+
+    def damage(self, killer, victim, points):
+        with self._lock:
+            krow = self._row(killer)
+            vrow = self._row(victim)
+            self.shotsHit[krow] += 1
+            self.damageHit[krow] += points
+            self.shotsGot[vrow] += 1
+            self.damageGot[vrow] += points
+
+    def teamDamage(self, killer, points):
+        with self._lock:
+            krow = self._row(killer)
+            self.shotsTeamHit[krow] += 1
+            self.damageTeamHit[krow] += points
+
+    def kill(self, killer, victim, points):
+        with self._lock:
+            krow = self._row(killer)
+            vrow = self._row(victim)
+            self.shotsHit[krow] += 1
+            self.damageHit[krow] += points
+            self.shotsGot[vrow] += 1
+            self.damageGot[vrow] += points
+            self.kills[krow] += 1
+            self.deaths[vrow] += 1
+
+            val = self._score(krow, vrow)
+            self.points[krow] += val
+            self.pointsWon[krow] += val
+            self.points[vrow] -= val
+            self.pointsLost[vrow] += val
+
+            self._updateXP(krow)
+            self._updateXP(vrow)
+            for changed in self._changed.values():
+                changed.update((krow, vrow))
+
+    def teamKill(self, killer, victim, points):
+        with self._lock:
+            krow = self._row(killer)
+            vrow = self._row(victim)
+            self.shotsTeamHit[krow] += 1
+            self.damageTeamHit[krow] += points
+            self.teamKills[krow] += 1
+
+            val = self._score(krow, vrow)
+            self.points[krow] -= val
+            self.pointsLost[krow] += val
+
+            self._updateXP(krow)
+            self._updateXP(vrow)
+            for changed in self._changed.values():
+                changed.update((krow, vrow))
+
+    def assist(self, client):
+        with self._lock:
+            self.assists[self._row(client)] += 1
+
+    def newRound(self, client, resetScore, resetXP):
+        """
+        Reset the round stats of a client.
+        :param client: The client
+        :param resetScore: Whether to reset the skill points too
+        :param resetXP: Whether to drop the experience of the previous rounds
+        """
+        with self._lock:
+            row = self._row(client)
+            for name in self.counters:
+                getattr(self, name)[row] = 0
+            if resetScore:
+                # skill points are reset at the beginning of each map
+                self.pointsLost[row] = 0.0
+                self.pointsWon[row] = 0.0
+                self.points[row] = self.startPoints
+                self._changed["points"].add(row)
+            if not resetXP:
+                self.oldexperience[row] += self.experience[row]
+            self.experience[row] = 0.0
+            self._changed["experience"].add(row)
+
+    def top(self, name, n, isListed):
+        """
+        Return the (score, exact name) of the n best clients by a ranked stat,
+        the ties sorted by name.
+        :param name: The ranked stat
+        :param n: The number of clients
+        :param isListed: Tell whether a client can be listed
+        """
+        found = []
+        with self._lock:
+            ranking = self.rankings[name]
+            column = getattr(self, name)
+            for row in self._changed[name]:
+                ranking.update(row, column[row])
+            self._changed[name].clear()
+            for score, row in ranking.best():
+                if len(found) >= n and score != found[n - 1][0]:
+                    break
+                if isListed(client := self.owners[row]):
+                    found.append((score, client.exactName))
+        found.sort(reverse=True)
+        return found[:n]
 
 
 class StatsPlugin(b3.plugin.Plugin):
@@ -21,6 +312,7 @@ class StatsPlugin(b3.plugin.Plugin):
         self.resetxp = False
         self.show_awards = False
         self.show_awards_xp = False
+        self.mapStats = MapStats(self.startPoints)
 
     def onLoadConfig(self):
         commands_options = []
@@ -79,6 +371,7 @@ class StatsPlugin(b3.plugin.Plugin):
             self.info(
                 "using default value (%s) for settings/startPoints" % self.startPoints
             )
+        self.mapStats.startPoints = self.startPoints
 
         try:
             self.resetscore = self.config.getboolean("settings", "resetscore")
@@ -142,6 +435,7 @@ class StatsPlugin(b3.plugin.Plugin):
         self.registerEvent("EVT_GAME_MAP_CHANGE", self.onShowAwards)
         self.registerEvent("EVT_GAME_ROUND_START", self.onRoundStart)
         self.registerEvent("EVT_ASSIST", self.onAssist)
+        self.registerEvent("EVT_CLIENT_DISCONNECT", self.onDisconnect)
 
     def onShowAwards(self, event):
         if self.show_awards:
@@ -153,135 +447,35 @@ class StatsPlugin(b3.plugin.Plugin):
         for _cid, c in self.console.clients.items():
             if c.maxLevel >= self.mapstatslevel:
                 try:
-                    c.setvar(self, "shotsTeamHit", 0)
-                    c.setvar(self, "damageTeamHit", 0)
-                    c.setvar(self, "shotsHit", 0)
-                    c.setvar(self, "damageHit", 0)
-                    c.setvar(self, "shotsGot", 0)
-                    c.setvar(self, "damageGot", 0)
-                    c.setvar(self, "teamKills", 0)
-                    c.setvar(self, "kills", 0)
-                    c.setvar(self, "deaths", 0)
-                    c.setvar(self, "assists", 0)
-                    if self.resetscore:
-                        # skill points are reset at the beginning of each map
-                        c.setvar(self, "pointsLost", 0)
-                        c.setvar(self, "pointsWon", 0)
-                        c.setvar(self, "points", self.startPoints)
-                    if self.resetxp:
-                        c.setvar(self, "experience", 0.0)
-                    else:
-                        c.var(self, "oldexperience", 0.0).value += c.var(
-                            self, "experience", 0.0
-                        ).value
-                        c.setvar(self, "experience", 0.0)
+                    self.mapStats.newRound(c, self.resetscore, self.resetxp)
                 except Exception as e:
                     self.error(e)
 
-    def onDamage(self, event):
-        killer = event.client
-        victim = event.target
-        points = int(event.data[0])
+    def onDisconnect(self, event):
+        if event.client:
+            self.mapStats.remove(event.client)
 
-        if points > 100:
-            points = 100
+    @staticmethod
+    def _damagePoints(event):
+        return min(int(event.data[0]), 100)
 
-        killer.var(self, "shotsHit", 0).value += 1
-        killer.var(self, "damageHit", 0).value += points
-        victim.var(self, "shotsGot", 0).value += 1
-        victim.var(self, "damageGot", 0).value += points
+    def onDamage(self, event):
+        self.mapStats.damage(event.client, event.target, self._damagePoints(event))
 
     def onDamageTeam(self, event):
-        killer = event.client
-        points = int(event.data[0])
-
-        if points > 100:
-            points = 100
-
-        killer.var(self, "shotsTeamHit", 0).value += 1
-        killer.var(self, "damageTeamHit", 0).value += points
+        self.mapStats.teamDamage(event.client, self._damagePoints(event))
 
     def onKill(self, event):
-        killer = event.client
-        victim = event.target
-        points = int(event.data[0])
-
-        if points > 100:
-            points = 100
-
-        killer.var(self, "shotsHit", 0).value += 1
-        killer.var(self, "damageHit", 0).value += points
-
-        victim.var(self, "shotsGot", 0).value += 1
-        victim.var(self, "damageGot", 0).value += points
-
-        killer.var(self, "kills", 0).value += 1
-        victim.var(self, "deaths", 0).value += 1
-
-        val = self.score(killer, victim)
-        killer.var(self, "points", self.startPoints).value += val
-        killer.var(self, "pointsWon", 0).value += val
-
-        victim.var(self, "points", self.startPoints).value -= val
-        victim.var(self, "pointsLost", 0).value += val
-
-        self.updateXP(killer)
-        self.updateXP(victim)
+        self.mapStats.kill(event.client, event.target, self._damagePoints(event))
 
     def onTeamKill(self, event):
-        killer = event.client
-        victim = event.target
-        points = int(event.data[0])
-
-        if points > 100:
-            points = 100
-
-        killer.var(self, "shotsTeamHit", 0).value += 1
-        killer.var(self, "damageTeamHit", 0).value += points
-
-        killer.var(self, "teamKills", 0).value += 1
-
-        val = self.score(killer, victim)
-        killer.var(self, "points", self.startPoints).value -= val
-        killer.var(self, "pointsLost", 0).value += val
-
-        self.updateXP(killer)
-        self.updateXP(victim)
+        self.mapStats.teamKill(event.client, event.target, self._damagePoints(event))
 
     def onAssist(self, event):
-        event.client.var(self, "assists", 0).value += 1
-
-    def updateXP(self, sclient):
-        realpoints = (
-            sclient.var(self, "pointsWon", 0).value
-            - sclient.var(self, "pointsLost", 0).value
-        )
-        if sclient.var(self, "deaths", 0).value != 0:
-            experience = (
-                sclient.var(self, "kills", 0).value * realpoints
-            ) / sclient.var(self, "deaths", 0).value
-        else:
-            experience = sclient.var(self, "kills", 0).value * realpoints
-        sclient.var(self, "experience", 0.0).value = experience * 1.0
+        self.mapStats.assist(event.client)
 
     def score(self, killer, victim):
-        k = int(killer.var(self, "points", self.startPoints).value)
-        v = int(victim.var(self, "points", self.startPoints).value)
-
-        if k < 1:
-            k = 1.00
-        if v < 1:
-            v = 1.00
-
-        vshift = (float(v) / float(k)) / 2
-        points = (15.00 * vshift) + 5
-
-        if points < 1:
-            points = 1.00
-        elif points > 100:
-            points = 100.00
-
-        return round(points, 2)
+        return self.mapStats.score(killer, victim)
 
     def cmd_mapstats(self, data, client, cmd=None):
         """
@@ -293,19 +487,20 @@ class StatsPlugin(b3.plugin.Plugin):
         else:
             sclient = client
 
+        stats = self.mapStats
         message = (
             "^3Stats ^7[ %s ^7] K ^2%s ^7D ^3%s ^7A ^5%s ^7TK ^1%s ^7Dmg ^5%s ^7Skill ^3%1.02f ^7XP ^6%s"
             % (
                 sclient.exactName,
-                sclient.var(self, "kills", 0).value,
-                sclient.var(self, "deaths", 0).value,
-                sclient.var(self, "assists", 0).value,
-                sclient.var(self, "teamKills", 0).value,
-                sclient.var(self, "damageHit", 0).value,
-                round(sclient.var(self, "points", self.startPoints).value, 2),
+                stats.get(sclient, "kills"),
+                stats.get(sclient, "deaths"),
+                stats.get(sclient, "assists"),
+                stats.get(sclient, "teamKills"),
+                stats.get(sclient, "damageHit"),
+                round(stats.get(sclient, "points"), 2),
                 round(
-                    sclient.var(self, "oldexperience", 0.0).value
-                    + sclient.var(self, "experience", 0.0).value,
+                    stats.get(sclient, "oldexperience")
+                    + stats.get(sclient, "experience"),
                     2,
                 ),
             )
@@ -362,12 +557,12 @@ class StatsPlugin(b3.plugin.Plugin):
             client.message("^3Stats: ^7No top experienced players")
 
     def _top_scores(self, score_kind, top_n=5):
-        scores = [
-            (round(c.var(self, score_kind, self.startPoints).value, 2), c.exactName)
-            for c in self.console.clients.getList()
-            if c.isvar(self, score_kind)
-        ]
-        scores.sort(reverse=True)
+        clients = self.console.clients
+        scores = self.mapStats.top(
+            score_kind,
+            top_n,
+            lambda c: not c.hide and clients.get(c.cid) is c,
+        )
         return [
             f"^3#{i}^7 {name} ^7[^3{score}^7]"
             for i, (score, name) in enumerate(scores[:top_n], start=1)
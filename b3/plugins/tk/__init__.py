@@ -7,6 +7,7 @@ import b3
 import b3.cron
 import b3.events
 import b3.plugin
+from b3.clients import PluginVars
 from b3.config import NoOptionError
 
 __version__ = "1.5"
@@ -147,6 +148,10 @@ class TkPlugin(b3.plugin.Plugin):
         self._crontab_tkhalflife = None
         self._tk_warn_duration = "1h"
 
+        # client variables read on every damage event
+        self._tkinfo = PluginVars.slot(self, "tkinfo")
+        self._checkban = PluginVars.slot(self, "checkBan")
+
     def onLoadConfig(self):
         """
         Load plugin configuration.
@@ -381,7 +386,7 @@ class TkPlugin(b3.plugin.Plugin):
                 event.client.tempban(
                     self.getMessage("ban"), "tk", self.getMultipliers(event.client)[2]
                 )
-            elif event.client.var(self, "checkBan").value:
+            elif event.client.slotvar(self._checkban).value:
                 pass
             else:
                 msg = ""
@@ -412,7 +417,7 @@ class TkPlugin(b3.plugin.Plugin):
                     )
                     + msg
                 )
-                event.client.setvar(self, "checkBan", True)
+                event.client.setslotvar(self._checkban, True)
                 t = threading.Timer(30, self.checkTKBan, (event.client,))
                 t.start()
 
@@ -421,7 +426,7 @@ class TkPlugin(b3.plugin.Plugin):
         Check if we have to tempban a client for teamkilling.
         :param client: The client on who perform the check
         """
-        client.setvar(self, "checkBan", False)
+        client.setslotvar(self._checkban, False)
         tkinfo = self.client_tkinfo(client)
         if tkinfo.points >= self._max_points:
             self.forgive_all(client.cid)
@@ -544,11 +549,11 @@ class TkPlugin(b3.plugin.Plugin):
         """
         Return client teamkill info.
         """
-        if not client.isvar(self, "tkinfo"):
-            client.setvar(self, "tkinfo", TkInfo(self, client.cid))
-        if not client.isvar(self, "checkBan"):
-            client.setvar(self, "checkBan", False)
-        return client.var(self, "tkinfo").value
+        tkinfo = client.slotvar(self._tkinfo)
+        if tkinfo.value is None:
+            tkinfo.value = TkInfo(self, client.cid)
+        client.slotvar(self._checkban, False)
+        return tkinfo.value
 
     def forgive(self, acid, victim, silent=False):
         """
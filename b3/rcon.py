@@ -1,16 +1,24 @@
+import concurrent.futures
 import queue
 import re
 import select
 import socket
 import threading
+import time
 
 import b3.functions
 
 __author__ = "ThorN"
-__version__ = "1.11"
+__version__ = "1.13"
 
 
 class Rcon:
+    """
+    RCON client: commands are exchanged with the game server by a dedicated I/O
+    thread, one at a time since responses carry no request identifier, while
+    callers get futures (submit) or block on them (write).
+    """
+
     socket_timeout = 0.8
     socket_timeout2 = 0.225
     rconreplystring = b"\377\377\377\377print\n"
@@ -31,9 +39,10 @@ class Rcon:
         self.socket.connect(host)
         self.lock = threading.Lock()
         self._stopEvent = object()
+        self._stopped = False
         self.queue = queue.Queue(maxsize=100)
-        self._writelines_thread = b3.functions.start_daemon_thread(
-            target=self._writelines, name="rcon"
+        self._io_thread = b3.functions.start_daemon_thread(
+            target=self._process, name="rcon"
         )
 
     def send_rcon(self, sock, data, maxRetries=None, socketTimeout=None):
@@ -52,6 +61,7 @@ class Rcon:
 
         data = data.strip()
         payload = self.rconsendstring + data.encode(self.console.encoding) + b"\n"
+        self.discard_pending(sock)
 
         retries = 0
         while retries < maxRetries:
@@ -77,6 +87,19 @@ class Rcon:
         self.console.error("RCON: send(%s) too many tries, aborting", data)
         return ""
 
+    def discard_pending(self, sock):
+        """
+        Drop late packets of a previous response so they are not mistaken for
+        the response to the next command.
+        :param sock: The socket from where to read data
+        """
+        while select.select([sock], [], [], 0)[0]:
+            try:
+                payload = sock.recv(4096)
+            except OSError:
+                return
+            self.console.debug("RCON: discarded late packet: %r", payload)
+
     def read_socket(self, sock, size=4096, socketTimeout=0.5):
         """
         Read data from the socket.
@@ -100,17 +123,32 @@ class Rcon:
             return ""
         return data.decode(encoding=self.console.encoding)
 
+    def submit(self, cmd, maxRetries=None, socketTimeout=None):
+        """
+        Queue a RCON command for the I/O thread.
+        :param cmd: The string to be sent
+        :param maxRetries: How many times we have to retry the sending upon failure
+        :param socketTimeout: The socket timeout value
+        :return A concurrent.futures.Future resolved with the command response
+        """
+        future = concurrent.futures.Future()
+        if self._stopped:
+            future.cancel()
+        else:
+            self.queue.put((future, cmd, maxRetries, socketTimeout))
+        return future
+
     def write(self, cmd, maxRetries=None, socketTimeout=None):
         """
-        Write a RCON command.
+        Write a RCON command and wait for its response.
         :param cmd: The string to be sent
         :param maxRetries: How many times we have to retry the sending upon failure
         :param socketTimeout: The socket timeout value
         """
-        with self.lock:
-            data = self.send_rcon(
-                self.socket, cmd, maxRetries=maxRetries, socketTimeout=socketTimeout
-            )
+        try:
+            data = self.submit(cmd, maxRetries, socketTimeout).result()
+        except concurrent.futures.CancelledError:
+            return ""
         return data or ""
 
     def writelines(self, lines):
@@ -118,27 +156,44 @@ class Rcon:
         Enqueue multiple RCON commands for later processing.
         :param lines: A list of RCON commands.
         """
-        self.queue.put(lines)
+        for cmd in lines:
+            if cmd:
+                self.submit(cmd, maxRetries=1)
 
-    def _writelines(self):
+    def _process(self):
         """
-        Write multiple RCON commands on the socket.
+        Send the queued RCON commands, resolving their futures.
         """
         send_rcon = self.send_rcon
         sock = self.socket
         sock_lock = self.lock
-        for lines in iter(self.queue.get, self._stopEvent):
-            for cmd in lines:
-                if cmd:
-                    with sock_lock:
-                        send_rcon(sock, cmd, maxRetries=1)
+        for item in iter(self.queue.get, self._stopEvent):
+            future, cmd, maxRetries, socketTimeout = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with sock_lock:
+                    data = send_rcon(sock, cmd, maxRetries, socketTimeout)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(data)
 
     def stop(self):
         """
-        Stop the rcon writelines queue.
+        Stop the I/O thread once the queued commands are sent.
         """
+        self._stopped = True
         self.queue.put(self._stopEvent)
-        self._writelines_thread.join(timeout=10.0)
+        self._io_thread.join(timeout=10.0)
+        # cancel whatever could not be sent in time
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._stopEvent:
+                item[0].cancel()
 
     def close(self):
         self.stop()
@@ -150,3 +205,82 @@ class Rcon:
             f"Rcon({self.host}, "
             f"timeout={self.socket_timeout}, timeout2={self.socket_timeout2})"
         )
+
+
+class ResponseCache:
+    """
+    Share the responses of read-only RCON queries (status, players, cvars) for a
+    short time: callers asking while the same query is in flight wait for it.
+    """
+
+    def __init__(self, ttl=1.0):
+        """
+        :param ttl: The number of seconds a response is reused for
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._responses = {}
+        self._inflight = {}
+
+    def get(self, cmd, fetch):
+        """
+        Return the response to a query, calling fetch(cmd) on a miss.
+        :param cmd: The RCON query
+        :param fetch: The function sending the query to the server
+        """
+        with self._lock:
+            if (entry := self._responses.get(cmd)) and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            if (future := self._inflight.get(cmd)) is not None:
+                self.shared += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = self._inflight[cmd] = concurrent.futures.Future()
+                generation = self._generation
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            response = fetch(cmd)
+        except BaseException as e:
+            with self._lock:
+                if self._inflight.get(cmd) is future:
+                    del self._inflight[cmd]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if self._inflight.get(cmd) is future:
+                del self._inflight[cmd]
+            # an empty response means the server did not answer: do not keep it
+            if response and generation == self._generation:
+                self._responses[cmd] = (time.monotonic() + self.ttl, response)
+        future.set_result(response)
+        return response
+
+    def invalidate(self, cmd=None):
+        """
+        Forget the cached responses after a command that may change them.
+        :param cmd: The command written to the server, a query being fetched by
+                    this cache does not invalidate anything
+        """
+        with self._lock:
+            if cmd is not None and cmd in self._inflight:
+                return
+            self._generation += 1
+            self._responses.clear()
+            self._inflight.clear()
+
+    def __str__(self):
+        return (
+            f"ResponseCache(ttl={self.ttl}, hits={self.hits}, "
+            f"shared={self.shared}, misses={self.misses})"
+        )
@@ -0,0 +1,429 @@
+"""
+Replay a recorded game log through the parser and the plugins, offline: RCON is
+answered by a scripted stand-in and storage is an in-memory SQLite database.
+Report lines/s, events/s, the time spent by each plugin handling events and the
+peak memory usage.
+
+usage: python -m b3.replay games.log [--plugins admin,stats,spree] [--json out.json]
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+import b3
+import b3.config
+import b3.events
+import b3.functions
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+__author__ = "urt30plus"
+__version__ = "1.0"
+
+DEFAULT_PLUGINS = ("admin",)
+
+_TEAM_NAMES = {
+    b3.TEAM_RED: "RED",
+    b3.TEAM_BLUE: "BLUE",
+    b3.TEAM_SPEC: "SPECTATOR",
+}
+
+
+class ReplayRcon:
+    """
+    Scripted stand-in for b3.rcon.Rcon: status and players queries are answered
+    from the clients the replay connected, cvar queries from a dict and any
+    other command from the scripted responses (empty response by default).
+    """
+
+    def __init__(self, console, responses=None, cvars=None):
+        """
+        :param console: The console implementation
+        :param responses: dict of command -> response overriding the defaults
+        :param cvars: dict of cvar name -> value answered to cvar queries
+        """
+        self.console = console
+        self.responses = dict(responses or {})
+        self.cvars = {"gamename": "q3urt43", "g_gametype": "4", "sv_maxclients": "32"}
+        self.cvars.update(cvars or {})
+        self.commands = Counter()
+
+    def write(self, cmd, maxRetries=None, socketTimeout=None):
+        """
+        Answer a RCON command.
+        :param cmd: The command
+        :param maxRetries: Unused
+        :param socketTimeout: Unused
+        """
+        cmd = cmd.strip()
+        self.commands[cmd.split(" ", 1)[0]] += 1
+        if cmd in self.responses:
+            return self.responses[cmd]
+        if cmd == "status":
+            return self._status()
+        if cmd == "players":
+            return self._players()
+        if cmd in self.cvars:
+            value = self.cvars[cmd]
+            return f'"{cmd}" is:"{value}^7" default:"{value}^7"'
+        return ""
+
+    def submit(self, cmd, maxRetries=None, socketTimeout=None):
+        future = concurrent.futures.Future()
+        future.set_result(self.write(cmd, maxRetries, socketTimeout))
+        return future
+
+    def writelines(self, lines):
+        for cmd in lines:
+            if cmd:
+                self.write(cmd)
+
+    def _connected(self):
+        return sorted(
+            (c for c in self.console.clients.getList() if c.cid is not None),
+            key=lambda c: int(c.cid),
+        )
+
+    def _status(self):
+        rows = [
+            f"map: {self.console.game._mapName or 'ut4_turnpike'}",
+            "num score ping name            lastmsg address               qport rate",
+            "--- ----- ---- --------------- ------- --------------------- ----- -----",
+        ]
+        rows.extend(
+            f"{c.cid:>3}     0   50 {c.name}^7 0 {c.ip or '127.0.0.1'}:27960 1234 25000"
+            for c in self._connected()
+        )
+        return "\n".join(rows) + "\n"
+
+    def _players(self):
+        rows = [
+            f"Map: {self.console.game._mapName or 'ut4_turnpike'}",
+            f"Players: {len(self._connected())}",
+            "Scores: R:0 B:0",
+        ]
+        rows.extend(
+            f"{c.cid}: {c.name} {_TEAM_NAMES.get(c.team, 'FREE')} k:0 d:0 ping:50 {c.ip or '127.0.0.1'}:27960"
+            for c in self._connected()
+        )
+        return "\n".join(rows) + "\n"
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __str__(self):
+        return "ReplayRcon()"
+
+
+class ReplayResult:
+    """
+    Measurements of a replay.
+    """
+
+    def __init__(
+        self, lines, elapsed, events, shed, plugins, rcon, peak_rss, peak_traced
+    ):
+        self.lines = lines  # number of non empty game log lines parsed
+        self.elapsed = elapsed  # seconds from the first line to the last event handled
+        self.events = events  # Counter of queued event keys
+        self.shed = shed  # Counter of event keys shed by the full event queue
+        self.plugins = (
+            plugins  # dict of plugin -> (events handled, total time, max time)
+        )
+        self.rcon = rcon  # Counter of RCON commands sent
+        self.peak_rss = peak_rss  # peak resident set size of the process in KiB
+        self.peak_traced = peak_traced  # peak memory allocated while replaying in KiB
+
+    @property
+    def linesPerSecond(self):
+        return self.lines / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eventsPerSecond(self):
+        return self.events.total() / self.elapsed if self.elapsed else 0.0
+
+    def asDict(self):
+        """
+        Return the measurements as a JSON serializable dict.
+        """
+        return {
+            "lines": self.lines,
+            "elapsed": self.elapsed,
+            "lines_per_second": self.linesPerSecond,
+            "events": self.events.total(),
+            "events_per_second": self.eventsPerSecond,
+            "shed": dict(self.shed),
+            "plugins": {
+                name: {"events": count, "total": total, "max": longest}
+                for name, (count, total, longest) in self.plugins.items()
+            },
+            "rcon": dict(self.rcon),
+            "peak_rss_kib": self.peak_rss,
+            "peak_traced_kib": self.peak_traced,
+        }
+
+    def report(self):
+        """
+        Return a human readable report of the measurements.
+        """
+        out = [
+            f"lines      : {self.lines} in {self.elapsed:0.3f}s ({self.linesPerSecond:0.0f} lines/s)",
+            f"events     : {self.events.total()} ({self.eventsPerSecond:0.0f} events/s)",
+        ]
+        if self.shed:
+            out.append(
+                "shed       : "
+                + ", ".join(f"{k}({v})" for k, v in self.shed.most_common())
+            )
+        if self.peak_rss is not None:
+            out.append(f"peak RSS   : {self.peak_rss} KiB")
+        if self.peak_traced is not None:
+            out.append(f"peak traced: {self.peak_traced} KiB")
+        out.append("plugins    : events  total(s)  mean(ms)  max(ms)")
+        for name, (count, total, longest) in sorted(
+            self.plugins.items(), key=lambda item: item[1][1], reverse=True
+        ):
+            out.append(
+                f"  {name:<28} {count:>7} {total:>9.4f} {total * 1000 / count:>9.4f} {longest * 1000:>8.3f}"
+            )
+        out.append(
+            "events     : "
+            + ", ".join(f"{k}({v})" for k, v in self.events.most_common())
+        )
+        out.append(
+            "rcon       : " + ", ".join(f"{k}({v})" for k, v in self.rcon.most_common())
+        )
+        return "\n".join(out)
+
+
+def replayConfig(
+    game_log,
+    plugins=DEFAULT_PLUGINS,
+    parser="iourt43",
+    logfile=None,
+    log_level=20,
+    batch_lines=500,
+):
+    """
+    Build the main configuration used to replay a game log.
+    :param game_log: The path of the game log to replay
+    :param plugins: The names of the plugins to load (admin is always loaded)
+    :param parser: The parser name
+    :param logfile: The B3 log file, defaults to b3_replay.log in the temp directory
+    :param log_level: The B3 log level
+    :param batch_lines: The number of lines parsed per batch
+    """
+    if logfile is None:
+        logfile = os.path.join(tempfile.gettempdir(), "b3_replay.log")
+    names = ["admin", *(p for p in plugins if p != "admin")]
+    plugins_section = "\n".join(
+        f"{name}: @b3/conf/plugin_{name}.ini"
+        if os.path.isfile(b3.functions.getAbsolutePath(f"@b3/conf/plugin_{name}.ini"))
+        else f"{name}:"
+        for name in names
+    )
+    config = b3.config.CfgConfigParser(allow_no_value=True)
+    config.loadFromString(
+        f"""
+[b3]
+parser: {parser}
+database: sqlite://:memory:
+bot_name: b3
+bot_prefix: ^0(^2b3^0)^7:
+time_format: %I:%M%p %Z %m/%d/%y
+time_zone: UTC
+log_level: {log_level}
+logsize: 50MB
+logfile: {logfile}
+disabled_plugins:
+external_plugins_dir: @b3/extplugins
+# deep enough for a batch of lines not to shed events
+event_queue_size: 5000
+
+[server]
+rcon_password: replay
+port: 27960
+public_ip: 127.0.0.1
+rcon_ip: 127.0.0.1
+game_log: {os.path.abspath(game_log)}
+seek: no
+delay: 0.33
+lines_per_second: 1000
+batch_lines: {batch_lines}
+
+[plugins]
+{plugins_section}
+"""
+    )
+    return b3.config.MainConfig(config)
+
+
+def replay(
+    game_log,
+    plugins=DEFAULT_PLUGINS,
+    parser="iourt43",
+    responses=None,
+    cvars=None,
+    logfile=None,
+    log_level=20,
+    batch_lines=500,
+    trace_memory=False,
+):
+    """
+    Replay a game log through the parser and the given plugins.
+    :param game_log: The path of the game log to replay
+    :param plugins: The names of the plugins to load (admin is always loaded)
+    :param parser: The parser name
+    :param responses: dict of RCON command -> scripted response
+    :param cvars: dict of cvar name -> value answered to cvar queries
+    :param logfile: The B3 log file, defaults to b3_replay.log in the temp directory
+    :param log_level: The B3 log level
+    :param batch_lines: The number of lines parsed per batch
+    :param trace_memory: Whether to measure the peak memory allocated while replaying
+    :return A ReplayResult instance
+    """
+    config = replayConfig(game_log, plugins, parser, logfile, log_level, batch_lines)
+    if not b3.confdir:
+        # resolves @conf paths like the main config directory would
+        b3.confdir = b3.functions.getAbsolutePath("@b3/conf")
+    parser_class = b3.functions.loadParser(parser)
+    # do not probe a real game server for RCON
+    replay_class = type(
+        f"Replay{parser_class.__name__}", (parser_class,), {"rconTest": False}
+    )
+
+    stdout, stderr = sys.stdout, sys.stderr
+    try:
+        b3.console = console = replay_class(config, None)
+    finally:
+        # the parser redirects the standard streams to its log file
+        sys.stdout, sys.stderr = stdout, stderr
+
+    console.output.close()
+    console.output = ReplayRcon(console, responses, cvars)
+    console._eventsStats = b3.events.EventsStats(console, max_samples=None)
+
+    events = Counter()
+    queue_event = console.queueEvent
+
+    def countingQueueEvent(event, expire=None):
+        events[console.getEventKey(event.type)] += 1
+        return queue_event(event, expire)
+
+    console.queueEvent = countingQueueEvent
+
+    console.startup()
+    console.call_plugins_onLoadConfig()
+    console.startPlugins()
+    console.pluginsStarted()
+    events.clear()
+
+    if trace_memory:
+        tracemalloc.start()
+    console._event_handling_thread = b3.functions.start_daemon_thread(
+        target=console.handleEvents, name="event_handler"
+    )
+    start = time.perf_counter()
+    while console._ingest_batch():
+        pass
+    queue_event(console.getEvent("EVT_STOP"))
+    console._event_handling_thread.join()
+    elapsed = time.perf_counter() - start
+    peak_traced = None
+    if trace_memory:
+        peak_traced = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    console.follower.close()
+    console.input.close()
+    console.working = False
+
+    with open(game_log, encoding=console.encoding, errors="replace") as f:
+        lines = sum(1 for line in f if line.strip())
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+    return ReplayResult(
+        lines,
+        elapsed,
+        events,
+        Counter(console.queue.shed),
+        console._eventsStats.plugin_totals(),
+        console.output.commands,
+        peak_rss,
+        peak_traced,
+    )
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(
+        prog="python -m b3.replay", description=__doc__.strip().splitlines()[0]
+    )
+    p.add_argument("game_log", help="the recorded game log to replay")
+    p.add_argument(
+        "--plugins",
+        default=",".join(DEFAULT_PLUGINS),
+        help="comma separated list of plugins to load (admin is always loaded)",
+    )
+    p.add_argument("--parser", default="iourt43", help="the parser to use")
+    p.add_argument(
+        "--rcon",
+        metavar="FILE",
+        help="JSON file of RCON command -> response to script the game server",
+    )
+    p.add_argument(
+        "--batch-lines",
+        type=int,
+        default=500,
+        help="the number of lines parsed per batch",
+    )
+    p.add_argument(
+        "--log",
+        metavar="FILE",
+        help="the B3 log file (default: b3_replay.log in the temp directory)",
+    )
+    p.add_argument("--log-level", type=int, default=20, help="the B3 log level")
+    p.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="trace Python allocations to report their peak (slower)",
+    )
+    p.add_argument(
+        "--json", metavar="FILE", help="also write the measurements to a JSON file"
+    )
+    options = p.parse_args(argv)
+
+    responses = None
+    if options.rcon:
+        with open(options.rcon) as f:
+            responses = json.load(f)
+
+    result = replay(
+        options.game_log,
+        plugins=[name.strip() for name in options.plugins.split(",") if name.strip()],
+        parser=options.parser,
+        responses=responses,
+        logfile=options.log,
+        log_level=options.log_level,
+        batch_lines=options.batch_lines,
+        trace_memory=options.tracemalloc,
+    )
+    print(result.report())
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump(result.asDict(), f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,8 @@
+-- indexes for the per client lookups done when players connect
+-- (numPenalties, getClientLastPenalty, getClientsMatching pbid, aliases)
+CREATE INDEX IF NOT EXISTS `idx_penalties_client` ON `penalties` (`client_id`, `type`, `inactive`, `time_expire`);
+CREATE INDEX IF NOT EXISTS `idx_penalties_type_time_add` ON `penalties` (`type`, `inactive`, `time_add`);
+CREATE INDEX IF NOT EXISTS `idx_clients_pbid` ON `clients` (`pbid`);
+CREATE INDEX IF NOT EXISTS `idx_aliases_client_id` ON `aliases` (`client_id`);
+CREATE INDEX IF NOT EXISTS `idx_ipaliases_client_id` ON `ipaliases` (`client_id`);
+ANALYZE;
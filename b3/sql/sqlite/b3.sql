@@ -8,6 +8,8 @@ CREATE TABLE IF NOT EXISTS `aliases` (
   CONSTRAINT `alias` UNIQUE (`alias`,`client_id`)
 );
 
+CREATE INDEX IF NOT EXISTS `idx_aliases_client_id` ON `aliases` (`client_id`);
+
 CREATE TABLE IF NOT EXISTS `ipaliases` (
   `id` INTEGER PRIMARY KEY AUTOINCREMENT,
   `num_used` INTEGER(10) NOT NULL DEFAULT '0',
@@ -18,6 +20,8 @@ CREATE TABLE IF NOT EXISTS `ipaliases` (
   CONSTRAINT `ipalias` UNIQUE (`ip`,`client_id`)
 );
 
+CREATE INDEX IF NOT EXISTS `idx_ipaliases_client_id` ON `ipaliases` (`client_id`);
+
 CREATE TABLE IF NOT EXISTS `clients` (
   `id` INTEGER PRIMARY KEY AUTOINCREMENT,
   `ip` VARCHAR(16) NOT NULL DEFAULT '',
@@ -36,6 +40,8 @@ CREATE TABLE IF NOT EXISTS `clients` (
   CONSTRAINT `guid` UNIQUE (`guid`)
 );
 
+CREATE INDEX IF NOT EXISTS `idx_clients_pbid` ON `clients` (`pbid`);
+
 CREATE TABLE IF NOT EXISTS `groups` (
   `id` INTEGER PRIMARY KEY,
   `name` VARCHAR(32) NOT NULL DEFAULT '',
@@ -70,6 +76,9 @@ CREATE TABLE IF NOT EXISTS `penalties` (
   `time_expire` INTEGER(11) NOT NULL DEFAULT '0'
 );
 
+CREATE INDEX IF NOT EXISTS `idx_penalties_client` ON `penalties` (`client_id`, `type`, `inactive`, `time_expire`);
+CREATE INDEX IF NOT EXISTS `idx_penalties_type_time_add` ON `penalties` (`type`, `inactive`, `time_add`);
+
 CREATE TABLE IF NOT EXISTS `data` (
   `data_key` VARCHAR(255) NOT NULL PRIMARY KEY,
   `data_value` VARCHAR(255) NOT NULL
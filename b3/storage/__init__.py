@@ -26,9 +26,15 @@ class Storage:
     def getClientsMatching(self, match):
         raise NotImplementedError
 
+    def prefetchClients(self, clients):
+        raise NotImplementedError
+
     def setClient(self, client):
         raise NotImplementedError
 
+    def setClients(self, clients):
+        raise NotImplementedError
+
     def setClientAlias(self, alias):
         raise NotImplementedError
 
@@ -71,12 +77,33 @@ class Storage:
     def numPenalties(self, client, type="Ban"):
         raise NotImplementedError
 
+    def loadPenaltySummary(self, client):
+        raise NotImplementedError
+
+    def loadPenaltySummaries(self, clients):
+        raise NotImplementedError
+
+    def dropPenaltySummary(self, client):
+        raise NotImplementedError
+
+    def enableWal(self, readers=2, synchronous="NORMAL"):
+        raise NotImplementedError
+
     def getGroups(self):
         raise NotImplementedError
 
     def getGroup(self, group):
         raise NotImplementedError
 
+    def setGroup(self, group):
+        raise NotImplementedError
+
+    def getGroupRegistry(self):
+        raise NotImplementedError
+
+    def invalidateGroups(self):
+        raise NotImplementedError
+
     def getTables(self):
         raise NotImplementedError
 
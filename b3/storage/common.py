@@ -1,8 +1,10 @@
+import contextlib
 import os
 import re
 import sys
 import threading
-from time import time
+from collections import Counter
+from time import perf_counter, time
 
 import b3.functions
 from b3.clients import (
@@ -15,7 +17,9 @@ from b3.clients import (
     Penalty,
 )
 from b3.storage import Storage
+from b3.storage.cursor import ColumnMap, FetchedCursor
 from b3.storage.cursor import Cursor as DBCursor
+from b3.storage.penalties import PenaltySummary
 
 
 class QueryBuilder:
@@ -261,12 +265,475 @@ class QueryBuilder:
         return sql
 
 
+class Statements:
+    """
+    Build parameterized SQL statements: the text of a statement is built once per
+    query shape (table, columns, operators, number of IN values, ordering) and the
+    values are bound to its placeholders, so the database keeps running the same
+    few statements and its prepared statement cache gets hits.
+    WHERE clauses are dicts using the QueryBuilder field syntax ('time_add>=',
+    '%name%', '&group_bits', list values for IN).
+    """
+
+    _operators = (">=", "<=", "<", ">", "=")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._sql = {}  # query shape -> SQL text
+
+    def __len__(self):
+        """
+        Return the number of distinct statements built.
+        """
+        return len(self._sql)
+
+    @property
+    def hitRate(self):
+        """
+        Return the fraction of statements which did not have to be built.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def select(
+        self,
+        table,
+        where=None,
+        orderby=None,
+        limit=None,
+        fields="*",
+        condition=None,
+        args=(),
+    ):
+        """
+        Return a SQL select statement and its parameters.
+        :param table: The table from where to fetch data.
+        :param where: A dict of fields and values to match.
+        :param orderby: The ORDER BY clause for this select statement.
+        :param limit: The amount of rows to collect.
+        :param fields: '*', the list of columns to select or a SQL expression.
+        :param condition: A SQL condition ANDed to the where clause.
+        :param args: The values of the placeholders of condition.
+        :return A (sql, parameters) tuple
+        """
+        if isinstance(fields, list):
+            fields = tuple(fields)  # part of the shape, which must be hashable
+        shape, params = self._where(where)
+        sql = self._get(
+            ("SELECT", table, fields, shape, condition, orderby, limit is not None)
+        )
+        params.extend(args)
+        if limit is not None:
+            params.append(limit)
+        return sql, params
+
+    def update(self, table, data, where):
+        """
+        Return a SQL update statement and its parameters.
+        :param table: The table to update.
+        :param data: A dict of the columns to set.
+        :param where: A dict of fields and values to match.
+        :return A (sql, parameters) tuple
+        """
+        shape, params = self._where(where)
+        sql = self._get(("UPDATE", table, tuple(data), shape))
+        return sql, [self._value(v) for v in data.values()] + params
+
+    def insert(self, table, data):
+        """
+        Return a SQL insert statement and its parameters.
+        :param table: The table where to insert the row.
+        :param data: A dict of the columns to set.
+        :return A (sql, parameters) tuple
+        """
+        sql = self._get(("INSERT", table, tuple(data)))
+        return sql, [self._insertValue(v) for v in data.values()]
+
+    def _get(self, shape):
+        """
+        Return the SQL text of a query shape, building it on the first use.
+        """
+        if (sql := self._sql.get(shape)) is not None:
+            self.hits += 1
+            return sql
+        self.misses += 1
+        sql = self._sql[shape] = getattr(self, f"_build{shape[0].title()}")(*shape[1:])
+        return sql
+
+    @staticmethod
+    def _value(value):
+        # as QueryBuilder.FieldClause: None is matched and set as an empty string
+        return "" if value is None else value
+
+    @staticmethod
+    def _insertValue(value):
+        # as QueryBuilder.InsertQuery, which escaped None to the string "None"
+        return "None" if value is None else value
+
+    def _where(self, where):
+        """
+        Return the shape of a where clause and the values to bind to it.
+        """
+        if not where:
+            return (), []
+        shape = []
+        params = []
+        for field, value in where.items():
+            if isinstance(value, list | tuple):
+                shape.append((field, len(value)))
+                params.extend(value)
+                continue
+            shape.append((field, None))
+            value = self._value(value)
+            if field[-1] == "%":
+                value = f"{value}%"
+            if field[0] == "%":
+                value = f"%{value}"
+            params.append(value)
+        return tuple(shape), params
+
+    def _buildWhere(self, shape):
+        terms = []
+        for field, count in shape:
+            field = field.strip()
+            if count is not None:
+                terms.append(f"`{field}` IN ({', '.join('?' * count)})")
+            elif field[0] == "%" or field[-1] == "%":
+                terms.append(f"`{field.strip('%').strip()}` LIKE ?")
+            elif field[0] in "&|":
+                terms.append(f"`{field[1:].strip()}` {field[0]} ?")
+            else:
+                for op in self._operators:
+                    if field.endswith(op):
+                        terms.append(f"`{field[: -len(op)].strip()}` {op} ?")
+                        break
+                else:
+                    terms.append(f"`{field}` = ?")
+        return " AND ".join(terms)
+
+    def _buildSelect(self, table, fields, shape, condition, orderby, limit):
+        if isinstance(fields, tuple | list):
+            fields = "`%s`" % "`, `".join(fields)
+        sql = f"SELECT {fields} FROM {table}"
+        terms = [self._buildWhere(shape)] if shape else []
+        if condition:
+            terms.append(condition)
+        if terms:
+            sql += f" WHERE {' AND '.join(terms)}"
+        if orderby:
+            sql += f" ORDER BY {orderby}"
+        if limit:
+            sql += " LIMIT ?"
+        return sql
+
+    def _buildUpdate(self, table, columns, shape):
+        sets = ", ".join(f"`{c}` = ?" for c in columns)
+        return f"UPDATE {table} SET {sets} WHERE {self._buildWhere(shape)}"
+
+    def _buildInsert(self, table, columns):
+        return (
+            f"INSERT INTO {table} (`{'`, `'.join(columns)}`) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+
+    def __str__(self):
+        return (
+            f"Statements(distinct={len(self)}, hits={self.hits}, "
+            f"misses={self.misses}, hit_rate={self.hitRate:.1%})"
+        )
+
+
+class WriteQueue:
+    """
+    Write-behind queue: update statements are queued and a storage thread runs
+    them in a single transaction every `interval` seconds or as soon as `maxRows`
+    are waiting. Every queued statement is keyed by (table, client ID) so that
+    reads about a client can flush the writes still pending for it.
+    """
+
+    def __init__(self, storage, interval=0.5, maxRows=100):
+        """
+        :param storage: The DatabaseStorage running the statements
+        :param interval: The maximum number of seconds a write waits in the queue
+        :param maxRows: The number of queued writes which triggers a flush
+        """
+        self.storage = storage
+        self.interval = interval
+        self.maxRows = maxRows
+        self.flushes = 0
+        self.rows = 0
+        self.largestBatch = 0
+        self._lock = threading.Lock()  # guards the pending writes
+        self._flushLock = threading.Lock()  # one batch at a time, in order
+        self._pending = []  # (key, sql, params)
+        self._keys = Counter()  # (table, client ID) -> writes queued or in flight
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        """
+        Start the storage thread.
+        """
+        self._thread = b3.functions.start_daemon_thread(
+            target=self._run, name="storage"
+        )
+
+    def put(self, key, sql, params):
+        """
+        Queue a write.
+        :param key: The (table, client ID) the write is about
+        :param sql: The SQL statement
+        :param params: The values to bind to the statement
+        """
+        with self._lock:
+            self._pending.append((key, sql, params))
+            self._keys[key] += 1
+            full = len(self._pending) >= self.maxRows
+        if full:
+            self._wakeup.set()
+
+    def isPending(self, table=None, clientId=None):
+        """
+        Tell whether writes are queued, or not committed yet.
+        :param table: Only consider the writes to this table
+        :param clientId: Only consider the writes about this client
+        """
+        with self._lock:
+            if table is None:
+                return bool(self._keys)
+            if clientId is None:
+                return any(key[0] == table for key in self._keys)
+            return (table, clientId) in self._keys
+
+    def __len__(self):
+        """
+        Return the number of queued writes.
+        """
+        return len(self._pending)
+
+    def flush(self):
+        """
+        Run the queued writes in a single transaction.
+        :return: The number of writes run
+        """
+        with self._flushLock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                self.storage.queryMany([(sql, params) for _, sql, params in batch])
+            finally:
+                # keys are released once committed: readers waiting on them see the writes
+                with self._lock:
+                    self._keys.subtract(key for key, _, _ in batch)
+                    self._keys = +self._keys
+            self.flushes += 1
+            self.rows += len(batch)
+            self.largestBatch = max(self.largestBatch, len(batch))
+            return len(batch)
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.storage.console.error("Could not flush queued writes: %r", e)
+
+    def stop(self):
+        """
+        Stop the storage thread and run the writes still queued.
+        """
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10.0)
+        self.flush()
+
+    def __str__(self):
+        return (
+            f"WriteQueue(interval={self.interval}, max_rows={self.maxRows}, "
+            f"queued={len(self)}, flushes={self.flushes}, rows={self.rows}, "
+            f"largest_batch={self.largestBatch})"
+        )
+
+
+class QueryStats:
+    """
+    Count the queries run by kind (SELECT, INSERT, UPDATE...) along with the time
+    spent waiting for a connection and the time spent running them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}  # kind -> [queries, wait time, max wait, run time, max run]
+
+    @staticmethod
+    def kind(query):
+        """
+        Return the kind of a query: its first keyword.
+        """
+        words = query.split(None, 1)
+        return words[0].upper() if words else ""
+
+    def add(self, kind, wait, elapsed):
+        """
+        Account for a query.
+        :param kind: The kind of the query
+        :param wait: The seconds spent waiting for the connection
+        :param elapsed: The seconds spent running the query
+        """
+        with self._lock:
+            if (stats := self._stats.get(kind)) is None:
+                stats = self._stats[kind] = [0, 0.0, 0.0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += wait
+            stats[2] = max(stats[2], wait)
+            stats[3] += elapsed
+            stats[4] = max(stats[4], elapsed)
+
+    def asDict(self):
+        """
+        Return the statistics of each kind of query.
+        """
+        with self._lock:
+            return {
+                kind: {
+                    "queries": n,
+                    "wait": wait,
+                    "max_wait": max_wait,
+                    "time": elapsed,
+                    "max_time": max_elapsed,
+                }
+                for kind, (n, wait, max_wait, elapsed, max_elapsed) in sorted(
+                    self._stats.items()
+                )
+            }
+
+    def __str__(self):
+        return "QueryStats(%s)" % ", ".join(
+            f"{kind}: {s['queries']} queries, wait {s['wait'] * 1000:.1f}ms "
+            f"(max {s['max_wait'] * 1000:.1f}ms), time {s['time'] * 1000:.1f}ms "
+            f"(max {s['max_time'] * 1000:.1f}ms)"
+            for kind, s in self.asDict().items()
+        )
+
+
+class PrefetchedClients:
+    """
+    The rows of the clients table matching the guids and FSA of clients about to be
+    authorized together (see Clients.authorize). It answers the getClient and
+    getClientsMatching calls of Client.auth the way the storage would, from memory,
+    and asks the storage about anything it did not load.
+    """
+
+    def __init__(self, storage, guids, pbids):
+        """
+        :param storage: The DatabaseStorage the rows come from
+        :param guids: The guids whose rows are loaded
+        :param pbids: The FSA whose rows are loaded
+        """
+        self.storage = storage
+        self.guids = frozenset(guids)
+        self.pbids = frozenset(pbids)
+        self._byId = {}
+        self._byGuid = {}
+        self._byPbid = {}  # pbid -> rows, in the order they were added
+
+    def add(self, row):
+        """
+        Add a row of the clients table.
+        """
+        if row["id"] in self._byId:
+            return
+        self._byId[row["id"]] = row
+        self._byGuid[row["guid"]] = row
+        if row["pbid"] in self.pbids:
+            self._byPbid.setdefault(row["pbid"], []).append(row)
+
+    def getClient(self, client):
+        """
+        Fill a client from its row (see DatabaseStorage.getClient).
+        """
+        if client.id > 0:
+            row = self._byId.get(client.id)
+        else:
+            row = self._byGuid.get(client.guid)
+        if row is not None:
+            return self.storage._fillClient(client, row)
+        if (
+            client.id == 0
+            and client.guid in self.guids
+            and not self.storage.console.config.has_option("admins_cache", client.guid)
+        ):
+            # known to be missing: no need to ask the storage
+            raise KeyError(f"no client matching guid {client.guid} in admins_cache")
+        return self.storage.getClient(client)
+
+    def getClientsMatching(self, match):
+        """
+        Return the clients matching an FSA, and a guid if given
+        (see DatabaseStorage.getClientsMatching).
+        """
+        if match.get("pbid") not in self.pbids or set(match) - {"pbid", "guid"}:
+            return self.storage.getClientsMatching(match)
+        rows = sorted(
+            (
+                row
+                for row in self._byPbid.get(match["pbid"], ())
+                if "guid" not in match or row["guid"] == match["guid"]
+            ),
+            key=lambda row: row["time_edit"],
+            reverse=True,
+        )
+        return [self.storage._fillClient(Client(), row) for row in rows[:5]]
+
+
 class DatabaseStorage(Storage):
     _lastConnectAttempt = 0
     _consoleNotice = True
     _reName = re.compile(r"([A-Z])")
     _reVar = re.compile(r"_([a-z])")
 
+    _aliasFields = {
+        "id": ("id", int),
+        "time_add": ("timeAdd", int),
+        "time_edit": ("timeEdit", int),
+        "client_id": ("clientId", int),
+        "num_used": ("numUsed", int),
+    }
+    _aliasMap = ColumnMap(b3.clients.Alias, {**_aliasFields, "alias": ("alias", None)})
+    _ipAliasMap = ColumnMap(b3.clients.IpAlias, {**_aliasFields, "ip": ("ip", None)})
+    _penaltyClasses = {
+        "Warning": ClientWarning,
+        "TempBan": ClientTempBan,
+        "Kick": ClientKick,
+        "Ban": ClientBan,
+        "Notice": ClientNotice,
+    }
+    _penaltyMap = ColumnMap(
+        lambda type, classes=_penaltyClasses: classes.get(type, Penalty)(),
+        {
+            "id": ("id", int),
+            "type": ("type", None),
+            "keyword": ("keyword", None),
+            "reason": ("reason", None),
+            "data": ("data", None),
+            "inactive": ("inactive", int),
+            "time_add": ("timeAdd", int),
+            "time_edit": ("timeEdit", int),
+            "time_expire": ("timeExpire", int),
+            "client_id": ("clientId", int),
+            "admin_id": ("adminId", int),
+            "duration": ("duration", int),
+        },
+        key="type",
+    )
+
     def __init__(self, dsn, dsnDict, console):
         """
         Object constructor.
@@ -278,7 +745,13 @@ class DatabaseStorage(Storage):
         self.dsnDict = dsnDict
         self.console = console
         self.db = None
-        self._lock = threading.Lock()
+        self.statements = Statements()
+        self._clientMap = ColumnMap(Client, attribute=self.getVar)
+        self.writeQueue = None
+        self.penaltySummaries = {}  # client ID -> PenaltySummary
+        self.queryStats = QueryStats()
+        self.readers = None  # queue.Queue of read-only connections running SELECTs
+        self._lock = threading.Lock()  # the single connection used for writes
 
     def connect(self):
         """
@@ -306,11 +779,56 @@ class DatabaseStorage(Storage):
         """
         self.shutdown()
 
+    def enableWal(self, readers=2, synchronous="NORMAL"):
+        """
+        Switch the database to write-ahead logging and run the SELECTs on a pool
+        of read-only connections while a single connection keeps doing the writes.
+        :param readers: The number of read-only connections
+        :param synchronous: The synchronous level used along with WAL
+        """
+        raise NotImplementedError
+
+    def startWriteBehind(self, interval=0.5, maxRows=100):
+        """
+        Queue the updates of clients, aliases and penalties and run them in batches
+        from a storage thread (see WriteQueue). Inserts still run immediately since
+        callers need the ID of the new row.
+        :param interval: The maximum number of seconds an update waits in the queue
+        :param maxRows: The number of queued updates which triggers a flush
+        """
+        self.writeQueue = WriteQueue(self, interval, maxRows)
+        self.writeQueue.start()
+
+    def stopWriteBehind(self):
+        """
+        Run the queued updates and go back to running them immediately.
+        """
+        if (queue := self.writeQueue) is not None:
+            self.writeQueue = None
+            queue.stop()
+
+    def flush(self):
+        """
+        Run the updates waiting in the write-behind queue, if any.
+        """
+        if self.writeQueue is not None:
+            self.writeQueue.flush()
+
+    def _readYourWrites(self, table=None, clientId=None):
+        """
+        Run the queued updates a read could miss.
+        :param table: The table about to be read, None for any
+        :param clientId: The client the read is about, None for any
+        """
+        if (queue := self.writeQueue) is not None and queue.isPending(table, clientId):
+            queue.flush()
+
     def getCounts(self):
         """
         Return a dictionary containing the number of clients, Bans, Kicks, Warnings and Tempbans.
         """
         counts = {"clients": 0, "Bans": 0, "Kicks": 0, "Warnings": 0, "TempBans": 0}
+        self._readYourWrites()
 
         with self.query("SELECT COUNT(id) total FROM clients") as cursor:
             counts["clients"] = int(cursor.getValue("total", 0))
@@ -328,18 +846,15 @@ class DatabaseStorage(Storage):
         Return a client object fetching data from the storage.
         :param client: The client object to fill with fetch data.
         """
-        where = {"id": client.id} if client.id > 0 else {"guid": client.guid}
+        if client.id > 0:
+            where = {"id": client.id}
+            self._readYourWrites("clients", client.id)
+        else:
+            where = {"guid": client.guid}
+            self._readYourWrites("clients")
         try:
-            with self.query(
-                QueryBuilder(self.db).SelectQuery("*", "clients", where, None, 1)
-            ) as cursor:
-                if not cursor:
-                    raise KeyError(f"no client matching guid {client.guid}")
-                found = False
-                for k, v in cursor.getRow().items():
-                    setattr(client, self.getVar(k), v)
-                    found = True
-                if not found:
+            with self.select("clients", where, limit=1) as cursor:
+                if not cursor.getObject(self._clientMap, client):
                     raise KeyError(f"no client matching guid {client.guid}")
                 return client
         except Exception:
@@ -357,24 +872,43 @@ class DatabaseStorage(Storage):
                     f"no client matching guid {client.guid} in admins_cache"
                 ) from None
 
+    def _fillClient(self, client, row):
+        """
+        Set the attributes of a client from a row of the clients table.
+        """
+        for k, v in row.items():
+            setattr(client, self.getVar(k), v)
+        return client
+
     def getClientsMatching(self, match):
         """
         Return a list of clients matching the given data:
         :param match: The data to match clients against.
         """
-        stmt = QueryBuilder(self.db).SelectQuery(
-            "*", "clients", match, "time_edit DESC", 5
-        )
-
-        clients = []
-        with self.query(stmt) as cursor:
-            for row in cursor:
-                client = Client()
-                for k, v in row.items():
-                    setattr(client, self.getVar(k), v)
-                clients.append(client)
+        self._readYourWrites("clients")
+        with self.select("clients", match, "time_edit DESC", 5) as cursor:
+            return cursor.getObjects(self._clientMap)
 
-        return clients
+    def prefetchClients(self, clients):
+        """
+        Load the rows of the clients table matching the guids and FSA of the given
+        clients, with one query each.
+        :param clients: The clients about to be authorized
+        :return: A PrefetchedClients answering getClient and getClientsMatching
+        """
+        guids = sorted({client.guid for client in clients if client.guid})
+        pbids = sorted({client.pbid for client in clients if client.pbid})
+        self._readYourWrites("clients")
+        prefetched = PrefetchedClients(self, guids, pbids)
+        if guids:
+            with self.select("clients", {"guid": guids}) as cursor:
+                for row in cursor:
+                    prefetched.add(row)
+        if pbids:
+            with self.select("clients", {"pbid": pbids}, "time_edit DESC") as cursor:
+                for row in cursor:
+                    prefetched.add(row)
+        return prefetched
 
     def setClient(self, client):
         """
@@ -382,6 +916,39 @@ class DatabaseStorage(Storage):
         :param client: The client to be saved.
         :return: The ID of the client stored into the database.
         """
+        data = self._clientData(client)
+        if client.id > 0:
+            self.update("clients", data, {"id": client.id}, client.id)
+        else:
+            with self.insert("clients", data) as cursor:
+                client.id = cursor.lastrowid
+
+        return client.id
+
+    def setClients(self, clients):
+        """
+        Insert/update several clients in the storage: the updates run in a single
+        transaction, or go to the write-behind queue when enabled. New clients are
+        inserted one by one since each needs its ID.
+        :param clients: The clients to be saved.
+        """
+        updates = []
+        for client in clients:
+            if client.id > 0 and self.writeQueue is None:
+                updates.append(
+                    self.statements.update(
+                        "clients", self._clientData(client), {"id": client.id}
+                    )
+                )
+            else:
+                self.setClient(client)
+        if updates:
+            self.queryMany(updates)
+
+    def _clientData(self, client):
+        """
+        Return the columns of the clients table to save for a client.
+        """
         fields = (
             "ip",
             "greeting",
@@ -404,17 +971,7 @@ class DatabaseStorage(Storage):
             if hasattr(client, self.getVar(f)):
                 data[f] = getattr(client, self.getVar(f))
 
-        if client.id > 0:
-            self.query(
-                QueryBuilder(self.db).UpdateQuery(data, "clients", {"id": client.id})
-            )
-        else:
-            with self.query(
-                QueryBuilder(self.db).InsertQuery(data, "clients")
-            ) as cursor:
-                client.id = cursor.lastrowid
-
-        return client.id
+        return data
 
     def setClientAlias(self, alias):
         """
@@ -430,13 +987,9 @@ class DatabaseStorage(Storage):
                 data[f] = getattr(alias, self.getVar(f))
 
         if alias.id:
-            self.query(
-                QueryBuilder(self.db).UpdateQuery(data, "aliases", {"id": alias.id})
-            )
+            self.update("aliases", data, {"id": alias.id}, alias.clientId)
         else:
-            with self.query(
-                QueryBuilder(self.db).InsertQuery(data, "aliases")
-            ) as cursor:
+            with self.insert("aliases", data, alias.clientId) as cursor:
                 alias.id = cursor.lastrowid
 
         return alias.id
@@ -448,30 +1001,20 @@ class DatabaseStorage(Storage):
         :return: The alias object given in input with all the fields set.
         """
         if hasattr(alias, "id") and alias.id > 0:
-            query = QueryBuilder(self.db).SelectQuery(
-                "*", "aliases", {"id": alias.id}, None, 1
-            )
+            self._readYourWrites("aliases")
+            cursor = self.select("aliases", {"id": alias.id}, limit=1)
         elif hasattr(alias, "alias") and hasattr(alias, "clientId"):
-            query = QueryBuilder(self.db).SelectQuery(
-                "*",
+            self._readYourWrites("aliases", alias.clientId)
+            cursor = self.select(
                 "aliases",
                 {"alias": alias.alias, "client_id": alias.clientId},
-                None,
-                1,
+                limit=1,
             )
         else:
             raise KeyError(f"no alias found matching {alias}")
 
-        row = self.query(query).getOneRow()
-        if not row:
+        if not cursor.getObject(self._aliasMap, alias):
             raise KeyError(f"no alias found matching {alias}")
-        alias.id = int(row["id"])
-        alias.alias = row["alias"]
-        alias.timeAdd = int(row["time_add"])
-        alias.timeEdit = int(row["time_edit"])
-        alias.clientId = int(row["client_id"])
-        alias.numUsed = int(row["num_used"])
-
         return alias
 
     def getClientAliases(self, client):
@@ -480,23 +1023,9 @@ class DatabaseStorage(Storage):
         :param client: The client whose aliases we want to retrieve.
         :return: List of b3.clients.Alias instances.
         """
-        stmt = QueryBuilder(self.db).SelectQuery(
-            "*", "aliases", {"client_id": client.id}, "id"
-        )
-
-        aliases = []
-        with self.query(stmt) as cursor:
-            for g in cursor:
-                alias = b3.clients.Alias()
-                alias.id = int(g["id"])
-                alias.alias = g["alias"]
-                alias.timeAdd = int(g["time_add"])
-                alias.timeEdit = int(g["time_edit"])
-                alias.clientId = int(g["client_id"])
-                alias.numUsed = int(g["num_used"])
-                aliases.append(alias)
-
-        return aliases
+        self._readYourWrites("aliases", client.id)
+        with self.select("aliases", {"client_id": client.id}, "id") as cursor:
+            return cursor.getObjects(self._aliasMap)
 
     def setClientIpAddress(self, ipalias):
         """
@@ -511,13 +1040,9 @@ class DatabaseStorage(Storage):
                 data[f] = getattr(ipalias, self.getVar(f))
 
         if ipalias.id:
-            self.query(
-                QueryBuilder(self.db).UpdateQuery(data, "ipaliases", {"id": ipalias.id})
-            )
+            self.update("ipaliases", data, {"id": ipalias.id}, ipalias.clientId)
         else:
-            with self.query(
-                QueryBuilder(self.db).InsertQuery(data, "ipaliases")
-            ) as cursor:
+            with self.insert("ipaliases", data, ipalias.clientId) as cursor:
                 ipalias.id = cursor.lastrowid
 
         return ipalias.id
@@ -529,30 +1054,20 @@ class DatabaseStorage(Storage):
         :return: The ip alias object given in input with all the fields set.
         """
         if hasattr(ipalias, "id") and ipalias.id > 0:
-            query = QueryBuilder(self.db).SelectQuery(
-                "*", "ipaliases", {"id": ipalias.id}, None, 1
-            )
+            self._readYourWrites("ipaliases")
+            cursor = self.select("ipaliases", {"id": ipalias.id}, limit=1)
         elif hasattr(ipalias, "ip") and hasattr(ipalias, "clientId"):
-            query = QueryBuilder(self.db).SelectQuery(
-                "*",
+            self._readYourWrites("ipaliases", ipalias.clientId)
+            cursor = self.select(
                 "ipaliases",
                 {"ip": ipalias.ip, "client_id": ipalias.clientId},
-                None,
-                1,
+                limit=1,
             )
         else:
             raise KeyError(f"no ip found matching {ipalias}")
 
-        row = self.query(query).getOneRow()
-        if not row:
+        if not cursor.getObject(self._ipAliasMap, ipalias):
             raise KeyError(f"no ip found matching {ipalias}")
-        ipalias.id = int(row["id"])
-        ipalias.ip = row["ip"]
-        ipalias.timeAdd = int(row["time_add"])
-        ipalias.timeEdit = int(row["time_edit"])
-        ipalias.clientId = int(row["client_id"])
-        ipalias.numUsed = int(row["num_used"])
-
         return ipalias
 
     def getClientIpAddresses(self, client):
@@ -561,23 +1076,9 @@ class DatabaseStorage(Storage):
         :param client: The client whose ip aliases we want to retrieve.
         :return: List of b3.clients.IpAlias instances
         """
-        stmt = QueryBuilder(self.db).SelectQuery(
-            "*", "ipaliases", {"client_id": client.id}, "id"
-        )
-
-        aliases = []
-        with self.query(stmt) as cursor:
-            for row in cursor:
-                ip = b3.clients.IpAlias()
-                ip.id = int(row["id"])
-                ip.ip = row["ip"]
-                ip.timeAdd = int(row["time_add"])
-                ip.timeEdit = int(row["time_edit"])
-                ip.clientId = int(row["client_id"])
-                ip.numUsed = int(row["num_used"])
-                aliases.append(ip)
-
-        return aliases
+        self._readYourWrites("ipaliases", client.id)
+        with self.select("ipaliases", {"client_id": client.id}, "id") as cursor:
+            return cursor.getObjects(self._ipAliasMap)
 
     def getLastPenalties(self, types="Ban", num=5):
         """
@@ -585,23 +1086,16 @@ class DatabaseStorage(Storage):
         :param types: The penalties type.
         :param num: The amount of penalties to retrieve.
         """
-        where = QueryBuilder(self.db).WhereClause({"type": types, "inactive": 0})
-        where += f" AND (time_expire = -1 OR time_expire > {int(time())})"
-        stmt = QueryBuilder(self.db).SelectQuery(
-            fields="*",
-            table="penalties",
-            where=where,
-            orderby="time_add DESC, id DESC",
-            limit=num,
-        )
-
-        penalties = []
-        with self.query(stmt) as cursor:
-            while not cursor.EOF and len(penalties) < num:
-                penalties.append(self._createPenaltyFromRow(cursor.getRow()))
-                cursor.moveNext()
-
-        return penalties
+        self._readYourWrites("penalties")
+        with self.select(
+            "penalties",
+            {"type": types, "inactive": 0},
+            "time_add DESC, id DESC",
+            num,
+            condition=self._notExpired,
+            args=(int(time()),),
+        ) as cursor:
+            return cursor.getObjects(self._penaltyMap)[:num]
 
     def setClientPenalty(self, penalty):
         """
@@ -632,14 +1126,21 @@ class DatabaseStorage(Storage):
                 data[f] = getattr(penalty, self.getVar(f))
 
         if penalty.id:
-            self.query(
-                QueryBuilder(self.db).UpdateQuery(data, "penalties", {"id": penalty.id})
-            )
+            self.update("penalties", data, {"id": penalty.id}, penalty.clientId)
+            value = Statements._value
         else:
-            with self.query(
-                QueryBuilder(self.db).InsertQuery(data, "penalties")
-            ) as cursor:
+            with self.insert("penalties", data, penalty.clientId) as cursor:
                 penalty.id = cursor.lastrowid
+            value = Statements._insertValue
+
+        if (summary := self.penaltySummaries.get(penalty.clientId)) is not None:
+            # cache the penalty as it would be read back from the database
+            row = {f: value(v) for f, v in data.items()}
+            row["id"] = penalty.id
+            try:
+                summary.update(self._createPenaltyFromRow(row))
+            except TypeError, ValueError:
+                del self.penaltySummaries[penalty.clientId]
 
         return penalty.id
 
@@ -649,12 +1150,11 @@ class DatabaseStorage(Storage):
         :param penalty: The penalty object to fill with fetch data.
         :return: The penalty given as input with all the fields set.
         """
-        stmt = QueryBuilder(self.db).SelectQuery(
-            "*", "penalties", {"id": penalty.id}, None, 1
-        )
-        if not (row := self.query(stmt).getOneRow()):
+        self._readYourWrites("penalties")
+        cursor = self.select("penalties", {"id": penalty.id}, limit=1)
+        if not (found := cursor.getObject(self._penaltyMap)):
             raise KeyError(f"no penalty matching id {penalty.id}")
-        return self._createPenaltyFromRow(row)
+        return found
 
     def getClientPenalties(self, client, type="Ban"):
         """
@@ -663,19 +1163,10 @@ class DatabaseStorage(Storage):
         :param type: The type of the penalties we want to retrieve.
         :return: List of penalties
         """
-        where = QueryBuilder(self.db).WhereClause(
-            {
-                "type": type,
-                "client_id": client.id,
-                "inactive": 0,
-            }
-        )
-        where += f" AND (time_expire = -1 OR time_expire > {int(time())})"
-        stmt = QueryBuilder(self.db).SelectQuery(
-            "*", "penalties", where, "time_add DESC"
-        )
-        with self.query(stmt) as cursor:
-            return [self._createPenaltyFromRow(row) for row in cursor]
+        if (summary := self._getPenaltySummary(client, type)) is not None:
+            return summary.penalties(type, time())
+        with self._selectActivePenalties(client, type, "time_add DESC") as cursor:
+            return cursor.getObjects(self._penaltyMap)
 
     def getClientLastPenalty(self, client, type="Ban"):
         """
@@ -684,20 +1175,10 @@ class DatabaseStorage(Storage):
         :param type: The type of the penalty we want to retrieve.
         :return: The last penalty added for the given client
         """
-        where = QueryBuilder(self.db).WhereClause(
-            {
-                "type": type,
-                "client_id": client.id,
-                "inactive": 0,
-            }
-        )
-        where += f" AND (time_expire = -1 OR time_expire > {int(time())})"
-        stmt = QueryBuilder(self.db).SelectQuery(
-            "*", "penalties", where, "time_add DESC", 1
-        )
-        if not (row := self.query(stmt).getOneRow()):
-            return None
-        return self._createPenaltyFromRow(row)
+        if (summary := self._getPenaltySummary(client, type)) is not None:
+            return summary.last(type, time())
+        cursor = self._selectActivePenalties(client, type, "time_add DESC", 1)
+        return cursor.getObject(self._penaltyMap)
 
     def getClientFirstPenalty(self, client, type="Ban"):
         """
@@ -706,20 +1187,12 @@ class DatabaseStorage(Storage):
         :param type: The type of the penalty we want to retrieve.
         :return: The first penalty added for the given client.
         """
-        where = QueryBuilder(self.db).WhereClause(
-            {
-                "type": type,
-                "client_id": client.id,
-                "inactive": 0,
-            }
-        )
-        where += f" AND (time_expire = -1 OR time_expire > {int(time())})"
-        stmt = QueryBuilder(self.db).SelectQuery(
-            "*", "penalties", where, "time_expire DESC, time_add ASC", 1
+        if (summary := self._getPenaltySummary(client, type)) is not None:
+            return summary.first(type, time())
+        cursor = self._selectActivePenalties(
+            client, type, "time_expire DESC, time_add ASC", 1
         )
-        if not (row := self.query(stmt).getOneRow()):
-            return None
-        return self._createPenaltyFromRow(row)
+        return cursor.getObject(self._penaltyMap)
 
     def disableClientPenalties(self, client, type="Ban"):
         """
@@ -727,13 +1200,14 @@ class DatabaseStorage(Storage):
         :param client: The client whose penalties we want to disable.
         :param type: The type of the penalties we want to disable.
         """
-        self.query(
-            QueryBuilder(self.db).UpdateQuery(
-                {"inactive": 1},
-                "penalties",
-                {"type": type, "client_id": client.id, "inactive": 0},
-            )
+        self.update(
+            "penalties",
+            {"inactive": 1},
+            {"type": type, "client_id": client.id, "inactive": 0},
+            client.id,
         )
+        if (summary := self.penaltySummaries.get(client.id)) is not None:
+            summary.disable(type)
 
     def numPenalties(self, client, type="Ban"):
         """
@@ -742,29 +1216,103 @@ class DatabaseStorage(Storage):
         :param type: The penalties type.
         :return The number of penalties.
         """
-        where = QueryBuilder(self.db).WhereClause(
-            {
-                "type": type,
-                "client_id": client.id,
-                "inactive": 0,
-            }
-        )
-        where += f" AND (time_expire = -1 OR time_expire > {int(time())})"
-        with self.query(
-            f"""SELECT COUNT(id) total FROM penalties WHERE {where}"""
+        if (summary := self._getPenaltySummary(client, type)) is not None:
+            return summary.count(type, time())
+        with self._selectActivePenalties(
+            client, type, fields="COUNT(id) total"
         ) as cursor:
             value = int(cursor.getValue("total", 0))
         return value
 
+    _notExpired = "(time_expire = -1 OR time_expire > ?)"
+
+    def loadPenaltySummary(self, client):
+        """
+        Load the active bans and warnings of a client in memory: the penalty lookups
+        about this client are then answered without querying the database until
+        dropPenaltySummary is called.
+        :param client: The client whose penalties we want to cache.
+        """
+        return self.loadPenaltySummaries([client])[client.id]
+
+    def loadPenaltySummaries(self, clients):
+        """
+        Load the penalty summaries of several clients with a single query
+        (see loadPenaltySummary).
+        :param clients: The clients whose penalties we want to cache.
+        :return: A dict of the loaded summaries by client ID
+        """
+        if not clients:
+            return {}
+        penalties = {client.id: [] for client in clients}
+        self._readYourWrites("penalties")
+        with self.select(
+            "penalties",
+            {
+                "type": sorted(PenaltySummary.types),
+                "client_id": list(penalties),
+                "inactive": 0,
+            },
+            condition=self._notExpired,
+            args=(int(time()),),
+        ) as cursor:
+            for penalty in cursor.getObjects(self._penaltyMap):
+                penalties[penalty.clientId].append(penalty)
+        summaries = {
+            clientId: PenaltySummary(rows) for clientId, rows in penalties.items()
+        }
+        self.penaltySummaries.update(summaries)
+        return summaries
+
+    def dropPenaltySummary(self, client):
+        """
+        Stop caching the penalties of a client.
+        :param client: The client whose penalties were cached.
+        """
+        self.penaltySummaries.pop(client.id, None)
+
+    def _getPenaltySummary(self, client, types):
+        """
+        Return the penalty summary of a client if it covers the given types.
+        """
+        if (summary := self.penaltySummaries.get(client.id)) is not None and (
+            PenaltySummary.covers(types)
+        ):
+            return summary
+        return None
+
+    def _selectActivePenalties(
+        self, client, type, orderby=None, limit=None, fields="*"
+    ):
+        """
+        Select the active penalties of the given type of a client.
+        :param client: The client whose penalties we want to retrieve.
+        :param type: The penalties type.
+        :param orderby: The ORDER BY clause for this select statement.
+        :param limit: The amount of penalties to retrieve.
+        :param fields: The columns to select.
+        :return: A cursor over the penalties
+        """
+        self._readYourWrites("penalties", client.id)
+        return self.select(
+            "penalties",
+            {"type": type, "client_id": client.id, "inactive": 0},
+            orderby,
+            limit,
+            fields=fields,
+            condition=self._notExpired,
+            args=(int(time()),),
+        )
+
     _groups = None
+    _groupRegistry = None
 
     def getGroups(self):
         """
         Return a list of available client groups.
         """
         if not self._groups:
-            stmt = QueryBuilder(self.db).SelectQuery("*", "groups", None, "level")
-            with self.query(stmt) as cursor:
+            with self.select("groups", orderby="level") as cursor:
                 self._groups = []
                 for row in cursor:
                     group = b3.clients.Group()
@@ -785,19 +1333,13 @@ class DatabaseStorage(Storage):
         :return: The group instance given in input with all the fields set.
         """
         if hasattr(group, "keyword") and group.keyword:
-            query = QueryBuilder(self.db).SelectQuery(
-                "*", "groups", {"keyword": group.keyword}, None, 1
-            )
-            self.console.verbose2(query)
-            if not (row := self.query(query).getOneRow()):
+            cursor = self.select("groups", {"keyword": group.keyword}, limit=1)
+            if not (row := cursor.getOneRow()):
                 raise KeyError(f"no group matching keyword: {group.keyword}")
 
         elif hasattr(group, "level") and group.level >= 0:
-            query = QueryBuilder(self.db).SelectQuery(
-                "*", "groups", {"level": group.level}, None, 1
-            )
-            self.console.verbose2(query)
-            if not (row := self.query(query).getOneRow()):
+            cursor = self.select("groups", {"level": group.level}, limit=1)
+            if not (row := cursor.getOneRow()):
                 raise KeyError(f"no group matching level: {group.level}")
         else:
             raise KeyError("cannot find Group as no keyword/level provided")
@@ -811,6 +1353,49 @@ class DatabaseStorage(Storage):
 
         return group
 
+    def setGroup(self, group):
+        """
+        Insert/update a group in the storage.
+        :param group: The group to be saved.
+        :return: The ID of the group.
+        """
+        data = {
+            "name": group.name,
+            "keyword": group.keyword,
+            "level": group.level,
+            "time_add": group.timeAdd,
+            "time_edit": group.timeEdit,
+        }
+        if (
+            group.id is not None
+            and self.select(
+                "groups", {"id": group.id}, limit=1, fields="id"
+            ).getOneRow()
+        ):
+            self.update("groups", data, {"id": group.id})
+        else:
+            if group.id is not None:
+                data["id"] = group.id
+            with self.insert("groups", data) as cursor:
+                group.id = cursor.lastrowid
+        self.invalidateGroups()
+        return group.id
+
+    def getGroupRegistry(self):
+        """
+        Return the groups loaded in a b3.clients.GroupRegistry.
+        """
+        if (registry := self._groupRegistry) is None:
+            registry = self._groupRegistry = b3.clients.GroupRegistry(self.getGroups())
+        return registry
+
+    def invalidateGroups(self):
+        """
+        Reload the groups from the database on the next lookup.
+        """
+        self._groups = None
+        self._groupRegistry = None
+
     def truncateTable(self, table):
         """
         Empty a database table (or a collection of tables)
@@ -833,15 +1418,116 @@ class DatabaseStorage(Storage):
         :param bindata: Data to bind to the given query.
         :raise Exception: If the query cannot be evaluated.
         """
+        kind = self.queryStats.kind(query)
+        if kind == "SELECT" and self.readers is not None:
+            return self._readQuery(kind, query, bindata)
+        start = perf_counter()
         with self._lock:
+            acquired = perf_counter()
             cursor = self.db.cursor()
             if bindata is None:
                 cursor.execute(query)
             else:
                 cursor.execute(query, bindata)
             dbcursor = DBCursor(cursor, self.db)
+        self.queryStats.add(kind, acquired - start, perf_counter() - acquired)
         return dbcursor
 
+    def _readQuery(self, kind, query, bindata=None):
+        """
+        Run a SELECT on a connection of the read pool. The rows are fetched before
+        the connection goes back to the pool.
+        """
+        start = perf_counter()
+        connection = self.readers.get()
+        acquired = perf_counter()
+        try:
+            cursor = connection.execute(query, () if bindata is None else bindata)
+            fetched = FetchedCursor(cursor.description, cursor.fetchall())
+        finally:
+            self.readers.put(connection)
+        self.queryStats.add(kind, acquired - start, perf_counter() - acquired)
+        return DBCursor(fetched, connection)
+
+    def select(
+        self,
+        table,
+        where=None,
+        orderby=None,
+        limit=None,
+        fields="*",
+        condition=None,
+        args=(),
+    ):
+        """
+        Run a parameterized select statement (see Statements.select).
+        :return: A cursor over the selected rows
+        """
+        return self.query(
+            *self.statements.select(
+                table, where, orderby, limit, fields, condition, args
+            )
+        )
+
+    def update(self, table, data, where, clientId=None):
+        """
+        Run a parameterized update statement (see Statements.update).
+        :param table: The table to update.
+        :param data: A dict of the columns to set.
+        :param where: A dict of fields and values to match.
+        :param clientId: The client the update is about: when given, the update is
+                         queued if write-behind is enabled
+        """
+        sql, params = self.statements.update(table, data, where)
+        if clientId is not None and (queue := self.writeQueue) is not None:
+            queue.put((table, clientId), sql, params)
+        else:
+            self.query(sql, params)
+
+    def insert(self, table, data, clientId=None):
+        """
+        Run a parameterized insert statement (see Statements.insert).
+        :param table: The table where to insert the row.
+        :param data: A dict of the columns to set.
+        :param clientId: The client the row is about: its queued updates are run first
+        :return: A cursor whose lastrowid is the ID of the inserted row
+        """
+        if clientId is not None:
+            self._readYourWrites(table, clientId)
+        return self.query(*self.statements.insert(table, data))
+
+    def queryMany(self, statements):
+        """
+        Execute statements in a single transaction. When the transaction fails, the
+        statements are run again one by one so that a bad one does not drop the others.
+        :param statements: A list of (query, bindata) tuples.
+        """
+        if not self.getConnection():
+            raise Exception("lost connection with the storage layer during query")
+
+        try:
+            start = perf_counter()
+            with self._lock:
+                acquired = perf_counter()
+                cursor = self.db.cursor()
+                cursor.execute("BEGIN")
+                try:
+                    for query, bindata in statements:
+                        cursor.execute(query, bindata)
+                    cursor.execute("COMMIT")
+                except Exception:
+                    # a failed COMMIT (e.g. SQLITE_BUSY) leaves the transaction open
+                    if self.db.in_transaction:
+                        cursor.execute("ROLLBACK")
+                    raise
+            self.queryStats.add("BATCH", acquired - start, perf_counter() - acquired)
+        except Exception as e:
+            self.console.error("Batch of %s queries failed: %s", len(statements), e)
+            for query, bindata in statements:
+                # failures are logged by query()
+                with contextlib.suppress(Exception):
+                    self.query(query, bindata)
+
     def query(self, query, bindata=None):
         """
         Execute a query on the storage layer.
@@ -936,30 +1622,5 @@ class DatabaseStorage(Storage):
         Create a Penalty object given a result set row.
         :param row: The result set row
         """
-        constructors = {
-            "Warning": ClientWarning,
-            "TempBan": ClientTempBan,
-            "Kick": ClientKick,
-            "Ban": ClientBan,
-            "Notice": ClientNotice,
-        }
-
-        try:
-            constructor = constructors[row["type"]]
-            penalty = constructor()
-        except KeyError:
-            penalty = Penalty()
-
-        penalty.id = int(row["id"])
-        penalty.type = row["type"]
-        penalty.keyword = row["keyword"]
-        penalty.reason = row["reason"]
-        penalty.data = row["data"]
-        penalty.inactive = int(row["inactive"])
-        penalty.timeAdd = int(row["time_add"])
-        penalty.timeEdit = int(row["time_edit"])
-        penalty.timeExpire = int(row["time_expire"])
-        penalty.clientId = int(row["client_id"])
-        penalty.adminId = int(row["admin_id"])
-        penalty.duration = int(row["duration"])
-        return penalty
+        mapping = DatabaseStorage._penaltyMap
+        return mapping.create(mapping.plan(row.keys()), tuple(row.values()))
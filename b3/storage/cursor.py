@@ -1,7 +1,99 @@
+from itertools import islice
+
+
+class FetchedCursor:
+    """
+    A DB-API cursor over the rows of a result set fetched beforehand, so that the
+    connection they were read from can serve other queries.
+    """
+
+    lastrowid = None
+    rowcount = -1
+
+    def __init__(self, description, rows):
+        """
+        :param description: The description of the original cursor
+        :param rows: The fetched rows
+        """
+        self.description = description
+        self._rows = iter(rows)
+
+    def fetchone(self):
+        return next(self._rows, None)
+
+    def fetchmany(self, size=1):
+        return list(islice(self._rows, size))
+
+    def close(self):
+        self._rows = iter(())
+
+
+class ColumnMap:
+    """
+    Build objects from the rows of result sets: the position of each column and the
+    attribute it is set to are resolved once per set of columns, so that the rows
+    are read as tuples instead of being turned into dicts.
+    """
+
+    def __init__(self, factory, fields=None, attribute=None, key=None):
+        """
+        :param factory: Create the object to fill, given the value of the key column if any
+        :param fields: A dict of column -> (attribute, converter or None) for the columns
+                       to map, None to map every column
+        :param attribute: Return the attribute of a column, when fields is None
+        :param key: The column whose value is given to the factory
+        """
+        self.factory = factory
+        self.fields = fields
+        self.attribute = attribute
+        self.key = key
+        self._plans = {}  # columns -> (key position, ((position, attribute, converter), ...))
+
+    def plan(self, columns):
+        """
+        Return how to read the rows of a result set having the given columns.
+        """
+        columns = tuple(columns)
+        if (plan := self._plans.get(columns)) is None:
+            if self.fields is None:
+                setters = tuple(
+                    (i, self.attribute(column), None)
+                    for i, column in enumerate(columns)
+                )
+            else:
+                setters = tuple(
+                    (i, *self.fields[column])
+                    for i, column in enumerate(columns)
+                    if column in self.fields
+                )
+            key = None if self.key is None else columns.index(self.key)
+            plan = self._plans[columns] = (key, setters)
+        return plan
+
+    @staticmethod
+    def fill(obj, plan, row):
+        """
+        Set the attributes of an object from a row.
+        """
+        for position, attribute, convert in plan[1]:
+            value = row[position]
+            setattr(obj, attribute, value if convert is None else convert(value))
+        return obj
+
+    def create(self, plan, row):
+        """
+        Build an object from a row.
+        """
+        key = plan[0]
+        obj = self.factory() if key is None else self.factory(row[key])
+        return self.fill(obj, plan, row)
+
+
 class Cursor:
     fields = None
 
     EOF = False
+    arraysize = 100  # rows read at once from the database cursor
 
     def __init__(self, cursor, conn):
         """
@@ -11,6 +103,8 @@ class Cursor:
         """
         self._cursor = cursor
         self._conn = conn
+        self._block = iter(())  # rows read by the last fetchmany
+        self._index = None
         self.rowcount = cursor.rowcount
         self.lastrowid = cursor.lastrowid
         self.fields = None
@@ -30,7 +124,10 @@ class Cursor:
         :return True if there is one more record, False otherwise.
         """
         if not self.EOF:
-            self.fields = self._cursor.fetchone()
+            self.fields = next(self._block, None)
+            if self.fields is None:
+                self._block = iter(self._cursor.fetchmany(self.arraysize))
+                self.fields = next(self._block, None)
             self.EOF = not self.fields or not self._cursor
             if self.EOF:
                 self.close()
@@ -61,7 +158,49 @@ class Cursor:
         Return a value from the current result set row.
         :return The value extracted from the result set or default if the the given key doesn't match any field.
         """
-        return self.getRow().get(key, default)
+        if self.EOF:
+            return default
+        if self._index is None:
+            self._index = {column: i for i, column in enumerate(self.columns)}
+        if (position := self._index.get(key)) is None:
+            return default
+        return self.fields[position]
+
+    def tuples(self):
+        """
+        Iterate over the remaining rows as tuples of fields, in the order of columns.
+        """
+        while not self.EOF:
+            yield self.fields
+            self.moveNext()
+
+    def getObject(self, mapping, obj=None):
+        """
+        Build an object from the current row and close the result set.
+        :param mapping: The ColumnMap of the object
+        :param obj: The object to fill, a new one is created by default
+        :return The object, or None if the result set is empty.
+        """
+        if self.EOF:
+            return None
+        plan = mapping.plan(self.columns)
+        if obj is None:
+            obj = mapping.create(plan, self.fields)
+        else:
+            mapping.fill(obj, plan, self.fields)
+        self.close()
+        return obj
+
+    def getObjects(self, mapping):
+        """
+        Build an object from each remaining row.
+        :param mapping: The ColumnMap of the objects
+        :return The list of objects
+        """
+        if self.EOF:
+            return []
+        plan = mapping.plan(self.columns)
+        return [mapping.create(plan, row) for row in self.tuples()]
 
     def close(self):
         """
@@ -70,6 +209,7 @@ class Cursor:
         if self._cursor:
             self._cursor.close()
         self._cursor = None
+        self._block = iter(())
         self.EOF = True
 
     def __iter__(self):
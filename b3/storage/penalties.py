@@ -0,0 +1,93 @@
+import copy
+
+
+class PenaltySummary:
+    """
+    The active bans and warnings of a connected client: loaded in one query when
+    the client is authorized and kept current by the storage writes, so that the
+    numBans, lastBan, numWarnings, lastWarning and firstWarning lookups done on
+    connection and by the warn commands do not query the database. Penalties
+    expire in memory, from their time_expire.
+    """
+
+    types = frozenset(("Ban", "TempBan", "Warning"))
+
+    def __init__(self, penalties=()):
+        """
+        :param penalties: The active penalties of the client
+        """
+        self._penalties = {p.id: p for p in penalties}
+
+    @staticmethod
+    def _types(types):
+        return (types,) if isinstance(types, str) else tuple(types)
+
+    @classmethod
+    def covers(cls, types):
+        """
+        Tell whether the summary can answer for the given penalty types.
+        """
+        types = cls._types(types)
+        return bool(types) and cls.types.issuperset(types)
+
+    def update(self, penalty):
+        """
+        Record a saved penalty.
+        :param penalty: The penalty, as stored in the database
+        """
+        if penalty.inactive or penalty.type not in self.types:
+            self._penalties.pop(penalty.id, None)
+        else:
+            self._penalties[penalty.id] = penalty
+
+    def disable(self, types):
+        """
+        Forget the penalties of the given types.
+        """
+        types = self._types(types)
+        for penalty in list(self._penalties.values()):
+            if penalty.type in types:
+                self._penalties.pop(penalty.id, None)
+
+    def _active(self, types, now):
+        types = self._types(types)
+        return [
+            p
+            for p in list(self._penalties.values())
+            if p.type in types and (p.timeExpire == -1 or p.timeExpire > now)
+        ]
+
+    def count(self, types, now):
+        """
+        Return the number of active penalties of the given types.
+        """
+        return len(self._active(types, now))
+
+    def penalties(self, types, now):
+        """
+        Return the active penalties of the given types, the most recent first.
+        """
+        penalties = sorted(self._active(types, now), key=lambda p: -p.timeAdd)
+        return [copy.copy(p) for p in penalties]
+
+    def last(self, types, now):
+        """
+        Return the most recent active penalty of the given types, or None.
+        """
+        penalties = self._active(types, now)
+        if not penalties:
+            return None
+        return copy.copy(max(penalties, key=lambda p: (p.timeAdd, p.id)))
+
+    def first(self, types, now):
+        """
+        Return the active penalty of the given types expiring last, in the order of
+        getClientFirstPenalty where those which never expire (-1) come last, or None.
+        """
+        penalties = self._active(types, now)
+        if not penalties:
+            return None
+        return copy.copy(min(penalties, key=lambda p: (-p.timeExpire, p.timeAdd)))
+
+    def __len__(self):
+        return len(self._penalties)
@@ -1,4 +1,6 @@
 import os
+import queue
+import urllib.parse
 
 import b3.functions
 from b3.storage.common import DatabaseStorage
@@ -6,6 +8,7 @@ from b3.storage.common import DatabaseStorage
 
 class SqliteStorage(DatabaseStorage):
     protocol = "sqlite"
+    synchronousLevels = ("OFF", "NORMAL", "FULL", "EXTRA")
 
     def __init__(self, dsn, dsnDict, console):
         """
@@ -15,6 +18,8 @@ class SqliteStorage(DatabaseStorage):
         :param console: The console instance.
         """
         super().__init__(dsn, dsnDict, console)
+        self.path = None
+        self.wal = None  # (readers, synchronous) once enableWal was called
 
     def connect(self):
         """
@@ -25,7 +30,7 @@ class SqliteStorage(DatabaseStorage):
         try:
             import sqlite3
 
-            path = b3.functions.getWritableFilePath(self.dsn[9:])
+            path = self.path = b3.functions.getWritableFilePath(self.dsn[9:])
             self.console.bot("Using database file: %s", path)
             is_new_database = not os.path.isfile(path)
             self.db = sqlite3.connect(path, check_same_thread=False)
@@ -49,8 +54,75 @@ class SqliteStorage(DatabaseStorage):
                 self.console.screen.write("Connecting to DB : OK\n")
                 self._consoleNotice = False
 
+            if self.wal:
+                self._openReaders(*self.wal)
+
         return self.db
 
+    def enableWal(self, readers=2, synchronous="NORMAL"):
+        """
+        Switch the database to write-ahead logging and run the SELECTs on a pool
+        of read-only connections while a single connection keeps doing the writes:
+        readers no longer wait for the writes, nor writes for slow reads.
+        :param readers: The number of read-only connections
+        :param synchronous: The synchronous level used along with WAL (NORMAL only
+                            syncs at checkpoints, which is safe in WAL mode)
+        :raise ValueError: If the number of readers or the synchronous level is invalid
+        """
+        if readers < 1:
+            raise ValueError(
+                f"invalid number of readers: {readers}: expecting 1 or more"
+            )
+        synchronous = synchronous.upper()
+        if synchronous not in self.synchronousLevels:
+            raise ValueError(
+                f"invalid synchronous level: {synchronous}: expecting one of "
+                f"{', '.join(self.synchronousLevels)}"
+            )
+        self.wal = (readers, synchronous)
+        if self.db:
+            # otherwise done when connecting
+            self._openReaders(readers, synchronous)
+
+    def _openReaders(self, readers, synchronous):
+        import sqlite3
+
+        self._closeReaders()
+        if self.path == ":memory:":
+            self.console.warning("WAL is not available to in-memory databases")
+            return
+        with self.query("PRAGMA journal_mode=WAL") as cursor:
+            mode = cursor.getValue("journal_mode")
+        if mode != "wal":
+            self.console.warning("Could not enable WAL (journal mode: %s)", mode)
+            return
+        self.query(f"PRAGMA synchronous={synchronous}")
+        pool = queue.Queue()
+        for _ in range(readers):
+            connection = sqlite3.connect(
+                f"file:{urllib.parse.quote(self.path)}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+            )
+            connection.isolation_level = None
+            pool.put(connection)
+        self.readers = pool
+        self.console.bot(
+            "Database in WAL mode (synchronous=%s) with %s read connections",
+            synchronous,
+            readers,
+        )
+
+    def _closeReaders(self):
+        if (pool := self.readers) is None:
+            return
+        self.readers = None
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
     def getConnection(self):
         """
         Return the database connection. If the connection has not been established yet, will establish a new one.
@@ -64,6 +136,8 @@ class SqliteStorage(DatabaseStorage):
         """
         Close the current active database connection.
         """
+        self.stopWriteBehind()
+        self._closeReaders()
         if self.db:
             # checking 'open' will prevent exception raising
             self.console.bot("Closing connection with SQLite database...")
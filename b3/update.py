@@ -80,7 +80,7 @@ class DBUpdate:
             :param storage: the initialized storage module
             :param update_version: the update version
             """
-            if B3version(b3.__version__) >= update_version:
+            if B3version(b3.__version__) >= B3version(update_version):
                 sql = b3.functions.getAbsolutePath(
                     f"@b3/sql/{storage.protocol}/b3-update-{update_version}.sql"
                 )
@@ -100,5 +100,6 @@ class DBUpdate:
         database = b3.storage.getStorage(dsn, dsndict, StubParser())
 
         _update_database(database, "3.99.99")
+        _update_database(database, "2026.10.18")
 
         b3.functions.console_exit("B3 database update completed!")
@@ -0,0 +1,3 @@
+"""
+Standalone micro benchmarks, run them with ``python -m benchmarks.<name>``.
+"""
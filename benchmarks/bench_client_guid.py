@@ -0,0 +1,75 @@
+"""
+Compare b3.clients.Clients.getByGUID against the fuzzyGuidMatch scan of every
+connected client it used when the exact guid lookup missed.
+
+    python -m benchmarks.bench_client_guid [slots] [bots]
+
+The server is filled with ``slots`` players with 32 characters guids and ``bots``
+bots, then looked up by exact, uppercased, truncated and unknown guids. The guids
+of the players are stored lowercased, as some clients report them.
+"""
+
+import random
+import sys
+import timeit
+
+import b3.functions
+from b3.clients import Client, Clients
+from b3.parser import StubParser
+
+
+def legacy_getByGUID(clients, guid):
+    guid = guid.upper()
+    if client := clients._lookup("guid", guid):
+        return client
+    for _cid, c in list(clients.items()):
+        if b3.functions.fuzzyGuidMatch(c.guid, guid):
+            return c
+
+
+def populate(slots, bots, rng):
+    clients = Clients(StubParser())
+    for cid in range(slots + bots):
+        bot = cid >= slots
+        guid = f"BOT{cid}" if bot else f"{rng.getrandbits(128):032x}"
+        clients[cid] = Client(cid=cid, name=f"player{cid}", guid=guid, bot=bot)
+    return clients
+
+
+def main(argv):
+    slots = int(argv[1]) if len(argv) > 1 else 64
+    bots = int(argv[2]) if len(argv) > 2 else 16
+    rng = random.Random(1)  # noqa: S311
+    clients = populate(slots, bots, rng)
+    guid = clients[slots - 1].guid
+    number = 200
+
+    print(f"{slots} slots, {bots} bots")
+    print(f"{'lookup':<12} {'before (us)':>12} {'after (us)':>12} {'speedup':>8}")
+    for name, needle in (
+        ("exact", guid),
+        ("uppercased", guid.upper()),
+        ("truncated", guid[:-1]),
+        ("unknown", f"{rng.getrandbits(128):032X}"),
+        ("unknown bot", "BOT999"),
+    ):
+        if legacy_getByGUID(clients, needle) is not clients.getByGUID(needle):
+            raise RuntimeError(f"{name} lookup differs from the scan")
+        before = min(
+            timeit.repeat(
+                lambda: legacy_getByGUID(clients, needle),  # noqa: B023
+                number=number,
+                repeat=5,
+            )
+        )
+        after = min(
+            timeit.repeat(lambda: clients.getByGUID(needle), number=number, repeat=5)  # noqa: B023
+        )
+        print(
+            f"{name:<12} {before / number * 1e6:>12.1f} {after / number * 1e6:>12.1f} {before / after:>7.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,88 @@
+"""
+Compare the substring searches of b3.clients.Clients (getByMagic and
+getClientsByName) against the regex scan of every connected client they replaced.
+
+    python -m benchmarks.bench_client_search [slots] [bots]
+
+The server is filled with ``slots`` players and ``bots`` bots (64 and 16 by
+default), then searched with needles of the lengths admins usually type.
+"""
+
+import random
+import re
+import sys
+import timeit
+
+from b3.clients import Client, Clients
+from b3.parser import StubParser
+
+NAMES = ("Sniper", "xXx Killer", "Noob Slayer", "Flag Runner", "Camper", "N00b")
+NEEDLES = ("sn", "kil", "slay", "runner", "nobodyhere", "xxxkiller12")
+
+
+def legacy_getByMagic(clients, handle):
+    matches = []
+    needle = re.sub(r"\s", "", handle.lower())
+    for _cid, c in clients.items():
+        cleanname = re.sub(r"\s", "", c.name.lower())
+        if (
+            not c.hide
+            and (needle in cleanname or needle in c.pbid)
+            and c not in matches
+        ):
+            matches.append(c)
+    return matches
+
+
+def legacy_getClientsByName(clients, name):
+    needle = re.sub(r"\s", "", name.lower())
+    return [
+        c
+        for _, c in clients.items()
+        if not c.hide and needle in re.sub(r"\s", "", c.name.lower())
+    ]
+
+
+def populate(slots, bots, rng):
+    clients = Clients(StubParser())
+    for cid in range(slots + bots):
+        bot = cid >= slots
+        clients[cid] = Client(
+            cid=cid,
+            name=f"{'Bot ' if bot else ''}{rng.choice(NAMES)}{rng.randrange(100)}",
+            guid=f"{cid:032X}",
+            pbid="" if bot else f"fsa{rng.randrange(10_000)}",
+            bot=bot,
+        )
+    return clients
+
+
+def main(argv):
+    slots = int(argv[1]) if len(argv) > 1 else 64
+    bots = int(argv[2]) if len(argv) > 2 else 16
+    rng = random.Random(1)  # noqa: S311
+    clients = populate(slots, bots, rng)
+    number = 1000
+
+    print(f"{slots} slots, {bots} bots")
+    print(f"{'search':<30} {'before (us)':>12} {'after (us)':>12} {'speedup':>8}")
+    for needle in NEEDLES:
+        for name, legacy, search in (
+            ("getByMagic", legacy_getByMagic, clients.getByMagic),
+            ("getClientsByName", legacy_getClientsByName, clients.getClientsByName),
+        ):
+            if legacy(clients, needle) != search(needle):
+                raise RuntimeError(f"{name}({needle!r}) differs from the scan")
+            before = min(
+                timeit.repeat(lambda: legacy(clients, needle), number=number, repeat=5)  # noqa: B023
+            )
+            after = min(timeit.repeat(lambda: search(needle), number=number, repeat=5))  # noqa: B023
+            label = f"{name}({needle!r})"
+            print(
+                f"{label:<30} {before / number * 1e6:>12.1f} {after / number * 1e6:>12.1f} {before / after:>7.1f}x"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,219 @@
+"""
+Compare the slotted b3.clients.Client with the dict based representation it
+replaced.
+
+    python -m benchmarks.bench_client_vars [clients]
+
+Reports the memory (tracemalloc) needed to keep ``clients`` clients alive with
+the variables the poweradminurt, spree, spawnkill and tk plugins keep, and the
+time those plugins spend in the variables of the attacker and the victim on a
+headshot kill: through the plugin/key lookups of var(), and through the slots
+the plugins resolve once and read with slotvar().
+"""
+
+import sys
+import timeit
+import tracemalloc
+
+import b3
+from b3.clients import Client, PluginVars
+
+POWERADMINURT = (
+    "kills",
+    "deaths",
+    "teamkills",
+    "teamcontribhist",
+    "hitvars",
+    "totalhits",
+    "totalhitted",
+    "headhits",
+    "headhitted",
+    "helmethits",
+    "torsohitted",
+    "teamtime",
+)
+PLUGINS = {
+    "poweradminurt": POWERADMINURT,
+    "spree": ("spree_info",),
+    "spawnkill": ("spawntime",),
+    "tk": ("tkinfo", "checkBan"),
+}
+
+
+class Plugin:
+    """
+    A plugin and the slots of its variables, resolved once as the plugins do.
+    """
+
+    def __init__(self, keys):
+        self.slot = {key: PluginVars.slot(self, key) for key in keys}
+
+
+class LegacyClientVar:
+    def __init__(self, value):
+        self.value = value
+
+
+class LegacyClient:
+    """
+    The instance state of the Client before it was slotted: the attributes set by
+    the constructor and the property setters, and the plugin variables in a dict
+    of dicts of ClientVar.
+    """
+
+    def __init__(self, cid, name, guid):
+        self._pluginData = {}
+        self.state = b3.STATE_UNKNOWN
+        self._data = {}
+        self.cid = cid
+        self._name = name
+        self._exactName = name + "^7"
+        self._guid = guid
+        self._ip = "10.0.0.1"
+        self._id = cid + 1
+        self.authed = True
+
+    def setvar(self, plugin, key, value=None):
+        plugin_id = id(plugin)
+        try:
+            plugin_data = self._pluginData[plugin_id]
+        except KeyError:
+            client_var = LegacyClientVar(value)
+            self._pluginData[plugin_id] = {key: client_var}
+        else:
+            try:
+                client_var = plugin_data[key]
+                client_var.value = value
+            except KeyError:
+                client_var = LegacyClientVar(value)
+                plugin_data[key] = client_var
+        return client_var
+
+    def var(self, plugin, key, default=None):
+        try:
+            return self._pluginData[id(plugin)][key]
+        except KeyError:
+            return self.setvar(plugin, key, default)
+
+
+def new_client(cid):
+    return Client(
+        cid=cid, name=f"player{cid}", guid=f"{cid:032X}", ip="10.0.0.1", id=cid + 1
+    )
+
+
+def legacy_client(cid):
+    return LegacyClient(cid, f"player{cid}", f"{cid:032X}")
+
+
+def populate(factory, count, plugins):
+    clients = [factory(cid) for cid in range(count)]
+    for client in clients:
+        for plugin in plugins.values():
+            for key in plugin.slot:
+                client.setvar(plugin, key, 0)
+    return clients
+
+
+def allocated(factory, count, plugins):
+    tracemalloc.start()
+    clients = populate(factory, count, plugins)
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del clients
+    return sum(s.size for s in snapshot.statistics("filename"))
+
+
+def on_headshot_kill_by_key(plugins, attacker, victim):
+    pau = plugins["poweradminurt"]
+    spawnkill = plugins["spawnkill"]
+    tk = plugins["tk"]
+    spree = plugins["spree"]
+    # EVT_CLIENT_DAMAGE: tk, spawnkill and poweradminurt headshotcounter
+    for client in (attacker, victim):
+        tk_info = client.var(tk, "tkinfo")
+        client.var(tk, "checkBan", False)
+    victim.var(spawnkill, "spawntime")
+    if attacker.var(pau, "hitvars").value and victim.var(pau, "hitvars").value:
+        attacker.var(pau, "totalhits").value += 1
+        victim.var(pau, "totalhitted").value += 1
+        attacker.var(pau, "headhits").value += 1
+        victim.var(pau, "headhitted").value += 1
+        headshots = attacker.var(pau, "headhits").value
+        headshots += attacker.var(pau, "helmethits").value
+        tk_info.value = headshots / attacker.var(pau, "totalhits").value
+    # EVT_CLIENT_KILL: spawnkill, poweradminurt and spree
+    victim.var(spawnkill, "spawntime")
+    attacker.var(pau, "kills", 0).value += 1
+    victim.var(pau, "deaths", 0).value += 1
+    attacker.var(pau, "teamcontribhist", []).value = 1
+    victim.var(pau, "teamcontribhist", []).value = -1
+    attacker.var(spree, "spree_info").value += 1
+    victim.var(spree, "spree_info").value = 0
+
+
+def on_headshot_kill_by_slot(plugins, attacker, victim):
+    pau = plugins["poweradminurt"].slot
+    spawnkill = plugins["spawnkill"].slot
+    tk = plugins["tk"].slot
+    spree = plugins["spree"].slot
+    # EVT_CLIENT_DAMAGE: tk, spawnkill and poweradminurt headshotcounter
+    for client in (attacker, victim):
+        tk_info = client.slotvar(tk["tkinfo"])
+        client.slotvar(tk["checkBan"], False)
+    victim.slotvar(spawnkill["spawntime"])
+    if attacker.slotvar(pau["hitvars"]).value and victim.slotvar(pau["hitvars"]).value:
+        attacker.slotvar(pau["totalhits"]).value += 1
+        victim.slotvar(pau["totalhitted"]).value += 1
+        attacker.slotvar(pau["headhits"]).value += 1
+        victim.slotvar(pau["headhitted"]).value += 1
+        headshots = attacker.slotvar(pau["headhits"]).value
+        headshots += attacker.slotvar(pau["helmethits"]).value
+        tk_info.value = headshots / attacker.slotvar(pau["totalhits"]).value
+    # EVT_CLIENT_KILL: spawnkill, poweradminurt and spree
+    victim.slotvar(spawnkill["spawntime"])
+    attacker.slotvar(pau["kills"], 0).value += 1
+    victim.slotvar(pau["deaths"], 0).value += 1
+    attacker.slotvar(pau["teamcontribhist"], []).value = 1
+    victim.slotvar(pau["teamcontribhist"], []).value = -1
+    attacker.slotvar(spree["spree_info"]).value += 1
+    victim.slotvar(spree["spree_info"]).value = 0
+
+
+def timed(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 10_000
+    number = 100_000
+
+    print(
+        f"{'representation':<14} {'bytes/client':>13} "
+        f"{'var() kill (us)':>16} {'slotvar() kill (us)':>20}"
+    )
+    for name, factory in (("legacy", legacy_client), ("slotted", new_client)):
+        plugins = {key: Plugin(keys) for key, keys in PLUGINS.items()}
+        size = allocated(factory, count, plugins)
+        attacker, victim = populate(factory, 2, plugins)
+        for client in (attacker, victim):
+            client.setvar(plugins["poweradminurt"], "hitvars", True)
+            client.setvar(plugins["poweradminurt"], "totalhits", 0.00)
+        by_key = timed(
+            lambda: on_headshot_kill_by_key(plugins, attacker, victim),  # noqa: B023
+            number,
+        )
+        if factory is new_client:
+            by_slot = timed(
+                lambda: on_headshot_kill_by_slot(plugins, attacker, victim),  # noqa: B023
+                number,
+            )
+            by_slot = f"{by_slot * 1e6:>20.2f}"
+        else:
+            by_slot = f"{'-':>20}"
+        print(f"{name:<14} {size / count:>13.0f} {by_key * 1e6:>16.2f} {by_slot}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,78 @@
+"""
+Compare b3.events.Event construction cost against the dict based Event it replaced.
+
+    python -m benchmarks.bench_events [count]
+
+Reports the construction time, the memory and the number of allocations
+(tracemalloc) needed to keep ``count`` events alive, with and without a
+shared timestamp.
+"""
+
+import functools
+import sys
+import time
+import timeit
+import tracemalloc
+
+from b3.events import Event, eventManager
+
+
+class LegacyEvents:
+    def __init__(self, events):
+        self._events = events
+
+    @functools.cache  # noqa: B019
+    def getKey(self, event_id):
+        matching_keys = [k for k, v in self._events.items() if v == event_id]
+        if not matching_keys:
+            raise KeyError(f"could not find any B3 event with ID {event_id}")
+        return matching_keys[0]
+
+
+legacyEventManager = LegacyEvents(eventManager.events)
+
+
+class LegacyEvent:
+    def __init__(self, type, data, client=None, target=None):
+        self.time = int(time.time())
+        self.type = type
+        self.data = data
+        self.client = client
+        self.target = target
+        self.key = legacyEventManager.getKey(type)
+
+
+def allocated(factory, count):
+    tracemalloc.start()
+    events = [factory() for _ in range(count)]
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del events
+    stats = snapshot.statistics("filename")
+    return sum(s.size for s in stats), sum(s.count for s in stats)
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 100_000
+    event_id = eventManager.getId("EVT_CLIENT_DAMAGE")
+    data = (100, "38", "1")
+    now = int(time.time())
+    factories = (
+        ("legacy Event", lambda: LegacyEvent(event_id, data)),
+        ("slotted Event", lambda: Event(event_id, data)),
+        ("slotted Event, timestamp", lambda: Event(event_id, data, timestamp=now)),
+    )
+    print(f"{count:,} events")
+    for name, factory in factories:
+        factory()  # warm caches
+        elapsed = min(timeit.repeat(factory, number=count, repeat=5))
+        size, blocks = allocated(factory, count)
+        print(
+            f"{name:26}: {elapsed / count * 1e9:7.1f} ns/event, "
+            f"{size / count:6.1f} bytes/event, {blocks / count:4.2f} allocations/event"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
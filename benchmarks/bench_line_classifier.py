@@ -0,0 +1,67 @@
+"""
+Compare Iourt43Parser line format matching against the linear scan it replaced.
+
+    python -m benchmarks.bench_line_classifier /path/to/games.log [repeat]
+
+Every line is matched by both implementations which must agree on the line
+format index and on the extracted groups before timings are reported.
+"""
+
+import logging
+import sys
+import time
+
+from b3.parsers.iourt43 import Iourt43Parser
+
+
+def load_lines(path, parser):
+    with open(path, encoding="latin-1") as f:
+        return [
+            parser._lineClear.sub("", line, count=1)
+            for line in map(str.strip, f)
+            if line
+        ]
+
+
+def check(parser, lines):
+    for line in lines:
+        index, m = parser._matchLineFormat(line)
+        expected_index, expected_m = parser._matchLineFormatLinear(line)
+        if index != expected_index or (
+            expected_m and expected_m.groups() != m.groups()
+        ):
+            raise AssertionError(f"classifier mismatch for line: {line!r}")
+
+
+def timeit(func, lines, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            func(line)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv):
+    if len(argv) < 2:
+        print(__doc__)
+        return 1
+    repeat = int(argv[2]) if len(argv) > 2 else 5
+    parser = Iourt43Parser.__new__(Iourt43Parser)
+    parser.log = logging.getLogger("output")
+    lines = load_lines(argv[1], parser)
+    check(parser, lines)
+    linear = timeit(parser._matchLineFormatLinear, lines, repeat)
+    classifier = timeit(parser._matchLineFormat, lines, repeat)
+    print(f"{len(lines):,} lines, best of {repeat}")
+    print(f"linear scan : {linear:8.4f}s ({len(lines) / linear:12,.0f} lines/s)")
+    print(
+        f"classifier  : {classifier:8.4f}s ({len(lines) / classifier:12,.0f} lines/s)"
+    )
+    print(f"speedup     : {linear / classifier:8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,156 @@
+"""
+Replay a generated UrT 4.3 game log through the full parse -> dispatch pipeline
+(see b3.replay) and track its throughput.
+
+    python -m benchmarks.bench_replay [--games N] [--plugins admin,...] [--save FILE] [--baseline FILE]
+
+--save writes the measurements to a JSON file, --baseline compares against a
+previously saved run and exits with status 1 when lines/s dropped by more than
+--tolerance (20% by default).
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+from b3.replay import replay
+
+# spawnkill is left out: it times kills against spawns with the wall clock and the
+# replay runs much faster than the game did, so it would kick everyone
+PLUGINS = "admin,adv,spree,stats,welcome,knifer,nader,flagstats,tk"
+WEAPONS = {
+    "UT_MOD_M4": 38,
+    "UT_MOD_LR300": 19,
+    "UT_MOD_AK103": 30,
+    "UT_MOD_SPAS": 16,
+    "UT_MOD_DEAGLE": 15,
+}
+HIT_WEAPONS = (14, 15, 17, 19, 20)
+HITLOCS = ("Head", "Helmet", "Torso", "Vest", "Legs", "Arms")
+ITEMS = ("ut_weapon_glock", "ut_weapon_m4", "ut_item_vest", "ut_item_medkit")
+CHAT = ("gg", "nice shot", "lol", "!help", "!xlrstats", "!spree", "brb")
+
+
+def generate_game(lines, rng, players=16, frags=300):
+    """
+    Append the lines of a capture the flag game between the given number of players.
+    """
+    lines.append(
+        r"InitGame: \sv_allowvote\1\g_matchmode\0\g_gametype\7\sv_maxclients\32"
+        r"\sv_floodprotect\1\g_warmup\15\capturelimit\0\sv_hostname\Replay"
+        r"\g_followstrict\1\fraglimit\0\timelimit\20\g_cahtime\60\g_swaproles\0"
+        r"\g_roundtime\3\g_bombexplodetime\40\g_bombplanttime\3\g_hotpotato\2"
+        r"\g_waverespawns\0\g_redwave\15\g_bluewave\15\g_respawndelay\3"
+        r"\g_suddendeath\1\g_maxrounds\0\g_friendlyfire\1\g_allowvote\536871039"
+        r"\g_armbands\0\g_survivorrule\0\g_gear\0\g_deadchat\1\g_maxGameClients\0"
+        r"\sv_dlURL\\sv_maxPing\0\sv_minPing\0\sv_maxRate\0\sv_minRate\0"
+        r"\dmflags\0\version\ioq3 1.35 urt 4.3.4 linux-x86_64 Jun 28 2018"
+        r"\protocol\68\mapname\ut4_turnpike\sv_privateClients\0\gamename\q3urt43"
+        r"\g_modversion\4.3.4\g_needpass\0\auth\1\auth_status\public"
+    )
+    for cid in range(players):
+        name = f"Player{cid}"
+        ip = f"10.0.{cid // 250}.{cid % 250 + 1}"
+        guid = f"{cid:032X}"
+        lines.append(f"ClientConnect: {cid}")
+        lines.append(
+            rf"ClientUserinfo: {cid} \ip\{ip}:27960\name\{name}\racered\2\raceblue\2"
+            rf"\rate\25000\ut_timenudge\0\cg_rgb\128 128 128\funred\\funblue\\"
+            rf"cg_physics\1\snaps\20\color1\4\color2\5\handicap\100\sex\male"
+            rf"\cg_autoPickup\-1\cg_ghost\0\cl_time\0\racefree\1\gear\GZAAVWT"
+            rf"\authc\0\cl_guid\{guid}\weapmodes\01000110220000020002000"
+        )
+        lines.append(
+            rf"ClientUserinfoChanged: {cid} n\{name}\t\{cid % 2 + 1}\r\1\tl\0"
+            rf"\f0\\f1\\f2\\a0\0\a1\0\a2\0"
+        )
+        lines.append(f"ClientBegin: {cid}")
+        lines.append(f"ClientSpawn: {cid}")
+    for _ in range(frags):
+        killer = rng.randrange(players)
+        # players are on team 1 + cid % 2: mostly frag the other team
+        victim = rng.randrange(killer % 2 == 0, players, 2)
+        if rng.random() < 0.01:
+            victim = (killer + 2) % players
+        for _ in range(rng.randint(1, 4)):
+            lines.append(
+                f"Hit: {victim} {killer} {rng.randint(0, 5)} {rng.choice(HIT_WEAPONS)}: "
+                f"Player{killer} hit Player{victim} in the {rng.choice(HITLOCS)}"
+            )
+        weapon = rng.choice(tuple(WEAPONS))
+        lines.append(
+            f"Kill: {killer} {victim} {WEAPONS[weapon]}: "
+            f"Player{killer} killed Player{victim} by {weapon}"
+        )
+        lines.append(f"Item: {victim} {rng.choice(ITEMS)}")
+        lines.append(f"ClientSpawn: {victim}")
+        if rng.random() < 0.1:
+            lines.append(f"say: {killer} Player{killer}: {rng.choice(CHAT)}")
+        if rng.random() < 0.02:
+            lines.append(
+                f"Flag: {killer} 2: team_CTF_{rng.choice(('red', 'blue'))}flag"
+            )
+    lines.append("Exit: Timelimit hit.")
+    lines.append("red:12 blue:8")
+    lines.append("ShutdownGame:")
+    for cid in range(players):
+        lines.append(f"ClientDisconnect: {cid}")
+
+
+def write_log(path, games, seed=1):
+    rng = random.Random(seed)  # noqa: S311
+    lines = []
+    for _ in range(games):
+        generate_game(lines, rng)
+    with open(path, "w") as f:
+        for i, line in enumerate(lines):
+            minutes, seconds = divmod(i // 10, 60)
+            f.write(f"{minutes:3}:{seconds:02} {line}\n")
+    return len(lines)
+
+
+def main(argv):
+    p = argparse.ArgumentParser(prog="python -m benchmarks.bench_replay")
+    p.add_argument("--games", type=int, default=20, help="number of games to generate")
+    p.add_argument(
+        "--plugins", default=PLUGINS, help="comma separated list of plugins to load"
+    )
+    p.add_argument(
+        "--save", metavar="FILE", help="write the measurements to a JSON file"
+    )
+    p.add_argument(
+        "--baseline", metavar="FILE", help="compare against saved measurements"
+    )
+    p.add_argument("--tolerance", type=float, default=0.2, help="accepted lines/s drop")
+    options = p.parse_args(argv[1:])
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        game_log = os.path.join(tmpdir, "games.log")
+        write_log(game_log, options.games)
+        result = replay(
+            game_log,
+            plugins=options.plugins.split(","),
+            logfile=os.path.join(tmpdir, "b3.log"),
+        )
+    print(result.report())
+
+    if options.save:
+        with open(options.save, "w") as f:
+            json.dump(result.asDict(), f, indent=2)
+
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)["lines_per_second"]
+        change = result.linesPerSecond / baseline - 1
+        print(f"baseline   : {baseline:0.0f} lines/s ({change:+.1%})")
+        if change < -options.tolerance:
+            print("REGRESSION : lines/s dropped more than the accepted tolerance")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,135 @@
+"""
+Compare the columnar map stats of the stats plugin against the client variables
+it kept the stats in before.
+
+    python -m benchmarks.bench_stats [slots]
+
+Reports the time of a damage and a kill event and of a top 5 lookup
+(!topstats, !topxp and the awards) with ``slots`` connected clients, then of a
+kill followed by a lookup, which re-ranks the clients of the kill.
+"""
+
+import random
+import sys
+import timeit
+
+from b3.clients import Client
+from b3.plugins.stats import MapStats
+
+
+class LegacyStats:
+    """
+    The event handlers and top lists of the stats plugin before MapStats.
+    """
+
+    startPoints = 100.0
+
+    def onDamage(self, killer, victim, points):
+        killer.var(self, "shotsHit", 0).value += 1
+        killer.var(self, "damageHit", 0).value += points
+        victim.var(self, "shotsGot", 0).value += 1
+        victim.var(self, "damageGot", 0).value += points
+
+    def onKill(self, killer, victim, points):
+        killer.var(self, "shotsHit", 0).value += 1
+        killer.var(self, "damageHit", 0).value += points
+        victim.var(self, "shotsGot", 0).value += 1
+        victim.var(self, "damageGot", 0).value += points
+        killer.var(self, "kills", 0).value += 1
+        victim.var(self, "deaths", 0).value += 1
+        val = self.score(killer, victim)
+        killer.var(self, "points", self.startPoints).value += val
+        killer.var(self, "pointsWon", 0).value += val
+        victim.var(self, "points", self.startPoints).value -= val
+        victim.var(self, "pointsLost", 0).value += val
+        self.updateXP(killer)
+        self.updateXP(victim)
+
+    def updateXP(self, sclient):
+        realpoints = (
+            sclient.var(self, "pointsWon", 0).value
+            - sclient.var(self, "pointsLost", 0).value
+        )
+        if sclient.var(self, "deaths", 0).value != 0:
+            experience = (
+                sclient.var(self, "kills", 0).value * realpoints
+            ) / sclient.var(self, "deaths", 0).value
+        else:
+            experience = sclient.var(self, "kills", 0).value * realpoints
+        sclient.var(self, "experience", 0.0).value = experience * 1.0
+
+    def score(self, killer, victim):
+        k = max(int(killer.var(self, "points", self.startPoints).value), 1)
+        v = max(int(victim.var(self, "points", self.startPoints).value), 1)
+        return round(min(max((15.00 * (v / k) / 2) + 5, 1.0), 100.0), 2)
+
+    def top(self, clients, score_kind, top_n=5):
+        scores = [
+            (round(c.var(self, score_kind, self.startPoints).value, 2), c.exactName)
+            for c in clients
+            if c.isvar(self, score_kind)
+        ]
+        scores.sort(reverse=True)
+        return scores[:top_n]
+
+
+def timed(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main(argv):
+    slots = int(argv[1]) if len(argv) > 1 else 64
+    rng = random.Random(1)  # noqa: S311
+    clients = [Client(cid=cid, name=f"player{cid}") for cid in range(slots)]
+    pairs = [rng.sample(clients, 2) for _ in range(1000)]
+    legacy = LegacyStats()
+    stats = MapStats()
+    for killer, victim in pairs:
+        legacy.onKill(killer, victim, 100)
+        stats.kill(killer, victim, 100)
+
+    if legacy.top(clients, "points") != stats.top("points", 5, bool):
+        raise RuntimeError("top lists differ")
+
+    number = 2_000
+    killer, victim = pairs[0]
+    rows = (
+        (
+            "damage",
+            lambda: legacy.onDamage(killer, victim, 34),
+            lambda: stats.damage(killer, victim, 34),
+        ),
+        (
+            "kill",
+            lambda: legacy.onKill(killer, victim, 100),
+            lambda: stats.kill(killer, victim, 100),
+        ),
+        (
+            "top 5 points",
+            lambda: legacy.top(clients, "points"),
+            lambda: stats.top("points", 5, bool),
+        ),
+        (
+            "top 5 experience",
+            lambda: legacy.top(clients, "experience"),
+            lambda: stats.top("experience", 5, bool),
+        ),
+        (
+            "kill + top 5",
+            lambda: (legacy.onKill(killer, victim, 100), legacy.top(clients, "points")),
+            lambda: (stats.kill(killer, victim, 100), stats.top("points", 5, bool)),
+        ),
+    )
+    print(f"{slots} slots")
+    print(f"{'operation':<18} {'before (us)':>12} {'after (us)':>12} {'speedup':>8}")
+    for name, before, after in rows:
+        before = timed(before, number)
+        after = timed(after, number)
+        print(
+            f"{name:<18} {before * 1e6:>12.2f} {after * 1e6:>12.2f} {before / after:>7.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
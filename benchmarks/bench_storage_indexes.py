@@ -0,0 +1,131 @@
+"""
+Time the storage lookups done when a player connects against a large synthetic
+SQLite database, before and after the 2026.10.18 index migration.
+
+    python -m benchmarks.bench_storage_indexes [clients] [penalties]
+
+The database is created in a temporary directory from b3.sql with the indexes
+dropped (the schema before the migration), filled with ``clients`` clients (and
+one alias each) and ``penalties`` penalties, then b3-update-2026.10.18.sql is
+applied.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from b3.clients import Client
+from b3.functions import splitDSN
+from b3.parser import StubParser
+from b3.storage.sqlite import SqliteStorage
+
+MIGRATION = "@b3/sql/sqlite/b3-update-2026.10.18.sql"
+TYPES = ("Ban", "TempBan", "Kick", "Warning", "Notice")
+
+
+def populate(storage, clients, penalties, rng):
+    now = int(time.time())
+    db = storage.db
+    with db:
+        db.execute("BEGIN")
+        db.executemany(
+            "INSERT INTO clients (ip, guid, pbid, name, time_add, time_edit) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+                    f"{i:032X}",
+                    f"pb{i}",
+                    f"player{i}",
+                    now,
+                    now,
+                )
+                for i in range(clients)
+            ),
+        )
+        db.executemany(
+            "INSERT INTO aliases (alias, client_id, time_add, time_edit) VALUES (?, ?, ?, ?)",
+            ((f"alias{i}", i + 1, now, now) for i in range(clients)),
+        )
+        db.executemany(
+            "INSERT INTO penalties (type, client_id, inactive, time_add, time_expire) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    rng.choice(TYPES),
+                    rng.randint(1, clients),
+                    rng.random() < 0.3,
+                    now - rng.randint(0, 86400 * 365),
+                    rng.choice((-1, now - 3600, now + 3600)),
+                )
+                for _ in range(penalties)
+            ),
+        )
+
+
+def lookups(storage, client_ids, rounds):
+    """
+    Run the connect time lookups, returning the mean seconds per call of each.
+    """
+    calls = {
+        "numPenalties": lambda c: storage.numPenalties(c, ("Ban", "TempBan")),
+        "getClientLastPenalty": lambda c: storage.getClientLastPenalty(
+            c, ("Ban", "TempBan")
+        ),
+        "getClientsMatching(pbid)": lambda c: storage.getClientsMatching(
+            {"pbid": f"pb{c.id - 1}"}
+        ),
+        "getClientAliases": storage.getClientAliases,
+        "getClientIpAddresses": storage.getClientIpAddresses,
+        "getLastPenalties": lambda c: storage.getLastPenalties(("Ban", "TempBan"), 5),
+    }
+    results = {}
+    for name, call in calls.items():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for client_id in client_ids:
+                call(Client(id=client_id))
+        results[name] = (time.perf_counter() - start) / (rounds * len(client_ids))
+    return results
+
+
+def main(argv):
+    clients = int(argv[1]) if len(argv) > 1 else 50_000
+    penalties = int(argv[2]) if len(argv) > 2 else 300_000
+    rng = random.Random(1)  # noqa: S311
+    client_ids = [rng.randint(1, clients) for _ in range(20)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "b3.db")
+        storage = SqliteStorage(
+            f"sqlite://{path}", splitDSN(f"sqlite://{path}"), StubParser()
+        )
+        storage.connect()
+        with storage.query(
+            "SELECT name FROM sqlite_master WHERE type='index' AND sql IS NOT NULL"
+        ) as cursor:
+            for index in [row["name"] for row in cursor]:
+                storage.query(f"DROP INDEX {index}")
+
+        print(f"populating {clients} clients and {penalties} penalties...")
+        populate(storage, clients, penalties, rng)
+
+        before = lookups(storage, client_ids, rounds=1)
+        start = time.perf_counter()
+        storage.queryFromFile(MIGRATION)
+        print(f"migration applied in {time.perf_counter() - start:0.2f}s")
+        after = lookups(storage, client_ids, rounds=5)
+        storage.shutdown()
+
+    print(f"{'lookup':<26} {'before (ms)':>12} {'after (ms)':>12} {'speedup':>8}")
+    for name, elapsed in before.items():
+        print(
+            f"{name:<26} {elapsed * 1000:>12.3f} {after[name] * 1000:>12.3f} {elapsed / after[name]:>7.0f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
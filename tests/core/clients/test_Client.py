@@ -3,7 +3,7 @@ import unittest
 from unittest.mock import ANY, Mock, patch
 
 from b3 import TEAM_BLUE, TEAM_RED, TEAM_UNKNOWN
-from b3.clients import Alias, Client, Group, IpAlias
+from b3.clients import Alias, Client, Group, IpAlias, PluginVars
 from tests import B3TestCase
 
 
@@ -207,6 +207,51 @@ class Test_Client_groups(B3TestCase):
         self.client.addGroup(self.group_superadmin)
         self.assertTrue(self.client.inGroup(self.group_superadmin))
 
+    def test_maxLevel(self):
+        self.assertEqual(0, self.client.maxLevel)
+        self.client.addGroup(self.group_mod)
+        self.client.addGroup(self.group_user)
+        self.assertEqual(20, self.client.maxLevel)
+        self.assertEqual("mod", self.client.maxGroup.keyword)
+
+    def test_maxLevel_without_group(self):
+        self.console.storage.getGroupRegistry()._table[0] = ((), None)
+        self.client._tempLevel = 40
+        self.assertEqual(40, self.client.maxLevel)
+
+    def test_group_bits_are_resolved_without_query(self):
+        self.console.storage.getGroupRegistry()
+        with patch.object(self.console.storage, "query") as query:
+            for bits in range(256):
+                self.client.groupBits = bits
+                self.assertEqual(
+                    max((g.level for g in self.client.groups), default=0),
+                    self.client.maxLevel,
+                )
+        query.assert_not_called()
+
+    def test_group_bits_beyond_the_table(self):
+        self.client.groupBits = 256 | self.group_admin.id
+        self.assertGroups([self.group_admin])
+
+    def test_saved_group_invalidates_levels(self):
+        self.client.addGroup(self.group_mod)
+        self.assertEqual(20, self.client.maxLevel)
+        self.console.clients.getList = Mock(return_value=[self.client])
+        self.group_mod.level = 30
+        self.group_mod.save(self.console)
+        self.assertEqual(30, self.client.maxLevel)
+        self.assertEqual(30, self.console.getGroupLevel("mod"))
+        self.assertEqual("mod", self.console.getGroup(30).keyword)
+        self.assertRaises(KeyError, self.console.getGroup, 20)
+
+    def test_new_group(self):
+        group = Group(id=256, name="Clan", keyword="clan", level=50)
+        self.assertEqual(256, group.save(self.console))
+        self.assertEqual(group.id, self.console.getGroup("clan").id)
+        self.client.groupBits = 256
+        self.assertEqual(50, self.client.maxLevel)
+
 
 class Test_Client_events(B3TestCase):
     def setUp(self):
@@ -258,5 +303,82 @@ class Test_Client_events(B3TestCase):
             )
 
 
+class Test_Client_vars(unittest.TestCase):
+    def setUp(self):
+        self.plugin = Mock()
+        self.client = Client()
+
+    def test_setvar(self):
+        var = self.client.setvar(self.plugin, "kills", 1)
+        self.assertIs(var, self.client.setvar(self.plugin, "kills", 2))
+        self.assertEqual(2, self.client.var(self.plugin, "kills").value)
+        self.assertTrue(self.client.isvar(self.plugin, "kills"))
+        self.assertFalse(self.client.isvar(self.plugin, "deaths"))
+        self.assertFalse(self.client.isvar(Mock(), "kills"))
+
+    def test_var_default(self):
+        self.client.var(self.plugin, "kills", 0).value += 1
+        self.client.var(self.plugin, "kills", 0).value += 1
+        self.assertEqual(2, self.client.var(self.plugin, "kills", 0).value)
+        self.assertIsNone(self.client.var(self.plugin, "deaths").value)
+
+    def test_delvar(self):
+        self.client.setvar(self.plugin, "kills", 1)
+        self.client.delvar(self.plugin, "kills")
+        self.client.delvar(self.plugin, "unknown")
+        self.assertFalse(self.client.isvar(self.plugin, "kills"))
+        self.assertEqual(5, self.client.var(self.plugin, "kills", 5).value)
+
+    def test_plugins_are_separated(self):
+        other = Mock()
+        self.client.setvar(self.plugin, "kills", 1)
+        self.client.setvar(other, "kills", 2)
+        self.assertEqual(1, self.client.var(self.plugin, "kills").value)
+        self.assertEqual(2, self.client.var(other, "kills").value)
+
+    def test_slots_shared_by_clients(self):
+        other = Client()
+        self.client.setvar(self.plugin, "kills", 1)
+        other.setvar(self.plugin, "deaths", 1)
+        other.setvar(self.plugin, "kills", 3)
+        slots = PluginVars.of(self.plugin).slots
+        self.assertEqual({"kills": 0, "deaths": 1}, slots)
+        self.assertEqual(1, self.client.var(self.plugin, "kills").value)
+        self.assertFalse(self.client.isvar(self.plugin, "deaths"))
+
+    def test_slotvar(self):
+        kills = PluginVars.slot(self.plugin, "kills")
+        self.assertEqual(0, self.client.slotvar(kills, 0).value)
+        self.client.slotvar(kills).value += 2
+        self.assertEqual(2, self.client.var(self.plugin, "kills").value)
+        self.client.setslotvar(kills, 4)
+        self.assertEqual(4, self.client.var(self.plugin, "kills").value)
+        self.client.delvar(self.plugin, "kills")
+        self.assertEqual(5, self.client.slotvar(kills, 5).value)
+
+    def test_slots_forgotten_with_plugin(self):
+        plugin = Mock()
+        plugin_id = id(plugin)
+        PluginVars.slot(plugin, "kills")
+        del plugin
+        self.assertNotIn(plugin_id, PluginVars._registry)
+
+    def test_plugin_reusing_id(self):
+        self.client.setvar(self.plugin, "kills", 1)
+        # as if the plugin was collected and another one got its id
+        PluginVars._forget(PluginVars.of(self.plugin))
+        self.assertFalse(self.client.isvar(self.plugin, "kills"))
+        self.assertEqual(2, self.client.var(self.plugin, "kills", 2).value)
+        kills = PluginVars.slot(self.plugin, "kills")
+        self.assertIs(self.client.var(self.plugin, "kills"), self.client.slotvar(kills))
+
+    def test_slotted(self):
+        self.client.setvar(self.plugin, "kills", 1)
+        self.client.name = "joe"
+        self.assertEqual({}, self.client.__dict__)
+        self.client.custom = 1  # attributes set by plugins
+        self.assertEqual({"custom": 1}, self.client.__dict__)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,8 +1,14 @@
+import concurrent.futures
+import itertools
+import random
+import sys
+import threading
+import time
 from unittest.mock import Mock, patch
 
 import b3
 import b3.events
-from b3.clients import Client, Clients
+from b3.clients import AuthQueue, Client, ClientBan, Clients
 from tests import B3TestCase
 
 
@@ -98,3 +104,405 @@ class TestClients(B3TestCase):
         Event_mock.assert_called_once_with(
             b3.events.EVT_CLIENT_DISCONNECT, 1, joe, None
         )
+
+
+class Test_authorize(B3TestCase):
+    def setUp(self):
+        B3TestCase.setUp(self)
+        self.storage = self.console.storage
+        self.clients = self.console.clients
+        self.known = Client(guid="known_guid", greeting="hi", connections=3)
+        self.storage.setClient(self.known)
+        self.fsa = Client(guid="old_guid", pbid="fsa_login", connections=1)
+        self.storage.setClient(self.fsa)
+
+    def connect(self, cid, **kwargs):
+        self.clients.deferAuth = True
+        try:
+            return self.clients.newClient(cid, **kwargs)
+        finally:
+            self.clients.deferAuth = False
+
+    def selects(self, query, table):
+        return [
+            c
+            for c in query.call_args_list
+            if c[0][0].split()[:4] == ["SELECT", "*", "FROM", table]
+        ]
+
+    def test_deferred_auth(self):
+        joe = self.connect(1, name="joe", guid="known_guid")
+        self.assertFalse(joe.authed)
+        self.assertEqual(0, joe.id)
+
+    def test_authorize(self):
+        joe = self.connect(1, name="joe", guid="known_guid")
+        bob = self.connect(2, name="bob", guid="new_guid", pbid="fsa_login")
+        jack = self.connect(3, name="jack", guid="fresh_guid")
+        with (
+            patch.object(self.storage, "query", wraps=self.storage.query) as query,
+            patch.object(self.console, "queueEvent") as queueEvent,
+        ):
+            authorized = self.clients.authorize([joe, bob, jack])
+        self.assertEqual([joe, bob, jack], authorized)
+        self.assertTrue(all(c.authed and not c.authorizing for c in authorized))
+        self.assertEqual(self.known.id, joe.id)
+        self.assertEqual("hi", joe.greeting)
+        self.assertEqual(4, joe.connections)
+        self.assertEqual(self.fsa.id, bob.id)
+        self.assertEqual(2, bob.connections)
+        self.assertGreater(jack.id, bob.id)
+        auth_events = [
+            c[0][0].client
+            for c in queueEvent.call_args_list
+            if c[0][0].type == self.console.getEventID("EVT_CLIENT_AUTH")
+        ]
+        self.assertEqual([joe, bob, jack], auth_events)
+        self.assertEqual(2, len(self.selects(query, "clients")))
+        self.assertEqual(1, len(self.selects(query, "penalties")))
+        self.assertIn(jack.id, self.storage.penaltySummaries)
+
+    def test_updates_in_one_transaction(self):
+        joe = self.connect(1, name="joe", guid="known_guid")
+        bob = self.connect(2, name="bob", guid="new_guid", pbid="fsa_login")
+        with patch.object(
+            self.storage, "queryMany", wraps=self.storage.queryMany
+        ) as queryMany:
+            self.clients.authorize([joe, bob])
+        queryMany.assert_called_once()
+        self.assertEqual(2, len(queryMany.call_args[0][0]))
+        self.assertEqual(
+            4, self.storage.getClient(Client(guid="known_guid")).connections
+        )
+
+    def test_same_as_auth(self):
+        joe = self.connect(1, name="joe", guid="known_guid")
+        joe.auth()
+        self.clients.disconnect(joe)
+        alone = Client(id=joe.id)
+        self.storage.getClient(alone)
+        bulk = self.connect(1, name="joe", guid="known_guid")
+        self.clients.authorize([bulk])
+        self.assertEqual(alone.connections + 1, bulk.connections)
+        self.assertEqual(alone.id, bulk.id)
+        self.assertEqual(alone.greeting, bulk.greeting)
+
+    def test_banned_client(self):
+        self.storage.setClientPenalty(
+            ClientBan(clientId=self.known.id, adminId=0, timeExpire=-1, reason="cheat")
+        )
+        joe = self.connect(1, name="joe", guid="known_guid")
+        jack = self.connect(2, name="jack", guid="fresh_guid")
+        with patch.object(self.console, "ban") as ban:
+            self.assertEqual([jack], self.clients.authorize([joe, jack]))
+        ban.assert_called_once_with(joe, "cheat", None, True)
+        self.assertFalse(joe.authorizing)
+
+    def test_skips_authorized_clients(self):
+        joe = self.connect(1, name="joe", guid="known_guid")
+        joe.auth()
+        self.assertEqual([], self.clients.authorize([joe]))
+        self.assertEqual(4, joe.connections)
+
+    def test_prefetched_fsa_order(self):
+        newer = Client(
+            guid="newer_guid", pbid="fsa_login", timeEdit=self.fsa.timeEdit + 10
+        )
+        self.storage.setClient(newer)
+        # the older row is loaded first, by guid
+        prefetched = self.storage.prefetchClients(
+            [Client(guid="old_guid", pbid="fsa_login")]
+        )
+        self.assertEqual(
+            [newer.id, self.fsa.id],
+            [c.id for c in prefetched.getClientsMatching({"pbid": "fsa_login"})],
+        )
+
+    def test_storage_error(self):
+        joe = self.connect(1, name="joe", guid="known_guid")
+        jack = self.connect(2, name="jack", guid="fresh_guid")
+        with patch.object(self.storage, "setClients", side_effect=OSError):
+            self.assertRaises(OSError, self.clients.authorize, [joe, jack])
+        self.assertFalse(joe.authorizing or jack.authorizing)
+        self.assertEqual([joe, jack], self.clients.authorize([joe, jack]))
+
+    def test_concurrent_authorize(self):
+        joe = self.connect(1, name="joe", guid="known_guid")
+        with (
+            patch.object(self.console, "queueEvent") as queueEvent,
+            concurrent.futures.ThreadPoolExecutor(4) as executor,
+        ):
+            for _ in range(4):
+                executor.submit(self.clients.authorize, [joe])
+            executor.submit(joe.auth)
+        self.assertEqual(4, joe.connections)
+        queueEvent.assert_called_once()
+
+
+class Test_AuthQueue(B3TestCase):
+    def setUp(self):
+        B3TestCase.setUp(self)
+        self.clients = self.console.clients
+        self.queue = self.clients.authQueue = AuthQueue(self.clients)
+
+    def tearDown(self):
+        self.clients.stopAuthWorker()
+        B3TestCase.tearDown(self)
+
+    def wait_for(self, predicate, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not predicate() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(predicate())
+
+    def test_new_clients_are_queued(self):
+        joe = self.clients.newClient(1, name="joe", guid="joe_guid")
+        self.assertFalse(joe.authed)
+        self.assertEqual(1, self.queue.backlog())
+
+    def test_deduplicated_by_slot(self):
+        joe = self.clients.newClient(1, name="joe", guid="joe_guid")
+        self.queue.put(joe)
+        self.assertEqual(1, self.queue.backlog())
+        self.assertEqual(1, self.queue.queued)
+        self.assertEqual(1, self.queue.deduplicated)
+        jack = self.clients.newClient(1, name="jack", guid="jack_guid")
+        self.assertEqual(1, self.queue.backlog())
+        self.assertEqual(2, self.queue.deduplicated)
+        self.queue.start()
+        self.queue.stop()
+        self.assertTrue(jack.authed)
+        self.assertFalse(joe.authed)
+        self.assertEqual(1, self.queue.authorized)
+
+    def test_worker(self):
+        self.queue.start()
+        with patch.object(self.console, "queueEvent") as queueEvent:
+            joe = self.clients.newClient(1, name="joe", guid="joe_guid")
+            self.wait_for(lambda: joe.authed and not joe.authorizing)
+            self.wait_for(lambda: self.queue.backlog() == 0)
+        self.assertIn(
+            self.console.getEventID("EVT_CLIENT_AUTH"),
+            [c[0][0].type for c in queueEvent.call_args_list],
+        )
+        self.assertEqual(1, len(self.queue.lags))
+
+    def test_skips_clients_which_left(self):
+        joe = self.clients.newClient(1, name="joe", guid="joe_guid")
+        joe.disconnect()
+        self.queue.start()
+        self.queue.stop()
+        self.assertFalse(joe.authed)
+        self.assertEqual(0, self.queue.backlog())
+
+    def test_stop_worker(self):
+        self.clients.authQueue = None
+        self.clients.startAuthWorker(maxBatch=2)
+        queue = self.clients.authQueue
+        players = [
+            self.clients.newClient(cid, name=f"p{cid}", guid=f"guid_{cid}")
+            for cid in range(5)
+        ]
+        self.clients.stopAuthWorker()
+        self.assertIsNone(self.clients.authQueue)
+        self.assertTrue(all(p.authed for p in players))
+        self.assertEqual(5, queue.authorized)
+        self.assertIn("backlog=0", str(queue))
+
+
+class Test_indexes(B3TestCase):
+    def setUp(self):
+        B3TestCase.setUp(self)
+        self.clients = self.console.clients
+        self.clients.deferAuth = True
+
+    def assertConsistent(self):
+        self.assertEqual([], self.clients.checkIndexes())
+
+    def test_lookups(self):
+        joe = self.clients.newClient(1, name="^1Joe", guid="JOE_GUID", pbid="joe_fsa")
+        joe.id = 12
+        self.assertIs(joe, self.clients.getByName("joe"))
+        self.assertIs(joe, self.clients.getByExactName("^1JOE"))
+        self.assertIs(joe, self.clients.getByGUID("joe_guid"))
+        self.assertIs(joe, self.clients.getByDbId(12))
+        self.assertIs(joe, self.clients.getByPbid("joe_fsa"))
+        self.assertEqual([joe], self.clients.getByDB("@12"))
+        self.assertConsistent()
+
+    def test_updated_by_the_setters(self):
+        joe = self.clients.newClient(1, name="joe", guid="JOE_GUID")
+        joe.name = "jack"
+        self.assertIsNone(self.clients.getByName("joe"))
+        self.assertIs(joe, self.clients.getByName("jack"))
+        joe._guid = None
+        joe.guid = "OTHER_GUID"
+        self.assertIsNone(self.clients.getByGUID("JOE_GUID"))
+        self.assertIs(joe, self.clients.getByGUID("OTHER_GUID"))
+        joe.pbid = "fsa"
+        joe.id = 3
+        self.assertIs(joe, self.clients.getByPbid("fsa"))
+        self.assertIs(joe, self.clients.getByDbId(3))
+        self.assertConsistent()
+
+    def test_lookup_during_reindex(self):
+        joe = self.clients.newClient(1, name="joe", guid="JOE_GUID")
+        joe.id = 12
+        stop = threading.Event()
+
+        def rename():
+            for i in itertools.count():
+                if stop.is_set():
+                    return
+                joe.name = f"joe{i % 2}"
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # switch threads as often as possible
+        thread = threading.Thread(target=rename)
+        thread.start()
+        try:
+            missed = sum(self.clients.getByDbId(12) is not joe for _ in range(20000))
+        finally:
+            stop.set()
+            thread.join()
+            sys.setswitchinterval(interval)
+        self.assertEqual(0, missed)
+
+    def test_disconnect_and_slot_reuse(self):
+        joe = self.clients.newClient(1, name="joe", guid="JOE_GUID")
+        jack = self.clients.newClient(1, name="jack", guid="JACK_GUID")
+        self.assertIsNone(self.clients.getByName("joe"))
+        joe.name = "joe2"  # no longer connected: not indexed
+        self.assertIsNone(self.clients.getByName("joe2"))
+        jack.disconnect()
+        self.assertIsNone(self.clients.getByGUID("JACK_GUID"))
+        self.assertConsistent()
+
+    def test_same_name(self):
+        first = self.clients.newClient(1, name="joe", guid="GUID_1")
+        second = self.clients.newClient(2, name="JOE", guid="GUID_2")
+        self.assertIs(first, self.clients.getByName("joe"))
+        first.disconnect()
+        self.assertIs(second, self.clients.getByName("joe"))
+        self.assertConsistent()
+
+    def test_checkIndexes(self):
+        joe = self.clients.newClient(1, name="joe", guid="JOE_GUID")
+        joe._name = "jack"  # bypasses the setter
+        self.assertEqual(3, len(self.clients.checkIndexes()))  # slot, name, trigrams
+        self.clients.resetIndex()
+        self.assertConsistent()
+
+    def test_churn(self):
+        rng = random.Random(42)  # noqa: S311
+        for i in range(2000):
+            cid = rng.randrange(64)
+            action = rng.random()
+            client = self.clients.getByCID(cid)
+            if client is None or action < 0.3:
+                self.clients.newClient(cid, name=f"p{i}", guid=f"GUID_{i}")
+            elif action < 0.5:
+                client.disconnect()
+            elif action < 0.8:
+                client.name = f"name{rng.randrange(20)}"
+            else:
+                client.id = rng.randrange(1, 100)
+        self.assertConsistent()
+        for client in self.clients.values():
+            self.assertIs(client, self.clients.getByGUID(client.guid))
+
+    def test_search_in_slot_order(self):
+        self.clients.newClient(5, name="Joe Bar", guid="GUID_5")
+        self.clients.newClient(2, name="joebar2", guid="GUID_2", pbid="xjoeb")
+        self.clients.newClient(9, name="bob", guid="GUID_9", pbid="joebarfsa")
+        self.clients.newClient(2, name="JoeBar3", guid="GUID_3")  # reuses slot 2
+        self.assertEqual(
+            [5, 2], [c.cid for c in self.clients.getClientsByName("joe bar")]
+        )
+        self.assertEqual([5, 2, 9], [c.cid for c in self.clients.getByMagic("joebar")])
+        self.assertEqual([9], [c.cid for c in self.clients.getByMagic("arfs")])
+        self.assertEqual([], self.clients.getClientsByName("joebarz"))
+        self.assertConsistent()
+
+    def test_search_hidden(self):
+        joe = self.clients.newClient(1, name="joe", guid="GUID_1")
+        joe.hide = True
+        self.assertEqual([], self.clients.getClientsByName("joe"))
+        joe.hide = False
+        self.assertEqual([joe], self.clients.getClientsByName("joe"))
+
+    def test_search_as_scan(self):
+        rng = random.Random(7)  # noqa: S311
+        letters = "abc d^"
+        for i in range(500):
+            cid = rng.randrange(64)
+            if self.clients.getByCID(cid) is None or rng.random() < 0.3:
+                self.clients.newClient(cid, guid=f"GUID_{i}", pbid=f"fsa{i % 7}")
+            else:
+                self.clients[cid].name = "".join(
+                    rng.choice(letters) for _ in range(rng.randrange(8))
+                )
+            needle = "".join(rng.choice(letters) for _ in range(rng.randrange(1, 5)))
+            scan = needle.lower().replace(" ", "")
+            expected = [
+                c
+                for c in self.clients.values()
+                if scan in c.name.lower().replace(" ", "") or scan in c.pbid
+            ]
+            self.assertEqual(expected, self.clients.getByMagic(needle))
+        self.assertConsistent()
+
+    def test_getByGUID_fuzzy(self):
+        guid = "0123456789ABCDEF0123456789ABCDEF"
+        joe = self.clients.newClient(1, name="joe", guid=guid.lower())
+        self.assertIs(joe, self.clients.getByGUID(guid))  # case
+        self.assertIs(joe, self.clients.getByGUID(guid[1:]))  # prefix
+        self.assertIs(joe, self.clients.getByGUID(guid[:-1]))  # suffix
+        self.assertIs(joe, self.clients.getByGUID(guid[:5] + guid[6:]))
+        self.assertIsNone(self.clients.getByGUID(guid[:5] + guid[7:]))
+        self.assertIsNone(self.clients.getByGUID("X" + guid[1:]))
+        jack = self.clients.newClient(2, name="jack", guid=guid[:-1])
+        self.assertIs(jack, self.clients.getByGUID(guid[:-1]))
+        self.assertIs(jack, self.clients.getByGUID(guid[:-1] + "X"))
+        joe.disconnect()
+        self.assertIs(jack, self.clients.getByGUID(guid))
+        self.assertConsistent()
+
+    def test_getByGUID_as_scan(self):
+        rng = random.Random(11)  # noqa: S311
+
+        def guid():
+            length = rng.choice((30, 31, 32, 33))
+            return "".join(rng.choice("AB") for _ in range(length))
+
+        def needle():
+            if not self.clients or rng.random() < 0.2:
+                return guid()
+            found = rng.choice(list(self.clients.values())).guid
+            i = rng.randrange(len(found))
+            return rng.choice(
+                (
+                    found.lower(),
+                    found[:i] + found[i + 1 :],
+                    found[:i] + rng.choice("AB") + found[i:],
+                    found[:i] + "C" + found[i + 1 :],
+                )
+            )
+
+        matched = 0
+        for i in range(500):
+            cid = rng.randrange(16)
+            self.clients.newClient(cid, name=f"p{i}", guid=guid())
+            value = needle()
+            expected = self.clients._lookup("guid", value.upper()) or next(
+                (
+                    c
+                    for c in self.clients.values()
+                    if b3.functions.fuzzyGuidMatch(c.guid, value.upper())
+                ),
+                None,
+            )
+            self.assertIs(expected, self.clients.getByGUID(value))
+            matched += expected is not None
+        self.assertGreater(matched, 100)
+        self.assertConsistent()
@@ -1,4 +1,5 @@
 import logging
+import re
 import unittest
 from unittest.mock import Mock, call, patch
 
@@ -10,7 +11,8 @@ from b3.clients import Client
 from b3.config import CfgConfigParser
 from b3.events import Event
 from b3.output import VERBOSE2
-from b3.parsers.iourt43 import Iourt43Parser
+from b3.parsers.iourt43 import Iourt43Parser, line_format_prefix
+from b3.rcon import ResponseCache
 from tests import InstantTimer, logging_disabled
 from tests.fake import FakeClient
 
@@ -97,6 +99,10 @@ class Test_log_lines_parsing(Iourt43TestCase):
 
     def setUp(self):
         Iourt43TestCase.setUp(self)
+        # build events even if no plugin is registered for them
+        has_handlers = patch.object(self.console, "hasHandlers", return_value=True)
+        has_handlers.start()
+        self.addCleanup(has_handlers.stop)
         self.console.startup()
         self.joe = FakeClient(self.console, name="Joe", guid="000000000000000")
         self.bot = FakeClient(
@@ -695,6 +701,171 @@ class Test_kill_mods(Test_log_lines_parsing):
         assert_mod("48", "UT_MOD_GOOMBA")
 
 
+class Test_unsubscribed_events(Iourt43TestCase):
+    def setUp(self):
+        Iourt43TestCase.setUp(self)
+        self.console.startup()
+        self.joe = FakeClient(self.console, name="Joe", guid="000000000000000")
+        self.joe.connects("0")
+        self.bob = FakeClient(self.console, name="Bob", guid="111111111111111")
+        self.bob.connects("1")
+
+    def test_hit_keeps_last_damage_taken(self):
+        with (
+            patch.object(self.console, "getEvent") as getEvent,
+            patch.object(self.console, "queueEvent") as queueEvent,
+        ):
+            self.console.parseLine("Hit: 1 0 1 19: Joe hit Bob in the Head")
+        self.assertFalse(getEvent.called)
+        self.assertFalse(queueEvent.called)
+        self.assertEqual(
+            (100, self.console.UT_MOD_M4, "1"), self.bob.data["lastDamageTaken"]
+        )
+
+    def test_kill_keeps_client_state(self):
+        self.bob.data["lastDamageTaken"] = (50, self.console.UT_MOD_LR300, "2")
+        with patch.object(self.console, "queueEvent") as queueEvent:
+            self.console.parseLine("Kill: 0 1 19: Joe killed Bob by UT_MOD_LR300")
+        self.assertFalse(queueEvent.called)
+        self.assertEqual(b3.STATE_DEAD, self.bob.state)
+        self.assertNotIn("lastDamageTaken", self.bob.data)
+
+    def test_subscribed_event_is_built(self):
+        self.console._handlers[self.console.getEventID("EVT_CLIENT_DAMAGE")] = [Mock()]
+        self.addCleanup(self.console._handlers.clear)
+        with patch.object(self.console, "queueEvent") as queueEvent:
+            self.console.parseLine("Hit: 1 0 1 19: Joe hit Bob in the Head")
+        self.assertTrue(queueEvent.called)
+
+
+LOG_LINES_SAMPLE = (
+    "Hit: 12 7 1 19: BSTHanzo[FR] hit ercan in the Helmet",
+    "Item: 4 ut_weapon_glock",
+    "ClientBegin: 4",
+    "ClientConnect: 4",
+    "ClientDisconnect: 4",
+    "ClientSpawn: 0",
+    "ClientMelted: 1",
+    "Kill: 0 1 16: XLR8or killed =lvl1=Cheetah by UT_MOD_SPAS",
+    r"ClientUserinfo: 2 \ip\11.181.55.130:27960\snaps\20\name\|30+|money",
+    r"ClientUserinfoChanged: 4 n\pibul\t\1\r\1\tl\0\f0\ninja\f1\\f2\\a0\0",
+    "Flag: 2 2: team_CTF_blueflag",
+    "say: 7 -crespino-:",
+    "say: 6 ^5Marcel ^2[^6CZARMY^2]: !help",
+    "sayteam: 9 [Rev]BudgetTussle: np",
+    "SAY: 6 Joe: hi",
+    "Assist: 0 14 15: -[TPF]-PtitBigorneau assisted Bot1 to kill Bot2",
+    """Radio: 0 - 7 - 2 - "New Alley" - "I'm going for the flag\"""",
+    "FlagCaptureTime: 0: 1234567890",
+    "Flag Return: RED",
+    "Session data initialised for client on slot 0 at 123456",
+    "ShutdownGame:",
+    "Warmup:",
+    'AccountValidated: 4 - m0neysh0t - -1 - ""',
+    r"InitGame: \sv_allowdownload\0\g_matchmode\0\g_gametype\8",
+    "Bombholder is 2",
+    "bombholder is 2",
+    "Bomb was defused by 3!",
+    "Bomb has been collected by 2",
+    "Pop!",
+    "ThawOutStarted: 0 1: Fenix started thawing out Biddle",
+    "red:12 blue:8",
+    'Callvote: 1 - "map dressingroom"',
+    "Vote: 0 - 2",
+    'VotePassed: 1 - 0 - "reload"',
+    'VoteFailed: 1 - 1 - "restart"',
+    "ClientJumpRunStarted: 0 - way: 1 - attempt: 1 of 5",
+    "ClientJumpRunStopped: 0 - way: 1 - time: 12345",
+    "ClientJumpRunCanceled: 0 - way: 1",
+    "ClientSavePosition: 0 - 335.384887 - 67.469154 - -23.875000",
+    "ClientGoto: 0 - 1 - 335.384887 - 67.469154 - -23.875000",
+    "Freeze: 0 1 16: Fenix froze Biddle by UT_MOD_SPAS",
+    "saytell: 15 16 repelSteeltje: nno",
+    "tell: 7 -crespino-: hi",
+    "Exit: Timelimit hit.",
+    "ClientUserinfoChanged:",
+    "Hit: garbage",
+    "------------------------------------------------------------",
+    "",
+    "42",
+)
+
+
+class Test_getLineParts(Iourt43TestCase):
+    def test_same_match_as_linear_scan(self):
+        for line in LOG_LINES_SAMPLE:
+            index, m = self.console._matchLineFormat(line)
+            expected_index, expected_m = self.console._matchLineFormatLinear(line)
+            self.assertEqual(expected_index, index, line)
+            if expected_m:
+                self.assertDictEqual(expected_m.groupdict(), m.groupdict(), line)
+                self.assertTupleEqual(expected_m.groups(), m.groups(), line)
+
+    def test_line_format_prefix(self):
+        prefixes = [line_format_prefix(f) for f in self.console._lineFormats]
+        self.assertEqual("Hit", prefixes[0])
+        self.assertEqual("Client", prefixes[2])
+        self.assertEqual("ClientUserinfo", prefixes[4])
+        self.assertEqual("", prefixes[6])  # say|sayteam
+        self.assertEqual("Flag", prefixes[10])  # Flag Return
+        self.assertEqual("bombholder", prefixes[14])
+        self.assertEqual("", prefixes[-1])
+
+    def test_line_format_prefix_optional(self):
+        self.assertEqual("Hi", line_format_prefix(re.compile(r"^Hit?:")))
+        self.assertEqual("", line_format_prefix(re.compile(r"^(Hit)?:")))
+        self.assertEqual("", line_format_prefix(re.compile(r"^Hit: 1|Kill: 2")))
+
+    def test_timestamp_is_cleared(self):
+        _, action, data = self.console.getLineParts("13:34 ClientBegin: 4")
+        self.assertEqual("clientbegin", action)
+        self.assertEqual("4", data)
+
+
+class Test_dispatch(Iourt43TestCase):
+    def setUp(self):
+        Iourt43TestCase.setUp(self)
+        self.console.startup()
+        self.console._unknown_actions.clear()
+
+    def test_table_built_at_startup(self):
+        self.assertEqual(self.console.OnHit, self.console._dispatch["hit"])
+        self.assertEqual(self.console.OnWarmup, self.console._dispatch["warmup"])
+        self.assertEqual(
+            self.console.getEventID("EVT_GAME_FLAG_HOTPOTATO"),
+            self.console._dispatch["hotpotato"],
+        )
+
+    def test_action_with_spaces_resolved_once(self):
+        self.assertNotIn("flag return", self.console._dispatch)
+        with patch.object(self.console, "queueEvent"):
+            self.console.parseLine("Flag Return: RED")
+        self.assertEqual(
+            self.console.OnFlagReturn, self.console._dispatch["flag return"]
+        )
+
+    def test_handler_added_after_startup(self):
+        self.console.OnFoo = Mock(return_value=None)
+        self.console.buildDispatchTable()
+        self.console.parseLine("foo: 1 2 bar")
+        self.console.OnFoo.assert_called_once()
+
+    def test_unknown_action_counted(self):
+        with (
+            patch.object(self.console, "queueEvent") as queueEvent,
+            patch.object(self.console, "warning") as warning,
+        ):
+            self.console.parseLine("foo: bar")
+            self.console.parseLine("foo: baz")
+        self.assertEqual(2, self.console._unknown_actions["foo"])
+        self.assertEqual(1, warning.call_count)
+        self.assertEqual(2, queueEvent.call_count)
+        self.assertNotIn("foo", self.console._dispatch)
+        self.console.OnFoo = Mock(return_value=None)
+        self.console.parseLine("foo: bar")
+        self.console.OnFoo.assert_called_once()
+
+
 class Test_OnClientuserinfo(Iourt43TestCase):
     def setUp(self):
         super().setUp()
@@ -1186,6 +1357,29 @@ num score ping name            lastmsg address               qport rate
             rv,
         )
 
+    def test_query_responses_are_shared(self):
+        # GIVEN
+        self.console.rcon_cache = ResponseCache(ttl=60)
+        self.console.write = Mock(return_value="map: ut4_casa\n")
+        # WHEN
+        self.console.getMap()
+        self.console.getPlayerList()
+        self.console.getPlayerPings()
+        # THEN
+        self.assertEqual(1, self.console.write.call_count)
+        self.assertEqual(2, self.console.rcon_cache.hits)
+
+    def test_query_cache_invalidated(self):
+        # GIVEN
+        self.console.rcon_cache = ResponseCache(ttl=60)
+        self.console.write = Mock(return_value="map: ut4_casa\n")
+        self.console.getMap()
+        # WHEN
+        self.console.OnInitgame("InitGame", r"\mapname\ut4_turnpike")
+        self.console.getMap()
+        # THEN
+        self.assertEqual(2, self.console.write.call_count)
+
     def test_getPlayerList2(self):
         # GIVEN
         when(self.console).write("status", maxRetries=anything()).thenReturn(
@@ -0,0 +1,95 @@
+import sqlite3
+import unittest
+
+from b3.clients import Alias
+from b3.storage.cursor import ColumnMap, Cursor, FetchedCursor
+
+
+class CursorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.execute("CREATE TABLE t (id INTEGER, name TEXT)")
+        self.db.executemany(
+            "INSERT INTO t VALUES (?, ?)", [(i, f"name{i}") for i in range(1, 251)]
+        )
+
+    def tearDown(self):
+        self.db.close()
+
+    def cursor(self, query="SELECT id, name FROM t ORDER BY id"):
+        return Cursor(self.db.execute(query), self.db)
+
+
+class Test_Cursor(CursorTestCase):
+    def test_reads_in_blocks(self):
+        class BlockCursor(FetchedCursor):
+            blocks = 0
+
+            def fetchone(self):
+                raise AssertionError("rows are read in blocks")
+
+            def fetchmany(self, size=1):
+                self.blocks += 1
+                return super().fetchmany(size)
+
+        raw = self.db.execute("SELECT id, name FROM t ORDER BY id")
+        fetched = BlockCursor(raw.description, raw.fetchall())
+        cursor = Cursor(fetched, self.db)
+        rows = list(cursor.tuples())
+        self.assertEqual(250, len(rows))
+        self.assertEqual((250, "name250"), rows[-1])
+        self.assertEqual(4, fetched.blocks)  # 100 + 100 + 50 + the empty one
+        self.assertTrue(cursor.EOF)
+
+    def test_rows(self):
+        with self.cursor() as cursor:
+            self.assertEqual(["id", "name"], cursor.columns)
+            self.assertEqual({"id": 1, "name": "name1"}, cursor.getRow())
+            self.assertEqual(250, len(list(cursor)))
+
+    def test_getValue(self):
+        cursor = self.cursor()
+        self.assertEqual("name1", cursor.getValue("name"))
+        cursor.moveNext()
+        self.assertEqual(2, cursor.getValue("id"))
+        self.assertEqual("x", cursor.getValue("unknown", "x"))
+        cursor.close()
+        self.assertEqual("x", cursor.getValue("id", "x"))
+
+    def test_empty(self):
+        cursor = self.cursor("SELECT id, name FROM t WHERE id < 0")
+        self.assertFalse(cursor)
+        self.assertEqual([], list(cursor.tuples()))
+        self.assertIsNone(cursor.getOneRow())
+
+
+class Test_ColumnMap(CursorTestCase):
+    mapping = ColumnMap(Alias, {"id": ("id", int), "name": ("alias", str.upper)})
+
+    def test_getObjects(self):
+        aliases = self.cursor().getObjects(self.mapping)
+        self.assertEqual(250, len(aliases))
+        self.assertIsInstance(aliases[0], Alias)
+        self.assertEqual((1, "NAME1"), (aliases[0].id, aliases[0].alias))
+
+    def test_getObject(self):
+        alias = Alias()
+        cursor = self.cursor()
+        self.assertIs(alias, cursor.getObject(self.mapping, alias))
+        self.assertEqual("NAME1", alias.alias)
+        self.assertTrue(cursor.EOF)
+        self.assertIsNone(cursor.getObject(self.mapping))
+
+    def test_plan_per_column_set(self):
+        mapping = ColumnMap(dict, attribute=str.upper)
+        plan = mapping.plan(["id", "name"])
+        self.assertIs(plan, mapping.plan(("id", "name")))
+        self.assertEqual((None, ((0, "ID", None), (1, "NAME", None))), plan)
+        self.assertEqual(((1, "ID", None),), mapping.plan(["name", "id"])[1][1:])
+
+    def test_key(self):
+        mapping = ColumnMap(
+            lambda name: Alias(clientId=len(name)), {"id": ("id", None)}, key="name"
+        )
+        alias = self.cursor("SELECT id, name FROM t WHERE id = 10").getObject(mapping)
+        self.assertEqual((10, 6), (alias.id, alias.clientId))
@@ -43,4 +43,4 @@ class Test_DatabaseStorage(unittest.TestCase):
     def test_b3_sql_file_parsing(self):
         with open(b3.functions.getAbsolutePath("@b3/sql/sqlite/b3.sql")) as sql_file:
             statements = DatabaseStorage.getQueriesFromFile(sql_file)
-            self.assertEqual(15, len(statements))
+            self.assertEqual(20, len(statements))
@@ -0,0 +1,154 @@
+import time
+from unittest.mock import patch
+
+from b3.clients import Client, ClientBan, ClientKick, ClientTempBan, ClientWarning
+from b3.functions import splitDSN
+from b3.storage.sqlite import SqliteStorage
+from tests import B3TestCase
+
+
+class Test_PenaltySummary(B3TestCase):
+    def setUp(self):
+        B3TestCase.setUp(self)
+        self.storage = self.console.storage = SqliteStorage(
+            "sqlite://:memory:", splitDSN("sqlite://:memory:"), self.console
+        )
+        self.storage.connect()
+        self.client = Client(guid="abc")
+        self.storage.setClient(self.client)
+        self.now = int(time.time())
+
+    def tearDown(self):
+        B3TestCase.tearDown(self)
+        self.storage.shutdown()
+
+    def penalty(self, cls, time_add, time_expire=-1, **kwargs):
+        penalty = cls(
+            clientId=self.client.id,
+            adminId=0,
+            timeAdd=time_add,
+            timeExpire=time_expire,
+            **kwargs,
+        )
+        penalty.save(self.console)
+        return penalty
+
+    def assertSameAsDatabase(self):
+        """The summary answers what the database would"""
+        summary = self.storage.penaltySummaries.pop(self.client.id)
+        expected = self.lookups()
+        self.storage.penaltySummaries[self.client.id] = summary
+        with patch.object(self.storage, "query", wraps=self.storage.query) as query:
+            self.assertEqual(expected, self.lookups())
+        query.assert_not_called()
+
+    def lookups(self):
+        def ids(penalty):
+            return penalty.id if penalty else None
+
+        storage = self.storage
+        return (
+            storage.numPenalties(self.client, ("Ban", "TempBan")),
+            storage.numPenalties(self.client, "Warning"),
+            ids(storage.getClientLastPenalty(self.client, ("Ban", "TempBan"))),
+            ids(storage.getClientLastPenalty(self.client, "Warning")),
+            ids(storage.getClientFirstPenalty(self.client, "Warning")),
+            [p.id for p in storage.getClientPenalties(self.client, "Warning")],
+        )
+
+    def test_loaded_summary(self):
+        self.penalty(ClientBan, self.now - 100, inactive=1)
+        self.penalty(ClientTempBan, self.now - 90, self.now - 10)  # expired
+        self.penalty(ClientTempBan, self.now - 80, self.now + 60)
+        self.penalty(ClientWarning, self.now - 70, self.now + 600)
+        self.penalty(ClientWarning, self.now - 60, self.now + 300)
+        self.penalty(ClientWarning, self.now - 50)
+        self.penalty(ClientKick, self.now - 40)
+        summary = self.storage.loadPenaltySummary(self.client)
+        self.assertEqual(4, len(summary))
+        self.assertSameAsDatabase()
+
+    def test_kept_current_by_writes(self):
+        self.storage.loadPenaltySummary(self.client)
+        warning = self.penalty(ClientWarning, self.now - 70, self.now + 600)
+        self.penalty(ClientBan, self.now - 60, keyword=None)
+        self.assertSameAsDatabase()
+        self.assertEqual(
+            "None", self.storage.getClientLastPenalty(self.client, "Ban").keyword
+        )
+        warning.inactive = 1
+        warning.save(self.console)
+        self.assertSameAsDatabase()
+        self.storage.disableClientPenalties(self.client, "Ban")
+        self.assertSameAsDatabase()
+        self.assertEqual(0, self.storage.numPenalties(self.client, "Ban"))
+
+    def test_expires_in_memory(self):
+        self.penalty(ClientWarning, self.now - 70, self.now + 60)
+        self.storage.loadPenaltySummary(self.client)
+        self.assertEqual(1, self.storage.numPenalties(self.client, "Warning"))
+        with patch("b3.storage.common.time", return_value=self.now + 61):
+            self.assertEqual(0, self.storage.numPenalties(self.client, "Warning"))
+            self.assertIsNone(self.storage.getClientLastPenalty(self.client, "Warning"))
+
+    def test_cached_penalties_are_copies(self):
+        self.penalty(ClientBan, self.now - 60)
+        self.storage.loadPenaltySummary(self.client)
+        self.storage.getClientLastPenalty(self.client, "Ban").inactive = 1
+        self.assertEqual(1, self.storage.numPenalties(self.client, "Ban"))
+
+    def test_other_types_query_the_database(self):
+        self.penalty(ClientKick, self.now - 60)
+        self.storage.loadPenaltySummary(self.client)
+        self.assertEqual(1, self.storage.numPenalties(self.client, "Kick"))
+
+    def test_loaded_together(self):
+        other = Client(guid="def")
+        self.storage.setClient(other)
+        self.penalty(ClientWarning, self.now - 70)
+        ban = ClientBan(clientId=other.id, adminId=0, timeAdd=self.now, timeExpire=-1)
+        ban.save(self.console)
+        with patch.object(self.storage, "query", wraps=self.storage.query) as query:
+            summaries = self.storage.loadPenaltySummaries([self.client, other])
+        query.assert_called_once()
+        self.assertEqual(1, summaries[self.client.id].count("Warning", self.now))
+        self.assertEqual(1, summaries[other.id].count("Ban", self.now))
+        self.assertIs(summaries[other.id], self.storage.penaltySummaries[other.id])
+
+    def test_dropped(self):
+        self.storage.loadPenaltySummary(self.client)
+        self.storage.dropPenaltySummary(self.client)
+        self.assertNotIn(self.client.id, self.storage.penaltySummaries)
+
+
+class Test_client_penalty_summary(B3TestCase):
+    def test_loaded_on_auth_and_dropped_on_disconnect(self):
+        client = self.console.clients.newClient(1, guid="abc", name="joe")
+        client.auth()
+        self.assertIn(client.id, self.console.storage.penaltySummaries)
+        with patch.object(
+            self.console.storage, "query", wraps=self.console.storage.query
+        ) as query:
+            self.assertEqual(0, client.numBans)
+            self.assertIsNone(client.lastWarning)
+        query.assert_not_called()
+        client.warn(10, "stop that", admin=None)
+        self.assertEqual(1, client.numWarnings)
+        client.disconnect()
+        self.assertNotIn(client.id, self.console.storage.penaltySummaries)
+
+    def test_dropped_on_clear(self):
+        client = self.console.clients.newClient(1, guid="abc", name="joe")
+        client.auth()
+        self.console.clients.clear()
+        self.assertNotIn(client.id, self.console.storage.penaltySummaries)
+
+    def test_sync(self):
+        joe = self.console.clients.newClient(1, guid="abc", name="joe")
+        jack = self.console.clients.newClient(2, guid="def", name="jack")
+        joe.auth()
+        jack.auth()
+        with patch.object(self.console, "sync", return_value={1: joe}):
+            self.console.clients.sync()
+        self.assertIn(joe.id, self.console.storage.penaltySummaries)
+        self.assertNotIn(jack.id, self.console.storage.penaltySummaries)
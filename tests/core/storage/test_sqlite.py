@@ -7,6 +7,14 @@ from tests.core.storage.common import StorageAPITest
 
 SQLITE_DB = ":memory:"
 
+INDEXES = {
+    "idx_aliases_client_id",
+    "idx_ipaliases_client_id",
+    "idx_clients_pbid",
+    "idx_penalties_client",
+    "idx_penalties_type_time_add",
+}
+
 
 # SQLITE_DB = "c:/Users/Thomas/b3.db"
 
@@ -41,6 +49,32 @@ class Test_sqlite(B3TestCase, StorageAPITest):
             set(self.storage.getTables()),
         )
 
+    def getIndexes(self):
+        with self.storage.query(
+            "SELECT name FROM sqlite_master WHERE type='index' AND sql IS NOT NULL"
+        ) as cursor:
+            return {row["name"] for row in cursor}
+
+    def test_indexes(self):
+        self.assertSetEqual(INDEXES, self.getIndexes())
+
+    def test_update_adds_indexes(self):
+        for index in INDEXES:
+            self.storage.query(f"DROP INDEX {index}")
+        self.storage.queryFromFile("@b3/sql/sqlite/b3-update-2026.10.18.sql")
+        self.assertSetEqual(INDEXES, self.getIndexes())
+        # the update can be run again
+        self.storage.queryFromFile("@b3/sql/sqlite/b3-update-2026.10.18.sql")
+
+    def test_numPenalties_uses_index(self):
+        with self.storage.query(
+            "EXPLAIN QUERY PLAN SELECT COUNT(id) total FROM penalties "
+            "WHERE type = 'Ban' AND client_id = 1 AND inactive = 0 "
+            "AND (time_expire = -1 OR time_expire > 0)"
+        ) as cursor:
+            plan = " ".join(row["detail"] for row in cursor)
+        self.assertIn("idx_penalties_client", plan)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,173 @@
+import unittest
+
+from b3.clients import Client
+from b3.functions import splitDSN
+from b3.plugins.hof import record_holder, update_hall_of_fame
+from b3.storage.common import Statements
+from b3.storage.sqlite import SqliteStorage
+from tests import B3TestCase
+
+
+class Test_Statements(unittest.TestCase):
+    def setUp(self):
+        self.statements = Statements()
+
+    def test_select(self):
+        self.assertEqual(
+            (
+                "SELECT * FROM clients WHERE `guid` = ? ORDER BY time_edit DESC LIMIT ?",
+                ["abc", 5],
+            ),
+            self.statements.select("clients", {"guid": "abc"}, "time_edit DESC", 5),
+        )
+
+    def test_select_without_where(self):
+        self.assertEqual(
+            ("SELECT * FROM groups ORDER BY level", []),
+            self.statements.select("groups", orderby="level"),
+        )
+
+    def test_select_operators(self):
+        sql, params = self.statements.select(
+            "clients",
+            {
+                "time_add>=": 1,
+                "time_add <=": 2,
+                "id<": 3,
+                "id>": 4,
+                "ip=": "1.2.3.4",
+                "&group_bits": 8,
+                "%name%": "joe",
+                "login%": "j",
+                "%password": "x",
+                "pbid": None,
+            },
+        )
+        self.assertEqual(
+            "SELECT * FROM clients WHERE `time_add` >= ? AND `time_add` <= ? "
+            "AND `id` < ? AND `id` > ? AND `ip` = ? AND `group_bits` & ? "
+            "AND `name` LIKE ? AND `login` LIKE ? AND `password` LIKE ? AND `pbid` = ?",
+            sql,
+        )
+        self.assertEqual([1, 2, 3, 4, "1.2.3.4", 8, "%joe%", "j%", "%x", ""], params)
+
+    def test_select_in(self):
+        self.assertEqual(
+            (
+                (
+                    "SELECT COUNT(id) total FROM penalties WHERE `type` IN (?, ?) "
+                    "AND (time_expire = -1 OR time_expire > ?)"
+                ),
+                ["Ban", "TempBan", 123],
+            ),
+            self.statements.select(
+                "penalties",
+                {"type": ("Ban", "TempBan")},
+                fields="COUNT(id) total",
+                condition="(time_expire = -1 OR time_expire > ?)",
+                args=(123,),
+            ),
+        )
+
+    def test_update(self):
+        self.assertEqual(
+            (
+                "UPDATE penalties SET `inactive` = ? WHERE `client_id` = ?",
+                [1, 4],
+            ),
+            self.statements.update("penalties", {"inactive": 1}, {"client_id": 4}),
+        )
+
+    def test_insert(self):
+        self.assertEqual(
+            (
+                "INSERT INTO aliases (`alias`, `client_id`) VALUES (?, ?)",
+                ["joe", 4],
+            ),
+            self.statements.insert("aliases", {"alias": "joe", "client_id": 4}),
+        )
+
+    def test_none_values(self):
+        # as the query builder: set as an empty string, inserted as "None"
+        self.assertEqual(
+            [""], self.statements.update("clients", {"pbid": None}, None)[1]
+        )
+        self.assertEqual(
+            ["None"], self.statements.insert("penalties", {"keyword": None})[1]
+        )
+
+    def test_fields_list(self):
+        self.assertEqual(
+            ("SELECT `id`, `name` FROM clients", []),
+            self.statements.select("clients", fields=["id", "name"]),
+        )
+
+    def test_statement_built_once_per_shape(self):
+        for guid in ("a", "b", "c"):
+            self.statements.select("clients", {"guid": guid}, limit=1)
+        self.statements.select("clients", {"id": 1}, limit=1)
+        self.statements.select("penalties", {"type": ["Ban"]})
+        self.statements.select("penalties", {"type": ["Warning"]})
+        # a different number of IN values is a different statement
+        self.statements.select("penalties", {"type": ["Ban", "TempBan"]})
+        self.assertEqual(4, len(self.statements))
+        self.assertEqual(3, self.statements.hits)
+        self.assertEqual(4, self.statements.misses)
+        self.assertAlmostEqual(3 / 7, self.statements.hitRate)
+        self.assertEqual(
+            "Statements(distinct=4, hits=3, misses=4, hit_rate=42.9%)",
+            str(self.statements),
+        )
+
+
+class Test_parameterized_queries(B3TestCase):
+    def setUp(self):
+        B3TestCase.setUp(self)
+        self.storage = self.console.storage = SqliteStorage(
+            "sqlite://:memory:", splitDSN("sqlite://:memory:"), self.console
+        )
+        self.storage.connect()
+
+    def tearDown(self):
+        B3TestCase.tearDown(self)
+        self.storage.shutdown()
+
+    def test_values_are_not_interpolated(self):
+        name = 'O\'Brien "the" ; DROP TABLE clients; --'
+        client_id = self.storage.setClient(Client(guid="abc", name=name))
+        self.assertEqual(name, self.storage.getClient(Client(id=client_id)).name)
+        self.assertEqual(
+            [client_id],
+            [c.id for c in self.storage.getClientsMatching({"name": name})],
+        )
+
+    def test_repeated_lookups_reuse_statements(self):
+        for i in range(10):
+            self.storage.setClient(Client(guid=f"guid{i}", name=f"name{i}"))
+        for i in range(10):
+            self.storage.getClient(Client(guid=f"guid{i}"))
+        self.assertEqual(2, len(self.storage.statements))
+        self.assertEqual(18, self.storage.statements.hits)
+
+    def test_hall_of_fame(self):
+        self.console.clients.getByDB = lambda x: [
+            Client(id=int(x[1:]), name=f"player{x[1:]}")
+        ]
+        with self.assertRaises(LookupError):
+            record_holder(self.console, "spree", "ut4_abbey")
+        record = update_hall_of_fame(
+            self.console, "spree", "ut4_abbey", Client(id=1), 10
+        )
+        self.assertTrue(record.is_new)
+        # not beaten
+        record = update_hall_of_fame(
+            self.console, "spree", "ut4_abbey", Client(id=2), 5
+        )
+        self.assertFalse(record.is_new)
+        self.assertEqual(1, record.client.id)
+        record = update_hall_of_fame(
+            self.console, "spree", "ut4_abbey", Client(id=2), 15
+        )
+        self.assertTrue(record.is_new)
+        record = record_holder(self.console, "spree", "ut4_abbey")
+        self.assertEqual((2, 15), (record.client.id, record.score))
@@ -23,9 +23,15 @@ class Test_Storage(B3TestCase):
     def test_getClientsMatching(self):
         self.assertRaises(NotImplementedError, self.storage.getClientsMatching, Mock())
 
+    def test_prefetchClients(self):
+        self.assertRaises(NotImplementedError, self.storage.prefetchClients, [])
+
     def test_setClient(self):
         self.assertRaises(NotImplementedError, self.storage.setClient, Mock())
 
+    def test_setClients(self):
+        self.assertRaises(NotImplementedError, self.storage.setClients, [])
+
     def test_setClientAlias(self):
         self.assertRaises(NotImplementedError, self.storage.setClientAlias, Mock())
 
@@ -73,12 +79,27 @@ class Test_Storage(B3TestCase):
     def test_numPenalties(self):
         self.assertRaises(NotImplementedError, self.storage.numPenalties, Mock())
 
+    def test_loadPenaltySummaries(self):
+        self.assertRaises(NotImplementedError, self.storage.loadPenaltySummaries, [])
+
     def test_getGroups(self):
         self.assertRaises(NotImplementedError, self.storage.getGroups)
 
     def test_getGroup(self):
         self.assertRaises(NotImplementedError, self.storage.getGroup, Mock())
 
+    def test_enableWal(self):
+        self.assertRaises(NotImplementedError, self.storage.enableWal)
+
+    def test_setGroup(self):
+        self.assertRaises(NotImplementedError, self.storage.setGroup, Mock())
+
+    def test_getGroupRegistry(self):
+        self.assertRaises(NotImplementedError, self.storage.getGroupRegistry)
+
+    def test_invalidateGroups(self):
+        self.assertRaises(NotImplementedError, self.storage.invalidateGroups)
+
 
 class Test_getStorage(unittest.TestCase):
     def test_sqlite(self):
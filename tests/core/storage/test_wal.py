@@ -0,0 +1,133 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+from b3.clients import Client
+from b3.functions import splitDSN
+from b3.storage.common import QueryStats
+from b3.storage.sqlite import SqliteStorage
+from tests import B3TestCase
+from tests.core.storage.common import StorageAPITest
+
+
+class WalTestCase(B3TestCase):
+    def setUp(self):
+        B3TestCase.setUp(self)
+        self.tmpdir = tempfile.mkdtemp()
+        dsn = "sqlite://" + os.path.join(self.tmpdir, "b3.db")
+        self.storage = self.console.storage = SqliteStorage(
+            dsn, splitDSN(dsn), self.console
+        )
+        self.storage.connect()
+        self.storage.enableWal(readers=2, synchronous="normal")
+
+    def tearDown(self):
+        B3TestCase.tearDown(self)
+        self.storage.shutdown()
+        shutil.rmtree(self.tmpdir)
+
+
+class Test_storage_API_wal(WalTestCase, StorageAPITest):
+    """The storage API works the same with reads on the pool."""
+
+
+class Test_wal(WalTestCase):
+    def test_settings(self):
+        with self.storage.query("PRAGMA journal_mode") as cursor:
+            self.assertEqual("wal", cursor.getValue("journal_mode"))
+        with self.storage.query("PRAGMA synchronous") as cursor:
+            self.assertEqual(1, cursor.getValue("synchronous"))  # NORMAL
+        self.assertEqual(2, self.storage.readers.qsize())
+
+    def test_invalid_synchronous_level(self):
+        self.assertRaises(ValueError, self.storage.enableWal, 2, "sometimes")
+
+    def test_invalid_number_of_readers(self):
+        self.assertRaises(ValueError, self.storage.enableWal, 0)
+        self.assertEqual(2, self.storage.readers.qsize())
+
+    def test_reads_see_the_writes(self):
+        client_id = self.storage.setClient(Client(guid="abc", greeting="hi"))
+        self.assertEqual("hi", self.storage.getClient(Client(id=client_id)).greeting)
+
+    def test_reads_do_not_wait_for_the_writer(self):
+        self.storage.setClient(Client(guid="abc"))
+        result = []
+        with self.storage._lock:
+            thread = threading.Thread(
+                target=lambda: result.append(self.storage.getClient(Client(guid="abc")))
+            )
+            thread.start()
+            thread.join(timeout=5)
+        self.assertEqual("abc", result[0].guid)
+
+    def test_read_only(self):
+        connection = self.storage.readers.get()
+        self.storage.readers.put(connection)
+        with self.assertRaises(sqlite3.OperationalError):
+            connection.execute("DELETE FROM clients")
+
+    def test_query_stats(self):
+        inserts = self.storage.queryStats.asDict()["INSERT"]["queries"]
+        self.storage.setClient(Client(guid="abc"))
+        self.storage.getClient(Client(guid="abc"))
+        stats = self.storage.queryStats.asDict()
+        self.assertEqual(inserts + 1, stats["INSERT"]["queries"])
+        self.assertGreaterEqual(stats["SELECT"]["queries"], 1)
+        self.assertGreaterEqual(stats["SELECT"]["time"], 0)
+
+    def test_readers_reopened_on_reconnect(self):
+        self.storage.shutdown()
+        self.assertIsNone(self.storage.readers)
+        self.storage.connect()
+        self.assertEqual(2, self.storage.readers.qsize())
+
+    def test_path_with_uri_characters(self):
+        path = os.path.join(self.tmpdir, "b3 #1?.db")
+        dsn = "sqlite://" + path
+        storage = SqliteStorage(dsn, splitDSN(dsn), self.console)
+        storage.connect()
+        storage.enableWal()
+        storage.setClient(Client(guid="abc"))
+        self.assertEqual("abc", storage.getClient(Client(guid="abc")).guid)
+        storage.shutdown()
+
+    def test_in_memory_database(self):
+        storage = SqliteStorage(
+            "sqlite://:memory:", splitDSN("sqlite://:memory:"), self.console
+        )
+        storage.connect()
+        storage.enableWal()
+        self.assertIsNone(storage.readers)
+        storage.shutdown()
+
+
+class Test_QueryStats(B3TestCase):
+    def test_kind(self):
+        self.assertEqual("SELECT", QueryStats.kind("  select * FROM clients"))
+        self.assertEqual("UPDATE", QueryStats.kind("UPDATE\nclients SET"))
+        self.assertEqual("", QueryStats.kind(""))
+
+    def test_add(self):
+        stats = QueryStats()
+        stats.add("SELECT", 0.001, 0.002)
+        stats.add("SELECT", 0.003, 0.001)
+        self.assertEqual(
+            {
+                "SELECT": {
+                    "queries": 2,
+                    "wait": 0.004,
+                    "max_wait": 0.003,
+                    "time": 0.003,
+                    "max_time": 0.002,
+                }
+            },
+            stats.asDict(),
+        )
+        self.assertEqual(
+            "QueryStats(SELECT: 2 queries, wait 4.0ms (max 3.0ms), "
+            "time 3.0ms (max 2.0ms))",
+            str(stats),
+        )
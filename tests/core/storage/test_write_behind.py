@@ -0,0 +1,186 @@
+import sqlite3
+import time
+from unittest.mock import patch
+
+from b3.clients import Client, ClientBan
+from b3.functions import splitDSN
+from b3.storage.sqlite import SqliteStorage
+from tests import B3TestCase
+from tests.core.storage.common import StorageAPITest
+
+
+class BusyCommitConnection:
+    """
+    Wrap a sqlite connection so that its first COMMIT fails like a busy database.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.busy = True
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    def cursor(self):
+        return BusyCommitCursor(self, self.db.cursor())
+
+
+class BusyCommitCursor:
+    def __init__(self, connection, cursor):
+        self.connection = connection
+        self.cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def execute(self, query, *args):
+        if query == "COMMIT" and self.connection.busy:
+            self.connection.busy = False
+            raise sqlite3.OperationalError("database is locked")
+        return self.cursor.execute(query, *args)
+
+
+class WriteBehindTestCase(B3TestCase):
+    interval = 60.0
+    maxRows = 100
+
+    def setUp(self):
+        B3TestCase.setUp(self)
+        self.storage = self.console.storage = SqliteStorage(
+            "sqlite://:memory:", splitDSN("sqlite://:memory:"), self.console
+        )
+        self.storage.connect()
+        self.storage.startWriteBehind(self.interval, self.maxRows)
+
+    def tearDown(self):
+        B3TestCase.tearDown(self)
+        self.storage.shutdown()
+
+
+class Test_storage_API_write_behind(WriteBehindTestCase, StorageAPITest):
+    """The storage API reads its own writes when they are queued."""
+
+
+class Test_WriteQueue(WriteBehindTestCase):
+    def greeting_in_db(self, client_id):
+        with self.storage.query(
+            "SELECT greeting FROM clients WHERE id = ?", (client_id,)
+        ) as cursor:
+            return cursor.getValue("greeting")
+
+    def test_updates_are_queued(self):
+        client = Client(guid="abc", greeting="joe")
+        self.storage.setClient(client)
+        self.assertEqual("joe", self.greeting_in_db(client.id))
+        client.greeting = "jack"
+        self.storage.setClient(client)
+        self.assertEqual(1, len(self.storage.writeQueue))
+        self.assertEqual("joe", self.greeting_in_db(client.id))
+        self.storage.flush()
+        self.assertEqual("jack", self.greeting_in_db(client.id))
+
+    def test_read_your_writes(self):
+        client = Client(guid="abc", greeting="joe")
+        self.storage.setClient(client)
+        other = Client(guid="def", greeting="bill")
+        self.storage.setClient(other)
+        client.greeting = "jack"
+        self.storage.setClient(client)
+        other.greeting = "bob"
+        self.storage.setClient(other)
+        self.assertEqual("jack", self.storage.getClient(Client(id=client.id)).greeting)
+        self.assertEqual("bob", self.storage.getClient(Client(guid="def")).greeting)
+        self.assertEqual(0, len(self.storage.writeQueue))
+
+    def test_reads_about_other_clients_do_not_flush(self):
+        client = Client(guid="abc", greeting="joe")
+        self.storage.setClient(client)
+        client.greeting = "jack"
+        self.storage.setClient(client)
+        self.storage.getClientAliases(Client(id=client.id + 1))
+        self.storage.numPenalties(Client(id=client.id + 1))
+        self.assertEqual(1, len(self.storage.writeQueue))
+
+    def test_updates_are_flushed_before_inserts_about_the_client(self):
+        client = Client(guid="abc", greeting="joe")
+        self.storage.setClient(client)
+        self.storage.setClientPenalty(
+            ClientBan(clientId=client.id, adminId=0, timeExpire=-1)
+        )
+        self.storage.disableClientPenalties(client)
+        self.assertEqual(1, len(self.storage.writeQueue))
+        self.storage.setClientPenalty(
+            ClientBan(clientId=client.id, adminId=0, timeExpire=-1)
+        )
+        self.assertEqual(1, self.storage.numPenalties(client))
+
+    def test_batch(self):
+        clients = [Client(guid=f"guid{i}", name=f"name{i}") for i in range(20)]
+        for client in clients:
+            self.storage.setClient(client)
+        for client in clients:
+            client.connections = 5
+            self.storage.setClient(client)
+        self.assertEqual(20, self.storage.writeQueue.flush())
+        self.assertEqual(1, self.storage.writeQueue.flushes)
+        self.assertEqual(20, self.storage.writeQueue.largestBatch)
+        self.assertEqual(0, self.storage.writeQueue.flush())
+        with self.storage.query(
+            "SELECT COUNT(id) total FROM clients WHERE connections = 5"
+        ) as cursor:
+            self.assertEqual(20, cursor.getValue("total"))
+
+    def test_failed_batch_runs_writes_one_by_one(self):
+        first = Client(guid="abc", greeting="joe")
+        second = Client(guid="def", greeting="bill")
+        self.storage.setClient(first)
+        self.storage.setClient(second)
+        first._guid = "def"  # breaks the unique constraint
+        self.storage.setClient(first)
+        second.greeting = "bob"
+        self.storage.setClient(second)
+        self.storage.flush()
+        self.assertEqual("bob", self.greeting_in_db(second.id))
+        self.assertEqual("joe", self.greeting_in_db(first.id))
+
+    def test_failed_commit_is_rolled_back(self):
+        client = Client(guid="abc", greeting="joe")
+        self.storage.setClient(client)
+        client.greeting = "jack"
+        self.storage.setClient(client)
+        db = BusyCommitConnection(self.storage.db)
+        with patch.object(self.storage, "db", db):
+            self.storage.flush()
+        self.assertFalse(db.busy)
+        self.assertFalse(self.storage.db.in_transaction)
+        self.assertEqual("jack", self.greeting_in_db(client.id))
+
+    def test_shutdown_runs_queued_writes(self):
+        client = Client(guid="abc", greeting="joe")
+        self.storage.setClient(client)
+        client.greeting = "jack"
+        self.storage.setClient(client)
+        queue = self.storage.writeQueue
+        self.storage.stopWriteBehind()
+        self.assertIsNone(self.storage.writeQueue)
+        self.assertEqual(1, queue.rows)
+        self.assertEqual("jack", self.greeting_in_db(client.id))
+
+
+class Test_WriteQueue_thread(WriteBehindTestCase):
+    interval = 0.05
+    maxRows = 5
+
+    def wait_for_flush(self, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while self.storage.writeQueue.isPending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_flushed_after_interval(self):
+        client = Client(guid="abc", greeting="joe")
+        self.storage.setClient(client)
+        client.greeting = "jack"
+        self.storage.setClient(client)
+        self.wait_for_flush()
+        self.assertFalse(self.storage.writeQueue.isPending())
+        self.assertEqual(1, self.storage.writeQueue.rows)
@@ -0,0 +1,155 @@
+import queue
+import sys
+import threading
+import unittest
+from unittest.mock import Mock
+
+from b3.events import (
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    PRIORITY_NORMAL,
+    Event,
+    EventQueue,
+    EventsStats,
+    eventManager,
+)
+
+EVT_STOP = eventManager.getId("EVT_STOP")
+
+
+def event(key="EVT_CLIENT_SAY", data=None):
+    return Event(eventManager.getId(key), data)
+
+
+class Test_Event(unittest.TestCase):
+    def test_slots(self):
+        evt = event(data="f00")
+        self.assertFalse(hasattr(evt, "__dict__"))
+        self.assertEqual("EVT_CLIENT_SAY", evt.key)
+        self.assertRaises(AttributeError, setattr, evt, "f00", "bar")
+
+    def test_timestamp(self):
+        self.assertEqual(123, Event(EVT_STOP, None, timestamp=123).time)
+
+    def test_unknown_type(self):
+        self.assertRaises(KeyError, Event, 123456, None)
+        self.assertRaises(KeyError, Event, None, None)
+
+
+class Test_Events(unittest.TestCase):
+    def test_getKey(self):
+        self.assertEqual("EVT_STOP", eventManager.getKey(EVT_STOP))
+        self.assertRaises(KeyError, eventManager.getKey, 0)
+
+    def test_getId(self):
+        self.assertEqual(EVT_STOP, eventManager.getId("EVT_STOP"))
+        self.assertEqual(EVT_STOP, eventManager.getId(EVT_STOP))
+        self.assertEqual(42, eventManager.getId("42"))
+        self.assertIsNone(eventManager.getId("EVT_F00"))
+
+    def test_createEvent(self):
+        event_id = eventManager.createEvent("EVT_TEST_CREATE_EVENT", "test")
+        self.assertEqual("EVT_TEST_CREATE_EVENT", eventManager.getKey(event_id))
+        self.assertEqual(event_id, eventManager.createEvent("EVT_TEST_CREATE_EVENT"))
+
+
+class Test_EventQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = EventQueue(3, stop_events=(EVT_STOP,))
+
+    def get_data(self):
+        return [self.queue.get(timeout=0)[2].data for _ in range(self.queue.qsize())]
+
+    def test_fifo_within_priority(self):
+        for i in range(3):
+            self.queue.put(0, 10, event(data=i))
+        self.assertListEqual([0, 1, 2], self.get_data())
+
+    def test_priority_order(self):
+        self.queue.put(0, 10, event(data="low"), PRIORITY_LOW)
+        self.queue.put(0, 10, event(data="normal"), PRIORITY_NORMAL)
+        self.queue.put(0, 10, event(data="high"), PRIORITY_HIGH)
+        self.assertListEqual(["high", "low", "normal"], self.get_data())
+
+    def test_get_returns_added_and_expire(self):
+        evt = event()
+        self.queue.put(5, 15, evt)
+        self.assertTupleEqual((5, 15, evt), self.queue.get())
+
+    def test_get_timeout(self):
+        self.assertRaises(queue.Empty, self.queue.get, timeout=0.01)
+
+    def test_full_sheds_incoming_low_priority(self):
+        for i in range(3):
+            self.queue.put(0, 10, event(data=i), PRIORITY_NORMAL)
+        dropped = event("EVT_CLIENT_DAMAGE", "damage")
+        self.assertIs(dropped, self.queue.put(0, 10, dropped, PRIORITY_LOW))
+        self.assertEqual(3, self.queue.qsize())
+        self.assertEqual(1, self.queue.shed["EVT_CLIENT_DAMAGE"])
+
+    def test_full_sheds_most_recent_lower_priority(self):
+        self.queue.put(0, 10, event(data="low1"), PRIORITY_LOW)
+        self.queue.put(0, 10, event(data="normal"), PRIORITY_NORMAL)
+        self.queue.put(0, 10, event(data="low2"), PRIORITY_LOW)
+        shed = self.queue.put(0, 10, event(data="high"), PRIORITY_HIGH)
+        self.assertEqual("low2", shed.data)
+        self.assertListEqual(["high", "low1", "normal"], self.get_data())
+
+    def test_stop_events_are_never_shed(self):
+        for i in range(3):
+            self.queue.put(0, 10, event(data=i), PRIORITY_HIGH)
+        self.assertIsNone(self.queue.put(0, 10, Event(EVT_STOP, "stop")))
+        self.assertIsNotNone(self.queue.put(0, 10, event(data=3), PRIORITY_HIGH))
+        self.assertListEqual([0, 1, 2, "stop"], self.get_data())
+
+    def test_get_waits_for_put(self):
+        result = []
+        t = threading.Thread(target=lambda: result.append(self.queue.get(timeout=5)))
+        t.start()
+        self.queue.put(0, 10, event(data="f00"))
+        t.join()
+        self.assertEqual("f00", result[0][2].data)
+
+
+class Test_EventsStats(unittest.TestCase):
+    def test_plugin_totals(self):
+        stats = EventsStats(Mock(), max_samples=2)
+        stats.add_event_handled("p1", "EVT_CLIENT_SAY", 1.0)
+        stats.add_event_handled("p1", "EVT_CLIENT_SAY", 2.0)
+        stats.add_event_handled("p1", "EVT_CLIENT_SAY", 3.0)
+        stats.add_event_handled("p1", "EVT_CLIENT_KILL", 4.0)
+        stats.add_event_handled("p2", "EVT_CLIENT_KILL", 0.5)
+        self.assertDictEqual(
+            {"p1": (3, 9.0, 4.0), "p2": (1, 0.5, 0.5)}, stats.plugin_totals()
+        )
+
+    def test_read_while_handled(self):
+        stats = EventsStats(Mock(info=lambda *args: None), max_samples=1)
+
+        def handle(plugin):
+            for n in range(5000):
+                stats.add_event_handled(plugin, f"EVT_{n}", 1.0)
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [
+                threading.Thread(target=handle, args=(f"p{i}",)) for i in range(2)
+            ]
+            for t in threads:
+                t.start()
+            while any(t.is_alive() for t in threads):
+                stats.plugin_totals()
+                stats.dump_stats()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+        self.assertDictEqual(
+            {"p0": (5000, 5000.0, 1.0), "p1": (5000, 5000.0, 1.0)},
+            stats.plugin_totals(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
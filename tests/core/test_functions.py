@@ -302,6 +302,18 @@ class Test_utils(unittest.TestCase):
         self.assertEqual(functions.getCmd(self, "bar"), self.cmd_bar)
         self.assertIsNone(functions.getCmd(self, "baz"))
 
+    def test_instance_attributes(self):
+        class Slotted:
+            __slots__ = ("__dict__", "a", "b")
+
+        class Child(Slotted):
+            __slots__ = "c"
+
+        obj = Child()
+        obj.a = obj.c = 1
+        obj.d = 2
+        self.assertEqual(["a", "c", "d"], functions.instance_attributes(obj))
+
 
 class Test_escape_string(unittest.TestCase):
     def test_ord_zero(self):
@@ -0,0 +1,109 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from b3.logfollower import (
+    InotifyFollower,
+    PollingFollower,
+    getFollower,
+)
+
+
+class LogFollowerTestCase(unittest.TestCase):
+    def setUp(self):
+        fd, self.logfile = tempfile.mkstemp()
+        os.close(fd)
+        self.input = open(self.logfile)  # noqa: SIM115
+
+    def tearDown(self):
+        self.input.close()
+        os.unlink(self.logfile)
+
+    def append(self, text, after=0.0):
+        def write():
+            time.sleep(after)
+            with open(self.logfile, "a") as f:
+                f.write(text)
+
+        if not after:
+            return write()
+        t = threading.Thread(target=write)
+        t.start()
+        self.addCleanup(t.join)
+
+
+class Test_PollingFollower(LogFollowerTestCase):
+    def test_idle_backs_off(self):
+        follower = PollingFollower(self.input, min_delay=0.01, max_delay=0.08)
+        self.assertFalse(follower.wait())
+        self.assertEqual(0.08, follower.delay)
+        self.assertEqual(0, follower.wakeups)
+
+    def test_change_resets_delay(self):
+        follower = PollingFollower(self.input, min_delay=0.01, max_delay=0.08)
+        follower.wait()
+        self.append("line\n")
+        self.assertTrue(follower.wait())
+        self.assertEqual(0.01, follower.delay)
+        self.assertEqual(1, follower.wakeups)
+
+    def test_latency(self):
+        follower = PollingFollower(self.input, min_delay=0.01, max_delay=0.08)
+        self.assertIsNone(follower.getLatencyStats())
+        self.append("line\n")
+        follower.wait()
+        follower.parsed()
+        follower.parsed()
+        self.assertEqual(1, len(follower.latencies))
+        lo, hi, _, _ = follower.getLatencyStats()
+        self.assertGreaterEqual(hi, lo)
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify requires Linux")
+class Test_InotifyFollower(LogFollowerTestCase):
+    def test_timeout(self):
+        follower = InotifyFollower(self.input, max_delay=0.05)
+        self.addCleanup(follower.close)
+        self.assertFalse(follower.wait())
+
+    def test_wakes_up_on_write(self):
+        follower = InotifyFollower(self.input, max_delay=5)
+        self.addCleanup(follower.close)
+        self.append("line\n", after=0.05)
+        start = time.monotonic()
+        self.assertTrue(follower.wait())
+        self.assertLess(time.monotonic() - start, 4)
+        self.assertEqual("line\n", self.input.readline())
+
+    def test_log_recreated(self):
+        follower = InotifyFollower(self.input, max_delay=0.05)
+        self.addCleanup(follower.close)
+        self.input.close()
+        os.unlink(self.logfile)
+        self.assertTrue(follower.wait())
+        self.assertIsNone(follower._wd)
+        self.assertFalse(follower.wait())
+        self.append("line\n")
+        self.assertTrue(follower.wait())
+        self.assertIsNotNone(follower._wd)
+        follower.max_delay = 5
+        self.append("line\n", after=0.05)
+        start = time.monotonic()
+        self.assertTrue(follower.wait())
+        self.assertLess(time.monotonic() - start, 4)
+
+
+class Test_getFollower(LogFollowerTestCase):
+    def test_poll(self):
+        follower = getFollower(self.input, "poll")
+        self.assertIsInstance(follower, PollingFollower)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, getFollower, self.input, "f00")
+
+
+if __name__ == "__main__":
+    unittest.main()
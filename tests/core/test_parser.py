@@ -1,6 +1,12 @@
 import logging
+import os
+import queue
+import tempfile
+import threading
 import unittest
+import unittest.mock
 
+import b3.events
 from b3.clients import Client
 from b3.parser import Parser
 
@@ -186,5 +192,189 @@ class Test_getWrap(unittest.TestCase):
         self.assertListEqual(wrapped_text, ["Lorem ipsum dolor sit amet"])
 
 
+class Test_batched_ingestion(unittest.TestCase):
+    def setUp(self):
+        self.parser = DummyParser()
+        self.parser.working = True
+        self.parser.batch_lines = 3
+        self.parser.queue = queue.Queue(4)
+        self.parsed = []
+        self.parser.parseLine = self.parsed.append
+        fd, self.logfile = tempfile.mkstemp()
+        with os.fdopen(fd, "w") as f:
+            f.writelines(f"line {i}\n" for i in range(5))
+        self.parser.input = open(self.logfile)  # noqa: SIM115
+
+    def tearDown(self):
+        self.parser.input.close()
+        os.unlink(self.logfile)
+
+    def test_batch_budget(self):
+        self.assertTrue(self.parser._ingest_batch())
+        self.assertListEqual(["line 0", "line 1", "line 2"], self.parsed)
+        bytes_behind, behind_for = self.parser.getIngestLag()
+        self.assertEqual(len("line 3\nline 4\n"), bytes_behind)
+        self.assertGreaterEqual(behind_for, 0.0)
+        self.assertIsNotNone(self.parser._ingest_backlog_since)
+
+    def test_batch_catches_up(self):
+        self.parser._ingest_batch()
+        self.assertFalse(self.parser._ingest_batch())
+        self.assertEqual(5, len(self.parsed))
+        self.assertTupleEqual((0, 0.0), self.parser.getIngestLag())
+        self.assertIsNone(self.parser._ingest_backlog_since)
+
+    def test_parse_error_does_not_stop_batch(self):
+        def parse_line(line):
+            if line == "line 1":
+                raise ValueError(line)
+            self.parsed.append(line)
+
+        self.parser.parseLine = parse_line
+        self.parser._ingest_batch()
+        self.assertListEqual(["line 0", "line 2"], self.parsed)
+
+    def test_truncated_log(self):
+        self.parser.input.seek(0, os.SEEK_END)
+        with open(self.logfile, "w") as f:
+            f.write("new\n")
+        self.assertListEqual([], self.parser.readBatch(3))
+        self.assertEqual(4, self.parser.input.tell())
+
+    def test_backpressure_yields_until_stopped(self):
+        for i in range(3):
+            self.parser.queue.put(i)
+        self.parser.delay2 = 0.001
+
+        def sleep_and_stop(_):
+            self.parser.working = False
+
+        with unittest.mock.patch("time.sleep", side_effect=sleep_and_stop) as sleep:
+            self.parser._wait_for_queue()
+        sleep.assert_called_once_with(0.001)
+
+
+class Test_queueEvent(unittest.TestCase):
+    def setUp(self):
+        self.parser = DummyParser()
+        self.parser.Events = b3.events.eventManager
+        self.parser.queue = b3.events.EventQueue(1)
+        self.parser.time = lambda: 100
+        self.parser._handlers = {
+            self.parser.getEventID("EVT_CLIENT_SAY"): [unittest.mock.Mock()],
+            self.parser.getEventID("EVT_CLIENT_DAMAGE"): [unittest.mock.Mock()],
+        }
+        self.parser.loadEventQueueRules()
+
+    def test_per_type_expiry(self):
+        self.assertTrue(
+            self.parser.queueEvent(self.parser.getEvent("EVT_CLIENT_DAMAGE"))
+        )
+        added, expire, _ = self.parser.queue.get()
+        self.assertEqual(3, expire - added)
+
+    def test_explicit_expiry(self):
+        self.parser.queueEvent(self.parser.getEvent("EVT_CLIENT_SAY"), expire=60)
+        added, expire, _ = self.parser.queue.get()
+        self.assertEqual(60, expire - added)
+
+    def test_zero_expiry(self):
+        self.parser.queueEvent(self.parser.getEvent("EVT_CLIENT_SAY"), expire=0)
+        added, expire, _ = self.parser.queue.get()
+        self.assertEqual(added, expire)
+
+    def test_no_handler(self):
+        self.assertFalse(
+            self.parser.queueEvent(self.parser.getEvent("EVT_CLIENT_KILL"))
+        )
+        self.assertEqual(0, self.parser.queue.qsize())
+
+    def test_full_queue_sheds_low_priority(self):
+        self.parser.error = unittest.mock.Mock()
+        self.assertTrue(
+            self.parser.queueEvent(self.parser.getEvent("EVT_CLIENT_DAMAGE"))
+        )
+        self.assertTrue(self.parser.queueEvent(self.parser.getEvent("EVT_CLIENT_SAY")))
+        self.assertFalse(
+            self.parser.queueEvent(self.parser.getEvent("EVT_CLIENT_DAMAGE"))
+        )
+        self.assertEqual("EVT_CLIENT_SAY", self.parser.queue.get()[2].key)
+        self.assertEqual(2, self.parser.queue.shed["EVT_CLIENT_DAMAGE"])
+
+    def test_gameplay_events_keep_order(self):
+        self.parser.queue = b3.events.EventQueue(10)
+        keys = (
+            "EVT_CLIENT_DAMAGE",
+            "EVT_CLIENT_KILL",
+            "EVT_CLIENT_DISCONNECT",
+            "EVT_GAME_EXIT",
+        )
+        for key in keys:
+            self.parser._handlers[self.parser.getEventID(key)] = [unittest.mock.Mock()]
+            self.parser.queueEvent(self.parser.getEvent(key))
+        self.parser.queueEvent(self.parser.getEvent("EVT_CLIENT_SAY"))
+        self.assertListEqual(
+            ["EVT_CLIENT_SAY", *keys],
+            [self.parser.queue.get()[2].key for _ in range(len(keys) + 1)],
+        )
+
+
+class RecordingPlugin:
+    def __init__(self, name, requiresVeto=False, veto=None):
+        self.name = name
+        self.requiresVeto = requiresVeto
+        self.veto = veto
+        self.handled = []
+        self.threads = set()
+
+    def isEnabled(self):
+        return True
+
+    def parseEvent(self, event):
+        self.threads.add(threading.current_thread().name)
+        self.handled.append(event.data)
+        if event.data == self.veto:
+            raise b3.events.VetoEvent
+
+
+class Test_parallel_dispatch(unittest.TestCase):
+    def setUp(self):
+        self.parser = DummyParser()
+        self.parser.Events = b3.events.eventManager
+        self.parser.time = lambda: 100
+        self.parser.queue = b3.events.EventQueue(0)
+        self.parser._eventsStats = b3.events.EventsStats(self.parser)
+        self.parser._plugin_inboxes = {}
+        self.parser.handle_events_shutdown = unittest.mock.Mock()
+        self.say = self.parser.getEventID("EVT_CLIENT_SAY")
+
+    def dispatch(self, plugins, *data):
+        self.parser._handlers = {self.say: plugins}
+        for d in data:
+            self.parser.queue.put(0, 200, b3.events.Event(self.say, d))
+        self.parser.queue.put(0, 200, self.parser.getEvent("EVT_STOP"))
+        self.parser.handleEvents()
+        for inbox in self.parser._plugin_inboxes.values():
+            inbox.stop()
+
+    def test_order_preserved_per_plugin(self):
+        p1, p2 = RecordingPlugin("p1"), RecordingPlugin("p2")
+        self.dispatch([p1, p2], *range(20))
+        self.assertListEqual(list(range(20)), p1.handled)
+        self.assertListEqual(list(range(20)), p2.handled)
+        self.assertSetEqual({"inbox-RecordingPlugin"}, p1.threads)
+        inbox = self.parser._plugin_inboxes["RecordingPlugin"]
+        self.assertEqual(40, len(inbox.lags))
+        self.assertEqual(0, inbox.depth())
+
+    def test_veto(self):
+        p1 = RecordingPlugin("p1", requiresVeto=True, veto="spam")
+        p2 = RecordingPlugin("p2")
+        self.dispatch([p1, p2], "hi", "spam", "bye")
+        self.assertListEqual(["hi", "spam", "bye"], p1.handled)
+        self.assertListEqual(["hi", "bye"], p2.handled)
+        self.assertSetEqual({threading.current_thread().name}, p1.threads)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,173 @@
+import concurrent.futures
+import logging
+import socket
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+from b3.rcon import Rcon, ResponseCache
+
+HEADER = b"\377\377\377\377print\n"
+
+
+class FakeServer:
+    """
+    UDP game server answering RCON commands from a dict of responses.
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.received = []
+        self.sock = socket.socket(type=socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.address = self.sock.getsockname()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(4096)
+            except OSError:
+                return
+            cmd = data.split(b'" ', 1)[1].strip().decode()
+            self.received.append(cmd)
+            for packet in self.responses.get(cmd, ()):
+                self.sock.sendto(HEADER + packet, addr)
+
+    def close(self):
+        self.sock.close()
+
+
+class Test_Rcon(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeServer(
+            {
+                "status": [b"map: ut4_casa\n"],
+                "cvarlist": [b"x" * 1000, b"y" * 1000, b"end\n"],
+                "players": [b"x" * 1000, b"y" * 100, b"z" * 1000],
+            }
+        )
+        console = Mock(encoding="latin-1", log=logging.getLogger("test"))
+        self.rcon = Rcon(console, self.server.address, "secret")
+
+    def tearDown(self):
+        self.rcon.close()
+        self.server.close()
+
+    def test_write(self):
+        self.assertEqual("map: ut4_casa\n", self.rcon.write("status"))
+
+    def test_short_middle_packet(self):
+        # the server flushes its redirect buffer when the next print does not fit
+        self.assertEqual(
+            "x" * 1000 + "y" * 100 + "z" * 1000, self.rcon.write("players")
+        )
+
+    def test_multiple_packets(self):
+        self.assertEqual("x" * 1000 + "y" * 1000 + "end\n", self.rcon.write("cvarlist"))
+
+    def test_no_response(self):
+        self.assertEqual("", self.rcon.write("say hello", socketTimeout=0.05))
+
+    def test_submit_from_many_threads(self):
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            futures = [
+                executor.submit(self.rcon.write, cmd)
+                for cmd in ("status", "cvarlist") * 4
+            ]
+        results = [f.result() for f in futures]
+        self.assertEqual(
+            ["map: ut4_casa\n", "x" * 1000 + "y" * 1000 + "end\n"] * 4, results
+        )
+
+    def test_writelines(self):
+        self.rcon.writelines(["status", "", "status"])
+        self.rcon.submit("status").result(timeout=5)
+        self.assertListEqual(["status"] * 3, self.server.received)
+
+    def test_write_after_close(self):
+        self.rcon.close()
+        self.assertTrue(self.rcon.submit("status").cancelled())
+        self.assertEqual("", self.rcon.write("status"))
+
+
+class Test_ResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseCache(ttl=60)
+        self.fetch = Mock(side_effect=lambda cmd: f"response to {cmd}")
+
+    def test_hit(self):
+        self.assertEqual("response to status", self.cache.get("status", self.fetch))
+        self.assertEqual("response to status", self.cache.get("status", self.fetch))
+        self.fetch.assert_called_once_with("status")
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_keyed_by_command(self):
+        self.cache.get("status", self.fetch)
+        self.cache.get("players", self.fetch)
+        self.assertEqual(2, self.fetch.call_count)
+
+    def test_expired(self):
+        self.cache.ttl = 0
+        self.cache.get("status", self.fetch)
+        self.cache.get("status", self.fetch)
+        self.assertEqual(2, self.cache.misses)
+
+    def test_empty_response_not_cached(self):
+        self.fetch.side_effect = lambda cmd: ""
+        self.cache.get("status", self.fetch)
+        self.cache.get("status", self.fetch)
+        self.assertEqual(2, self.fetch.call_count)
+
+    def test_invalidate(self):
+        self.cache.get("status", self.fetch)
+        self.cache.invalidate("kick 1")
+        self.cache.get("status", self.fetch)
+        self.assertEqual(2, self.fetch.call_count)
+
+    def test_own_write_does_not_invalidate(self):
+        def fetch(cmd):
+            self.cache.invalidate(cmd)
+            return "response"
+
+        self.cache.get("status", fetch)
+        self.cache.get("status", fetch)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_invalidate_while_in_flight(self):
+        def fetch(cmd):
+            self.cache.invalidate()
+            return "stale"
+
+        self.cache.get("status", fetch)
+        self.assertEqual("response to status", self.cache.get("status", self.fetch))
+
+    def test_concurrent_callers_share_request(self):
+        release = threading.Event()
+
+        def fetch(cmd):
+            release.wait(5)
+            return "response"
+
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            futures = [
+                executor.submit(self.cache.get, "status", fetch) for _ in range(4)
+            ]
+            while self.cache.shared < 3:
+                time.sleep(0.01)
+            release.set()
+        self.assertEqual(["response"] * 4, [f.result() for f in futures])
+        self.assertEqual((1, 3), (self.cache.misses, self.cache.shared))
+
+    def test_fetch_error(self):
+        self.fetch.side_effect = OSError
+        self.assertRaises(OSError, self.cache.get, "status", self.fetch)
+        self.fetch.side_effect = None
+        self.fetch.return_value = "response"
+        self.assertEqual("response", self.cache.get("status", self.fetch))
+
+
+if __name__ == "__main__":
+    unittest.main()
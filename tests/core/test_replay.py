@@ -0,0 +1,147 @@
+import logging
+import os
+import tempfile
+import unittest
+from collections import Counter
+from unittest.mock import Mock, patch
+
+import b3
+import b3.parser
+from b3.clients import Client
+from b3.parsers.iourt43 import Iourt43Parser
+from b3.replay import ReplayRcon, ReplayResult, replay, replayConfig
+
+GAME_LOG = r"""
+  0:00 ------------------------------------------------------------
+  0:00 InitGame: \sv_allowvote\1\g_matchmode\0\g_gametype\4\sv_maxclients\16\mapname\ut4_casa
+  0:01 ClientConnect: 0
+  0:01 ClientUserinfo: 0 \ip\11.22.33.44:27960\name\Joe\racered\2\raceblue\2\cl_guid\00000000011111111122222223333333\authc\0
+  0:01 ClientUserinfoChanged: 0 n\Joe\t\1\r\2\tl\0\f0\\f1\\f2\\a0\0\a1\0\a2\0
+  0:01 ClientBegin: 0
+  0:02 say: 0 Joe: hello
+
+  0:03 say: 0 Joe: !help
+  0:04 ClientDisconnect: 0
+  0:05 ShutdownGame:
+"""
+
+
+class Test_ReplayRcon(unittest.TestCase):
+    def setUp(self):
+        self.console = Mock()
+        self.console.game._mapName = "ut4_casa"
+        self.console.clients.getList.return_value = [
+            Client(cid="4", name="Joe", ip="11.22.33.44", team=b3.TEAM_RED),
+            Client(cid="12", name="Jack", ip="11.22.33.45", team=b3.TEAM_BLUE),
+        ]
+        self.rcon = ReplayRcon(self.console, responses={"fdir *.bsp": "ut4_casa.bsp"})
+
+    def test_status(self):
+        lines = self.rcon.write("status").splitlines()
+        self.assertEqual("map: ut4_casa", lines[0])
+        self.assertTrue(lines[1].startswith("num score ping name"))
+        self.assertIn("Jack^7 0 11.22.33.45:27960", lines[4])
+
+    def test_players(self):
+        lines = self.rcon.write("players").splitlines()
+        self.assertEqual(
+            [
+                "4: Joe RED k:0 d:0 ping:50 11.22.33.44:27960",
+                "12: Jack BLUE k:0 d:0 ping:50 11.22.33.45:27960",
+            ],
+            lines[3:],
+        )
+
+    def test_cvar(self):
+        self.assertEqual(
+            '"gamename" is:"q3urt43^7" default:"q3urt43^7"', self.rcon.write("gamename")
+        )
+
+    def test_scripted_response(self):
+        self.assertEqual("ut4_casa.bsp", self.rcon.write("fdir *.bsp"))
+        self.assertEqual("", self.rcon.write("kick 4"))
+
+    def test_commands_counted(self):
+        self.rcon.writelines(["say hi", "say there", ""])
+        self.assertEqual("", self.rcon.submit("kick 4").result())
+        self.assertEqual(Counter({"say": 2, "kick": 1}), self.rcon.commands)
+
+
+class Test_ReplayResult(unittest.TestCase):
+    def test_rates(self):
+        result = ReplayResult(
+            1000,
+            0.5,
+            Counter(EVT_CLIENT_KILL=300),
+            Counter(),
+            {},
+            Counter(),
+            None,
+            None,
+        )
+        self.assertEqual(2000, result.linesPerSecond)
+        self.assertEqual(600, result.eventsPerSecond)
+        self.assertEqual(300, result.asDict()["events"])
+
+    def test_report(self):
+        result = ReplayResult(
+            10,
+            1.0,
+            Counter(EVT_CLIENT_SAY=2),
+            Counter(EVT_CLIENT_DAMAGE=1),
+            {"AdminPlugin": (2, 0.01, 0.008)},
+            Counter(tell=2),
+            2048,
+            None,
+        )
+        report = result.report()
+        self.assertIn("10 in 1.000s (10 lines/s)", report)
+        self.assertIn("EVT_CLIENT_DAMAGE(1)", report)
+        self.assertIn("AdminPlugin", report)
+        self.assertNotIn("peak traced", report)
+
+
+class Test_replay(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.game_log = os.path.join(tmpdir.name, "games.log")
+        with open(self.game_log, "w") as f:
+            f.write(GAME_LOG.lstrip("\n"))
+        self.logfile = os.path.join(tmpdir.name, "b3.log")
+        # keep the test logger and the global console as they are
+        for name, value in (
+            ("console", b3.console),
+            ("confdir", b3.confdir),
+        ):
+            self.addCleanup(setattr, b3, name, value)
+        output = patch(
+            "b3.output.getInstance", return_value=logging.getLogger("output")
+        )
+        output.start()
+        self.addCleanup(output.stop)
+        # the parser tests rebase the parser on FakeConsole
+        self.addCleanup(setattr, Iourt43Parser, "__bases__", Iourt43Parser.__bases__)
+        Iourt43Parser.__bases__ = (b3.parser.Parser,)
+
+    def test_replay(self):
+        result = replay(
+            self.game_log, plugins=["admin"], logfile=self.logfile, batch_lines=4
+        )
+        self.assertEqual(10, result.lines)
+        self.assertEqual(2, result.events["EVT_CLIENT_SAY"])
+        self.assertEqual(1, result.events["EVT_CLIENT_CONNECT"])
+        self.assertEqual(1, result.events["EVT_GAME_EXIT"])
+        self.assertEqual(Counter(), result.shed)
+        self.assertListEqual(["AdminPlugin"], list(result.plugins))
+        handled, total, longest = result.plugins["AdminPlugin"]
+        self.assertEqual(2, handled)
+        self.assertGreaterEqual(total, longest)
+        self.assertEqual(1, result.rcon["tell"])  # the !help answer
+
+
+class Test_replayConfig(unittest.TestCase):
+    def test_admin_always_loaded(self):
+        config = replayConfig("games.log", plugins=["stats"], logfile="b3.log")
+        self.assertEqual(["admin", "stats"], [p["name"] for p in config.get_plugins()])
+        self.assertEqual("sqlite://:memory:", config.get("b3", "database"))
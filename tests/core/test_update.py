@@ -1,6 +1,14 @@
+import os
+import shutil
+import tempfile
 import unittest
+from unittest.mock import Mock, patch
 
-from b3.update import B3version
+from b3.functions import splitDSN
+from b3.storage.sqlite import SqliteStorage
+from b3.update import B3version, DBUpdate
+from tests import B3TestCase
+from tests.core.storage.test_sqlite import INDEXES
 
 
 class TestB3Version(unittest.TestCase):
@@ -29,5 +37,49 @@ class TestB3Version(unittest.TestCase):
         self.assertLess(B3version("1.0"), B3version("1.1"))
 
 
+class Test_DBUpdate(B3TestCase):
+    def setUp(self):
+        B3TestCase.setUp(self)
+        self.tmpdir = tempfile.mkdtemp()
+        self.dsn = "sqlite://" + os.path.join(self.tmpdir, "b3.db")
+
+    def tearDown(self):
+        B3TestCase.tearDown(self)
+        shutil.rmtree(self.tmpdir)
+
+    def storage(self):
+        storage = SqliteStorage(self.dsn, splitDSN(self.dsn), self.console)
+        storage.connect()
+        return storage
+
+    def getIndexes(self):
+        storage = self.storage()
+        try:
+            with storage.query(
+                "SELECT name FROM sqlite_master WHERE type = 'index' "
+                "AND name LIKE 'idx_%'"
+            ) as cursor:
+                return {row["name"] for row in cursor}
+        finally:
+            storage.shutdown()
+
+    def test_run_adds_indexes(self):
+        storage = self.storage()
+        for index in INDEXES:
+            storage.query(f"DROP INDEX {index}")
+        storage.shutdown()
+        config = Mock(analyze=Mock(return_value=[]), get=Mock(return_value=self.dsn))
+        with (
+            patch("b3.config.get_main_config", return_value=config),
+            patch("builtins.input"),
+            patch("builtins.print"),
+            patch("b3.update.time.sleep"),
+            patch("b3.functions.console_exit") as console_exit,
+        ):
+            DBUpdate().run()
+        console_exit.assert_called_once_with("B3 database update completed!")
+        self.assertSetEqual(INDEXES, self.getIndexes())
+
+
 if __name__ == "__main__":
     unittest.main()
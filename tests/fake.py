@@ -334,7 +334,7 @@ class FakeClient(b3.clients.Client):
         self.console.clients.disconnect(self)
         self.cid = None
         self.authed = False
-        self._pluginData = {}
+        self._vars = {}
         self.state = b3.STATE_UNKNOWN
 
     def says(self, msg):
@@ -8,6 +8,7 @@ from mockito import when
 from b3 import TEAM_RED
 from b3.clients import Client, ClientBan, ClientTempBan, ClientVar, Group
 from b3.config import CfgConfigParser
+from b3.functions import instance_attributes
 from b3.plugins.admin import Command
 from tests import InstantThread, InstantTimer
 from tests.fake import FakeClient
@@ -1258,7 +1259,14 @@ class Test_cmd_mask_functional(Admin_functional_test):
         ## WHEN joe reconnects
         self.joe.disconnects()
         client = self.console.storage.getClient(Client(id=self.joe.id))
-        joe2 = FakeClient(self.console, **client.__dict__)
+        joe2 = FakeClient(
+            self.console,
+            **{
+                attr: getattr(client, attr)
+                for attr in instance_attributes(client)
+                if attr != "console"
+            },
+        )
         joe2.connects(1)
         ## THEN joe is still masked
         self.assertEqual(128, joe2.maxGroup.id)
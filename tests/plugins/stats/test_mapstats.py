@@ -0,0 +1,93 @@
+import random
+
+from b3 import TEAM_BLUE, TEAM_RED
+from b3.clients import Client
+from b3.plugins.stats import MapStats
+from tests import B3TestCase
+from tests.fake import FakeClient
+from tests.plugins.stats import StatPluginTestCase
+
+
+class Test_mapstats(StatPluginTestCase):
+    def setUp(self):
+        StatPluginTestCase.setUp(self)
+        self.joe.team = TEAM_BLUE
+        self.mike.team = TEAM_RED
+
+    def test_damage_and_assist(self):
+        self.joe.damages(self.mike, points=150)
+        self.console.queueEvent(self.console.getEvent("EVT_ASSIST", client=self.joe))
+        stats = self.p.mapStats
+        self.assertEqual(100, stats.get(self.joe, "damageHit"))
+        self.assertEqual(1, stats.get(self.mike, "shotsGot"))
+        self.assertEqual(1, stats.get(self.joe, "assists"))
+
+    def test_slot_reused(self):
+        self.joe.kills(self.mike)
+        self.mike.disconnects()
+        bill = FakeClient(self.console, name="Bill", guid="billguid", team=TEAM_RED)
+        bill.connects(2)
+        self.assertEqual(0, self.p.mapStats.get(bill, "deaths"))
+        self.assertEqual(100.0, self.p.mapStats.get(bill, "points"))
+        self.assertEqual(
+            [(112.5, "Joe^7"), (100.0, "Bill^7")],
+            self.p.mapStats.top("points", 5, bool),
+        )
+
+    def test_disconnected_not_listed(self):
+        self.joe.kills(self.mike)
+        self.mike.disconnects()
+        self.joe.says("!topstats")
+        self.assertListEqual(["Top Stats: #1 Joe [112.5]"], self.joe.message_history)
+
+    def test_round_start(self):
+        self.joe.kills(self.mike)
+        self.console.queueEvent(self.console.getEvent("EVT_GAME_ROUND_START"))
+        self.joe.says("!mapstats")
+        self.assertListEqual(
+            ["Stats [ Joe ] K 0 D 0 A 0 TK 0 Dmg 0 Skill 112.50 XP 12.5"],
+            self.joe.message_history,
+        )
+
+    def test_round_start_resets(self):
+        self.p.resetscore = True
+        self.p.resetxp = True
+        self.joe.kills(self.mike)
+        self.console.queueEvent(self.console.getEvent("EVT_GAME_ROUND_START"))
+        self.joe.says("!mapstats")
+        self.assertListEqual(
+            ["Stats [ Joe ] K 0 D 0 A 0 TK 0 Dmg 0 Skill 100.00 XP 0.0"],
+            self.joe.message_history,
+        )
+
+
+class Test_MapStats(B3TestCase):
+    def test_top_ties_by_name(self):
+        stats = MapStats()
+        clients = [Client(cid=cid, name=name) for cid, name in enumerate("abcde")]
+        for client, points in zip(clients, (10, 30, 30, 20, 30), strict=True):
+            stats.set(client, "points", points)
+        self.assertEqual(
+            [(30.0, "e^7"), (30.0, "c^7")], stats.top("points", 2, lambda c: True)
+        )
+        self.assertEqual(
+            [(30.0, "e^7"), (30.0, "b^7"), (20.0, "d^7")],
+            stats.top("points", 3, lambda c: c.name != "c"),
+        )
+
+    def test_top_as_sort(self):
+        rng = random.Random(3)  # noqa: S311
+        stats = MapStats()
+        clients = [Client(cid=cid, name=f"p{cid % 7}") for cid in range(40)]
+        for _ in range(2000):
+            killer, victim = rng.sample(clients, 2)
+            if rng.random() < 0.2:
+                stats.teamKill(killer, victim, 100)
+            else:
+                stats.kill(killer, victim, rng.randrange(1, 101))
+        for name in ("points", "experience"):
+            expected = sorted(
+                ((round(stats.get(c, name), 2), c.exactName) for c in clients),
+                reverse=True,
+            )
+            self.assertEqual(expected[:5], stats.top(name, 5, lambda c: True))
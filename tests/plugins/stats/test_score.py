@@ -4,8 +4,8 @@ from tests.plugins.stats import StatPluginTestCase
 class Test_score(StatPluginTestCase):
     def test_no_points(self):
         # GIVEN
-        self.joe.setvar(self.p, "points", 0)
-        self.mike.setvar(self.p, "points", 0)
+        self.p.mapStats.set(self.joe, "points", 0)
+        self.p.mapStats.set(self.mike, "points", 0)
         # WHEN
         s = self.p.score(self.joe, self.mike)
         # THEN
@@ -13,8 +13,8 @@ class Test_score(StatPluginTestCase):
 
     def test_equal_points(self):
         # GIVEN
-        self.joe.setvar(self.p, "points", 50)
-        self.mike.setvar(self.p, "points", 50)
+        self.p.mapStats.set(self.joe, "points", 50)
+        self.p.mapStats.set(self.mike, "points", 50)
         # WHEN
         s = self.p.score(self.joe, self.mike)
         # THEN
@@ -22,8 +22,8 @@ class Test_score(StatPluginTestCase):
 
     def test_victim_has_more_points(self):
         # GIVEN
-        self.joe.setvar(self.p, "points", 50)
-        self.mike.setvar(self.p, "points", 100)
+        self.p.mapStats.set(self.joe, "points", 50)
+        self.p.mapStats.set(self.mike, "points", 100)
         # WHEN
         s = self.p.score(self.joe, self.mike)
         # THEN
@@ -31,8 +31,8 @@ class Test_score(StatPluginTestCase):
 
     def test_victim_has_less_points(self):
         # GIVEN
-        self.joe.setvar(self.p, "points", 100)
-        self.mike.setvar(self.p, "points", 50)
+        self.p.mapStats.set(self.joe, "points", 100)
+        self.p.mapStats.set(self.mike, "points", 50)
         # WHEN
         s = self.p.score(self.joe, self.mike)
         # THEN